@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_async_io.py
+"""
+Compares the sync and async I/O engines of create_output on storage with high per-file latency.
+
+Latency is simulated by sleeping before every read, which is what dominates on NFS-backed agents.
+
+Usage (from the repo root, with codeconcat installed or on PYTHONPATH):
+    python benchmarks/bench_async_io.py [--files 300] [--delay-ms 5] [--max-in-flight 16]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from codeconcat import output
+from codeconcat.output import create_output
+
+
+def make_tree(base: Path, count: int) -> list:
+    paths = []
+    for i in range(count):
+        path = base / f"pkg{i % 10}" / f"module_{i:05d}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"def f_{i}():\n    return {i}\n" * 20, encoding="utf-8")
+        paths.append(str(path))
+    return sorted(paths)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--delay-ms", type=float, default=5.0)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    real_open = output._open_file_chunks
+
+    def slow_read(*a, **kw):
+        time.sleep(args.delay_ms / 1000)
+        return real_open(*a, **kw)
+
+    with tempfile.TemporaryDirectory() as tmp, patch.object(output, "_open_file_chunks", slow_read):
+        src = Path(tmp) / "src"
+        tree = make_tree(src, args.files)
+        results = {}
+        for engine in ("sync", "async"):
+            out = Path(tmp) / f"out_{engine}.txt"
+            start = time.perf_counter()
+            create_output(str(out), str(src), tree, io_engine=engine, max_in_flight=args.max_in_flight)
+            results[engine] = time.perf_counter() - start
+            print(f"{engine:>5}: {results[engine]:.3f}s ({args.files / results[engine]:.0f} files/s)")
+        same = (Path(tmp) / "out_sync.txt").read_bytes() == (Path(tmp) / "out_async.txt").read_bytes()
+        print(f"speedup: {results['sync'] / results['async']:.1f}x, identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
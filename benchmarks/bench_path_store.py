@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_path_store.py
+"""
+Measures the memory held by the included-file list of generate_directory_tree: a list of
+absolute path strings plus a {path: size} dict (the previous representation) against a
+PathStore, for synthetic trees of 1M and 5M files, including the peak while sorting.
+
+Usage (from the repo root, with codeconcat installed or on PYTHONPATH):
+    python benchmarks/bench_path_store.py [--sizes 1000000 5000000] [--files-per-dir 20]
+"""
+
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+from codeconcat.path_store import PathStore
+
+ROOT = os.path.join(os.sep, "home", "user", "projects", "monorepo")
+
+
+def synthetic_paths(count: int, files_per_dir: int):
+    """Yields paths of a tree 4 levels deep, files_per_dir files per leaf directory."""
+    for i in range(count):
+        leaf = i // files_per_dir
+        parts = [f"pkg{leaf // 10000}", f"module{leaf // 100 % 100}", f"sub{leaf % 100}"]
+        yield os.path.join(ROOT, *parts, f"file_{i % files_per_dir}_{i}.py")
+
+
+def build_list(count: int, files_per_dir: int):
+    tree = []
+    file_sizes = {}
+    for path in synthetic_paths(count, files_per_dir):
+        tree.append(path)
+        file_sizes[path] = 1234
+    tree.sort()
+    return tree, file_sizes
+
+
+def build_store(count: int, files_per_dir: int) -> PathStore:
+    store = PathStore()
+    for path in synthetic_paths(count, files_per_dir):
+        store.add(path, 1234)
+    store.sort()
+    return store
+
+
+def measure(build, count: int, files_per_dir: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(count, files_per_dir)
+    elapsed = time.perf_counter() - start
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return held, peak, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--files-per-dir", type=int, default=20)
+    args = parser.parse_args()
+
+    mib = 1024 * 1024
+    for count in args.sizes:
+        print(f"{count} paths:")
+        for name, build in (("list+dict", build_list), ("PathStore", build_store)):
+            held, peak, elapsed = measure(build, count, args.files_per_dir)
+            print(
+                f"  {name:<10} held {held / mib:8.1f} MiB ({held / count:6.1f} B/path)  "
+                f"peak {peak / mib:8.1f} MiB  {elapsed:6.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_sniff.py
+"""
+Measures the builtin sniffer against libmagic on a corpus directory: classification time
+and agreement on the text/binary verdict that generate_directory_tree actually uses.
+
+Usage (from the repo root, with codeconcat and python-magic installed or on PYTHONPATH):
+    python benchmarks/bench_sniff.py [CORPUS_DIR] [--repeat 3] [--show-disagreements]
+"""
+
+import argparse
+import os
+import time
+
+from codeconcat.file_utils import EXCLUDED_MIME_TYPES
+from codeconcat.sniff import detect_mime
+
+
+def is_binary(mime_type: str) -> bool:
+    return any(excluded in mime_type for excluded in EXCLUDED_MIME_TYPES)
+
+
+def collect_files(corpus: str) -> list:
+    paths = []
+    for root, dirs, files in os.walk(corpus):
+        dirs[:] = [d for d in dirs if d != ".git"]
+        paths.extend(os.path.join(root, f) for f in files if os.path.isfile(os.path.join(root, f)))
+    return sorted(paths)
+
+
+def classify_all(paths: list, classifier: str, repeat: int):
+    verdicts = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            verdicts[path] = detect_mime(path, classifier)
+    return verdicts, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("corpus", nargs="?", default=".")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--show-disagreements", action="store_true")
+    args = parser.parse_args()
+
+    paths = collect_files(args.corpus)
+    builtin, builtin_time = classify_all(paths, "builtin", args.repeat)
+    libmagic, libmagic_time = classify_all(paths, "libmagic", args.repeat)
+
+    disagreements = [p for p in paths if is_binary(builtin[p]) != is_binary(libmagic[p])]
+    print(f"files: {len(paths)}")
+    print(f"builtin:  {builtin_time:.3f}s")
+    print(f"libmagic: {libmagic_time:.3f}s ({libmagic_time / builtin_time:.1f}x slower)")
+    print(f"agreement: {100 * (1 - len(disagreements) / max(len(paths), 1)):.2f}%")
+    if args.show_disagreements:
+        for path in disagreements:
+            print(f"  {path}: builtin={builtin[path]} libmagic={libmagic[path]}")
+
+
+if __name__ == "__main__":
+    main()
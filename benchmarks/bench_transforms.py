@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# benchmarks/bench_transforms.py
+"""
+Measures throughput (MB/s of input) and reduction ratio of each content transform, and of
+all of them combined, over the source files of a corpus directory.
+
+Usage (from the repo root, with codeconcat installed or on PYTHONPATH):
+    python benchmarks/bench_transforms.py [CORPUS_DIR] [--chunk-bytes 65536]
+"""
+
+import argparse
+import os
+import time
+
+from codeconcat.transforms import TRANSFORM_NAMES, TransformPipeline, apply_transforms, syntax_for
+
+
+def load_corpus(corpus: str) -> list:
+    files = []
+    for root, dirs, names in os.walk(corpus):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in names:
+            path = os.path.join(root, name)
+            if syntax_for(path) is not None:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    files.append((path, f.read()))
+    return files
+
+
+def run(files: list, names: list, chunk_chars: int):
+    pipeline = TransformPipeline(names)
+    chars_in = chars_out = 0
+    start = time.perf_counter()
+    for path, text in files:
+        chunks = (text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars))
+        chars_in += len(text)
+        chars_out += sum(len(c) for c in apply_transforms(chunks, pipeline.for_file(path)))
+    return chars_in, chars_out, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("corpus", nargs="?", default=".")
+    parser.add_argument("--chunk-bytes", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    files = load_corpus(args.corpus)
+    print(f"files: {len(files)}")
+    for names in [[n] for n in TRANSFORM_NAMES] + [list(TRANSFORM_NAMES)]:
+        chars_in, chars_out, elapsed = run(files, names, args.chunk_bytes)
+        label = "all" if len(names) > 1 else names[0]
+        print(
+            f"{label:>26}: {chars_in / 1e6 / elapsed:7.1f} MB/s, "
+            f"output {100 * chars_out / max(chars_in, 1):5.1f}% of input"
+        )
+
+
+if __name__ == "__main__":
+    main()
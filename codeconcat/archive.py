@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# codeconcat/archive.py
+"""
+Concatenation straight from .tar (optionally gzip/bzip2/xz compressed) and .zip archives.
+
+Members are filtered, classified and written as they stream past, in a single sequential
+pass: nothing is extracted to disk and only one member is in memory at a time, apart from
+the members held back while waiting for the archive's root .gitignore (bounded, see
+member_entries). member_entries is shared with other sources of (path, size, file) members.
+"""
+
+import io
+import logging
+import posixpath
+import stat
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple, cast
+
+import pathspec
+
+from .encoding import DEFAULT_FALLBACKS
+from .file_utils import OVERSIZE_POLICIES, PathFilter, is_excluded_mime, is_language_file
+from .governor import open_input
+from .output import READ_CHUNK_BYTES, file_encoding, join_head_tail, stream_chunks, tail_start
+from .sniff import SNIFF_BYTES, ClassifierUnavailableError, classify_prefix
+from .stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+# Members read ahead of a tar's root .gitignore are held in memory up to this many bytes
+DEFAULT_MAX_HELD_BYTES = 16 * 1024 * 1024
+
+# (relative path, size, open member) of a regular file in an archive
+Member = Tuple[str, int, BinaryIO]
+
+
+def is_archive(path: Path) -> bool:
+    """True if path is a tar or zip archive (judged by content, not by name)."""
+    try:
+        return path.is_file() and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+    except OSError:
+        return False
+
+
+def _member_path(name: str) -> Optional[str]:
+    """Normalizes a member name to a relative posix path; None for unsafe or empty names."""
+    path = posixpath.normpath(name.lstrip("/"))
+    if path in (".", "") or path == ".." or path.startswith("../"):
+        return None
+    return path
+
+
+def _tar_members(archive_path: Path) -> Iterator[Member]:
+    # "r|*" reads the archive as a forward-only stream, whatever the compression
+    with open_input(str(archive_path)) as f, tarfile.open(fileobj=f, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile():
+                continue  # Directories, links and devices
+            member = archive.extractfile(info)
+            if member is not None:
+                yield info.name, info.size, cast(BinaryIO, member)
+
+
+def _zip_members(archive: zipfile.ZipFile) -> Iterator[Member]:
+    for info in archive.infolist():
+        if info.is_dir() or stat.S_ISLNK(info.external_attr >> 16):
+            continue
+        with archive.open(info) as member:
+            yield info.filename, info.file_size, cast(BinaryIO, member)
+
+
+def _gitignore_spec(data: bytes) -> Optional[pathspec.PathSpec]:
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    patterns = [line for line in lines if line.strip() and not line.strip().startswith("#")]
+    return pathspec.PathSpec.from_lines(pathspec.patterns.GitWildMatchPattern, patterns) if patterns else None
+
+
+def _read_head_tail_stream(
+    member: BinaryIO,
+    prefix: bytes,
+    size: int,
+    limit: int,
+    stats: RunStats,
+    encoding: str = "utf-8",
+    bom_len: int = 0,
+) -> str:
+    """Like output._read_head_tail, for members that can only be read forward."""
+    head_len = limit // 2
+    tail_len = limit - head_len
+    head = prefix[:head_len]
+    if len(head) < head_len:
+        head += member.read(head_len - len(head))
+        stats.incr("read_calls")
+    # Compressed streams cannot seek: read through, keeping only the last tail_len bytes
+    kept = max(size - tail_start(size, tail_len, encoding, bom_len), 0)
+    tail = prefix[head_len:]
+    while True:
+        tail = tail[len(tail) - kept :] if len(tail) > kept else tail
+        data = member.read(READ_CHUNK_BYTES)
+        stats.incr("read_calls")
+        if not data:
+            break
+        tail += data
+    return join_head_tail(head[bom_len:], tail, size - head_len - tail_len, encoding)
+
+
+def member_entries(
+    members: Iterable[Member],
+    exclude_patterns: List[str],
+    whitelist_patterns: List[str],
+    gitignore_spec: Optional[pathspec.PathSpec] = None,
+    await_gitignore: bool = False,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    oversize_policy: str = "skip",
+    stats: Optional[RunStats] = None,
+    max_held_bytes: int = DEFAULT_MAX_HELD_BYTES,
+    encoding_fallbacks: Sequence[str] = DEFAULT_FALLBACKS,
+    classifier: str = "builtin",
+) -> Iterator[Tuple[str, Iterator[str]]]:
+    """
+    Yields (relative path, content chunks) for the members that pass the same rules as
+    generate_directory_tree: path filters, size limits, whitelist, then extension or content
+    type (from the classifier backend, given the member's first bytes). Members are taken in
+    the order given, from any forward-only source (archive streams, git trees); each entry's
+    chunks must be consumed before the next one is requested.
+
+    With await_gitignore, the root .gitignore is expected among the members: those met before
+    it are held in memory until it shows up; past max_held_bytes (or at the end) they are
+    released unfiltered by it.
+    """
+    if oversize_policy not in OVERSIZE_POLICIES:
+        raise ValueError(f"Unknown oversize policy: {oversize_policy!r}")
+    stats = stats if stats is not None else RunStats()
+    path_filter = PathFilter(exclude_patterns, whitelist_patterns, gitignore_spec)
+    total = 0
+
+    def emit(relative_path: str, size: int, member: BinaryIO) -> Optional[Iterator[str]]:
+        nonlocal total
+        prefix = member.read(SNIFF_BYTES)
+        stats.incr("read_calls")
+        if not path_filter.has_whitelist and not is_language_file(posixpath.basename(relative_path)):
+            try:
+                mime_type = classify_prefix(prefix, classifier)
+            except ClassifierUnavailableError as e:
+                # As for directories: only members with a known extension are included
+                logger.warning(f"{classifier} classifier unavailable, relying on file extensions. Error: {e}")
+                return None
+            stats.incr("files_classified")
+            if is_excluded_mime(mime_type):
+                logger.debug(f"Skipping {mime_type} member: {relative_path}")
+                stats.incr("files_skipped_binary")
+                return None
+
+        truncate = max_file_bytes is not None and size > max_file_bytes
+        kept_size = min(size, max_file_bytes) if truncate and max_file_bytes is not None else size
+        if max_total_bytes is not None:
+            if total + kept_size > max_total_bytes:
+                logger.debug(f"Skipping member over total size budget ({kept_size} bytes): {relative_path}")
+                stats.incr("files_skipped_budget")
+                stats.incr("bytes_avoided", kept_size)
+                return None
+            total += kept_size
+
+        encoding, bom_len = file_encoding(prefix, encoding_fallbacks, stats)
+        if truncate and max_file_bytes is not None:
+            stats.incr("files_truncated")
+            stats.incr("bytes_avoided", size - max_file_bytes)
+            text = _read_head_tail_stream(member, prefix, size, max_file_bytes, stats, encoding, bom_len)
+            return iter([text])
+        return stream_chunks(member, prefix, stats, encoding, bom_len)
+
+    def excluded(relative_path: str) -> bool:
+        return path_filter.excludes_parents(PurePosixPath(relative_path)) or path_filter.excludes_file(
+            relative_path
+        )
+
+    def passes_filters(relative_path: str, size: int) -> bool:
+        if excluded(relative_path):
+            return False
+        if max_file_bytes is not None and size > max_file_bytes and oversize_policy == "skip":
+            logger.debug(f"Skipping oversized member ({size} bytes): {relative_path}")
+            stats.incr("files_skipped_oversize")
+            stats.incr("bytes_avoided", size)
+            return False
+        return True
+
+    awaiting_gitignore = await_gitignore
+    held: List[Tuple[str, int, bytes]] = []
+    held_bytes = 0
+
+    def release_held() -> Iterator[Tuple[str, Iterator[str]]]:
+        nonlocal held_bytes
+        for relative_path, size, data in held:
+            if not excluded(relative_path):  # Only the .gitignore can exclude it now
+                chunks = emit(relative_path, size, io.BytesIO(data))
+                if chunks is not None:
+                    yield relative_path, chunks
+        held.clear()
+        held_bytes = 0
+
+    for name, size, member in members:
+        relative_path = _member_path(name)
+        if relative_path is None:
+            logger.warning(f"Skipping member with unsafe path: {name}")
+            continue
+        stats.incr("members_read")
+
+        if awaiting_gitignore and relative_path == ".gitignore":
+            data = member.read()
+            path_filter = PathFilter(exclude_patterns, whitelist_patterns, _gitignore_spec(data))
+            awaiting_gitignore = False
+            yield from release_held()
+            member = io.BytesIO(data)
+
+        if not passes_filters(relative_path, size):
+            continue
+        if awaiting_gitignore:
+            if held_bytes + size <= max_held_bytes:
+                held.append((relative_path, size, member.read()))
+                held_bytes += size
+                continue
+            logger.info(
+                f"No root .gitignore in the first {held_bytes} bytes; members are not filtered by one."
+            )
+            awaiting_gitignore = False
+            yield from release_held()
+        chunks = emit(relative_path, size, member)
+        if chunks is not None:
+            yield relative_path, chunks
+    yield from release_held()
+
+
+def archive_entries(
+    archive_path: Path,
+    exclude_patterns: List[str],
+    whitelist_patterns: List[str],
+    use_gitignore: bool,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    oversize_policy: str = "skip",
+    stats: Optional[RunStats] = None,
+    max_held_bytes: int = DEFAULT_MAX_HELD_BYTES,
+    encoding_fallbacks: Sequence[str] = DEFAULT_FALLBACKS,
+    classifier: str = "builtin",
+) -> Iterator[Tuple[str, Iterator[str]]]:
+    """
+    Yields the (relative path, content chunks) entries of a tar or zip archive in archive
+    order; see member_entries. A zip's root .gitignore is read up front from its central
+    directory; a tar stream can only be read in order, so its .gitignore is awaited.
+    """
+
+    def entries(
+        members: Iterable[Member], spec: Optional[pathspec.PathSpec], await_gitignore: bool
+    ) -> Iterator[Tuple[str, Iterator[str]]]:
+        return member_entries(
+            members,
+            exclude_patterns,
+            whitelist_patterns,
+            gitignore_spec=spec,
+            await_gitignore=await_gitignore,
+            max_file_bytes=max_file_bytes,
+            max_total_bytes=max_total_bytes,
+            oversize_policy=oversize_policy,
+            stats=stats,
+            max_held_bytes=max_held_bytes,
+            encoding_fallbacks=encoding_fallbacks,
+            classifier=classifier,
+        )
+
+    with open_input(str(archive_path)) as f:
+        is_zip = zipfile.is_zipfile(f)
+    if not is_zip:
+        yield from entries(_tar_members(archive_path), None, use_gitignore)
+        return
+    with open_input(str(archive_path)) as f, zipfile.ZipFile(f) as zip_archive:
+        spec = None
+        if use_gitignore:
+            try:
+                spec = _gitignore_spec(zip_archive.read(".gitignore"))
+            except KeyError:
+                pass  # No root .gitignore
+        yield from entries(_zip_members(zip_archive), spec, False)
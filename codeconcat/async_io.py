@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# codeconcat/async_io.py
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IO_ENGINES = ("sync", "async")
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_MAX_BUFFERED_BYTES = 64 * 1024 * 1024
+
+# (path, content, error); content is None without an error when the reader skipped the file
+ReadResult = Tuple[str, Optional[str], Optional[BaseException]]
+
+
+def read_in_order(
+    paths: Iterable[str],
+    read_fn: Callable[[str], Optional[str]],
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    max_buffered_bytes: int = DEFAULT_MAX_BUFFERED_BYTES,
+) -> Iterator[ReadResult]:
+    """
+    Reads files concurrently on a thread-backed asyncio executor and yields
+    (path, content, error) tuples in the same order as `paths`.
+
+    At most `max_in_flight` reads run at once. New reads are only scheduled while the
+    content that has been read but not yet consumed stays under `max_buffered_bytes`,
+    so memory is bounded by that cap plus the reads already in flight.
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="codeconcat-read")
+    pending: Deque[Tuple[str, "asyncio.Future[Optional[str]]"]] = deque()
+    buffered = 0
+    path_iter = iter(paths)
+    exhausted = False
+
+    def on_done(future: "asyncio.Future[Optional[str]]") -> None:
+        nonlocal buffered
+        if not future.cancelled() and future.exception() is None:
+            buffered += len(future.result() or "")
+
+    try:
+        while True:
+            # Keep the pipeline full, unless completed reads are already holding too much memory
+            while not exhausted and len(pending) < max_in_flight and buffered < max_buffered_bytes:
+                path = next(path_iter, None)
+                if path is None:
+                    exhausted = True
+                    break
+                future = loop.run_in_executor(executor, read_fn, path)
+                future.add_done_callback(on_done)
+                pending.append((path, future))
+
+            if not pending:
+                break
+
+            # Wait for the oldest read only; later reads keep running in the pool meanwhile
+            path, future = pending.popleft()
+            try:
+                content = loop.run_until_complete(future)
+            except Exception as e:
+                yield path, None, e
+                continue
+            buffered -= len(content or "")
+            yield path, content, None
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        loop.close()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# codeconcat/changes.py
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+from .git_objects import GitRepository, changed_paths_since
+
+logger = logging.getLogger(__name__)
+
+
+def git_changed_paths(src_path: Path, ref: str) -> Optional[Set[str]]:
+    """
+    Returns the posix paths, relative to src_path, of files added or modified since ref,
+    read directly from the repository's objects and index. Returns None if src_path is not
+    inside a git work tree.
+    """
+    repo = GitRepository.discover(src_path)
+    if repo is None:
+        return None
+    try:
+        changes = changed_paths_since(repo, ref)
+    finally:
+        repo.close()
+
+    # Changes are relative to the work tree root; keep those under src_path
+    src_prefix = src_path.resolve().relative_to(repo.work_tree.resolve()).as_posix()
+    src_prefix = "" if src_prefix == "." else src_prefix + "/"
+    paths = {
+        path[len(src_prefix) :]
+        for path, status in changes.items()
+        if status != "deleted" and path.startswith(src_prefix)
+    }
+    logger.info(f"{len(paths)} files changed since {ref} (of {len(changes)} changes in the repository)")
+    return paths
+
+
+def load_snapshot(snapshot_path: Path) -> Dict[str, List[int]]:
+    """Loads a {relative path: [mtime_ns, size]} snapshot; missing or unreadable means empty."""
+    try:
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except FileNotFoundError:
+        logger.info(f"No snapshot at {snapshot_path}; all files are treated as changed.")
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Could not read snapshot {snapshot_path}: {e}. All files are treated as changed.")
+    return {}
+
+
+def _stat_key(file_path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def filter_changed_by_snapshot(
+    tree: Sequence[str], src_path: Path, snapshot_path: Path, update: bool = True
+) -> List[str]:
+    """
+    Keeps the files of tree whose mtime or size differ from the snapshot (or that are new),
+    then, if update is set, rewrites the snapshot with the current state of every file in tree.
+    """
+    src_path = src_path.resolve()
+    snapshot = load_snapshot(snapshot_path)
+    snapshot_abs = str(snapshot_path.resolve())
+    current: Dict[str, List[int]] = {}
+    changed: List[str] = []
+    for file_path in tree:
+        if file_path == snapshot_abs:
+            continue
+        key = _stat_key(file_path)
+        if key is None:
+            continue
+        try:
+            relative = Path(file_path).relative_to(src_path).as_posix()
+        except ValueError:
+            relative = file_path
+        current[relative] = key
+        if snapshot.get(relative) != key:
+            changed.append(file_path)
+
+    if update:
+        try:
+            snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(snapshot_path, "w", encoding="utf-8") as f:
+                json.dump({"files": current}, f)
+        except OSError as e:
+            logger.warning(f"Could not write snapshot {snapshot_path}: {e}")
+
+    logger.info(f"{len(changed)} of {len(current)} files changed since snapshot {snapshot_path}")
+    return changed
@@ -94,6 +94,27 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "use_gitignore": True,  # Still respect .gitignore by default
     "exclude_patterns": DEFAULT_EXCLUDE_PATTERNS,
     "whitelist_patterns": [],  # No default whitelist
+    "follow_symlinks": False,  # Walk symlinked directories (each physical file emitted once)
+    "max_file_bytes": None,  # No per-file size limit
+    "max_total_bytes": None,  # No total output budget
+    "oversize_policy": "skip",  # "skip" or "truncate" files over max_file_bytes
+    "classifier": "builtin",  # "builtin" sniffer or "libmagic" (needs python-magic)
+    "single_read": True,  # Classify (builtin) from the bytes read for output: one open per file
+    "transforms": [],  # Content transforms, see transforms.TRANSFORM_NAMES
+    "outline": False,  # Emit only imports, signatures and docstrings of Python/JS/TS files
+    "outline_workers": None,  # Outline parser processes (None: CPU count)
+    "outline_cache_dir": None,  # Outline cache location (None: ~/.cache/codeconcat/outlines)
+    "time_budget": None,  # Seconds before a best-effort run stops (None: no limit)
+    "priority": ["path"],  # File order, see file_utils.PRIORITY_ORDERS
+    "priority_patterns": [],  # Regexes whose files come first with the "patterns" order
+    "encoding_fallbacks": ["cp1252", "latin-1"],  # Tried in order for non-UTF-8 files without a BOM
+    "io_engine": "sync",  # "sync" or "async" (concurrent reads, for high-latency storage)
+    "max_in_flight": 16,  # Concurrent reads for the async engine
+    "max_buffered_bytes": 64 * 1024 * 1024,  # Memory cap for reads waiting to be written
+    "max_read_rate": None,  # Bytes per second read from sources (None: no limit)
+    "max_open_files": None,  # Source files and directories open at once (None: no limit)
+    "drop_cache": False,  # Keep sources and outputs out of the page cache (posix_fadvise)
+    "output_buffer": None,  # Output write buffer in bytes (None: Python's default)
     # Add other future config options here with defaults
 }
 
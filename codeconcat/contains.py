@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# codeconcat/contains.py
+"""
+Content filter for --contains: only files whose text includes at least one of a set of
+literal strings are emitted. The text matched is the file content as read (or its outline),
+before any transform.
+
+Content is matched as it streams: chunks are held back until the first match, after which
+the file is emitted (held chunks first, then the rest unread so far); files that end
+without a match are dropped. The last len(longest literal) - 1 characters of each chunk are
+carried over to the next search, so matches spanning two chunks are found.
+"""
+
+import itertools
+import re
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+
+class LiteralMatcher:
+    """Tells whether a text contains any of several literal strings."""
+
+    def __init__(self, literals: Sequence[str]) -> None:
+        self.literals = sorted({literal for literal in literals if literal}, key=len, reverse=True)
+        if not self.literals:
+            raise ValueError("--contains needs at least one non-empty string")
+        self.overlap = len(self.literals[0]) - 1
+        # One literal: str.__contains__ (a two-way search in C). Several: an alternation of
+        # escaped literals, scanned in a single pass by the regex engine.
+        self._pattern = (
+            re.compile("|".join(map(re.escape, self.literals))) if len(self.literals) > 1 else None
+        )
+
+    def search(self, text: str) -> bool:
+        if self._pattern is None:
+            return self.literals[0] in text
+        return self._pattern.search(text) is not None
+
+
+def chunks_if_contains(chunks: Iterable[str], matcher: LiteralMatcher) -> Optional[Iterator[str]]:
+    """
+    Reads chunks up to the first one completing a match and returns an iterator over all the
+    chunks, or None if there is no match (the chunks are then fully consumed).
+    """
+    iterator = iter(chunks)
+    held: List[str] = []
+    carry = ""
+    for chunk in iterator:
+        held.append(chunk)
+        window = carry + chunk
+        if matcher.search(window):
+            return itertools.chain(held, iterator)
+        carry = window[-matcher.overlap :] if matcher.overlap else ""
+    return None
+
+
+def text_if_contains(text: str, matcher: LiteralMatcher) -> Optional[str]:
+    """The whole-file counterpart of chunks_if_contains."""
+    return text if matcher.search(text) else None
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# codeconcat/deadline.py
+"""
+Wall-clock budget for best-effort runs (--time-budget).
+
+The stages of a run share one Deadline and check it between files: the walk stops once its
+share of the budget is used, so that the rest is left for reading and writing, and the
+writer stops when the whole budget is used. Stages that were cut short are recorded, so the
+output can end with a note saying it is incomplete.
+"""
+
+import logging
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Share of the budget the walk may use before it stops looking for more files
+WALK_SHARE = 0.5
+
+
+class Deadline:
+    def __init__(self, seconds: float, clock: Optional[Callable[[], float]] = None) -> None:
+        if seconds <= 0:
+            raise ValueError(f"Time budget must be positive, got {seconds}")
+        self.seconds = seconds
+        self._clock = clock or time.monotonic
+        self.started = self._clock()
+        self.cut_stages: List[str] = []
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def expired(self, stage: str, share: float = 1.0) -> bool:
+        """True once share of the budget has elapsed; the first time, records that stage was cut."""
+        if self.elapsed() < self.seconds * share:
+            return False
+        if stage not in self.cut_stages:
+            self.cut_stages.append(stage)
+            logger.warning(f"Time budget: {stage} stopped after {self.elapsed():.2f}s of {self.seconds:g}s")
+        return True
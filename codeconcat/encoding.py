@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# codeconcat/encoding.py
+"""
+Encoding detection from the first chunk of a file, so that non-UTF-8 text is transcoded to
+UTF-8 instead of being decoded into replacement characters.
+
+The decision is made once per file, from the bytes already read for sniffing: a byte order
+mark wins, then UTF-8 if the chunk is valid UTF-8, then the first encoding of the fallback
+chain that decodes the chunk. The rest of the file is decoded incrementally with that
+encoding; bytes invalid in it later on become replacement characters.
+"""
+
+import codecs
+from typing import Sequence, Tuple
+
+# Tried in order on non-UTF-8 content; latin-1 decodes any byte, so it ends the chain
+DEFAULT_FALLBACKS = ("cp1252", "latin-1")
+
+# Byte order marks, longest first (the UTF-32 LE BOM starts with the UTF-16 LE one)
+BOM_ENCODINGS: Tuple[Tuple[bytes, str], ...] = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def is_utf8(data: bytes) -> bool:
+    """True if data is valid UTF-8, allowing a multi-byte sequence cut off at the end."""
+    try:
+        data.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        return e.reason == "unexpected end of data" and e.start >= len(data) - 3
+
+
+def check_encodings(encodings: Sequence[str]) -> None:
+    """Raises ValueError for names Python has no codec for."""
+    for encoding in encodings:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise ValueError(f"Unknown encoding: {encoding!r}") from None
+
+
+def detect_encoding(prefix: bytes, fallbacks: Sequence[str] = DEFAULT_FALLBACKS) -> Tuple[str, int]:
+    """
+    Returns (codec name, BOM length) for a file starting with prefix. The BOM, if any, is to
+    be skipped. The prefix may end in the middle of a character.
+    """
+    if prefix.isascii():
+        return "utf-8", 0
+    for bom, encoding in BOM_ENCODINGS:
+        if prefix.startswith(bom):
+            return encoding, len(bom)
+    if is_utf8(prefix):
+        return "utf-8", 0
+    for encoding in fallbacks:
+        try:
+            codecs.getincrementaldecoder(encoding)("strict").decode(prefix, final=False)
+        except UnicodeDecodeError:
+            continue
+        return codecs.lookup(encoding).name, 0
+    return "utf-8", 0
+
+
+def code_unit_size(encoding: str) -> int:
+    """Bytes per code unit: where a cut into the encoded bytes can start a character."""
+    if encoding.startswith("utf-16"):
+        return 2
+    if encoding.startswith("utf-32"):
+        return 4
+    return 1
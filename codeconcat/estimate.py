@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# codeconcat/estimate.py
+"""
+Output size estimate for --dry-run, from the sizes the walk got from stat: no file is read.
+
+Content bytes are the file sizes, capped at the per-file limit for truncated files; each
+file also costs the header and markers the output format writes around it (see
+Sink.framing_bytes), which are counted in every total. Files with no known extension have
+not been classified (that needs their content), so they are counted separately: the binary
+ones among them would be dropped by a real run.
+"""
+
+import heapq
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .file_utils import is_language_file
+from .path_store import PathStore
+from .sinks import SINK_CLASSES
+
+# Rule of thumb for source code and English text with common LLM tokenizers
+BYTES_PER_TOKEN = 4
+DEFAULT_TOP_PATHS = 10
+OUTSIDE_SOURCE = "(outside the source)"
+
+
+class Estimate(NamedTuple):
+    files: int
+    content_bytes: int
+    framing_bytes: int
+    unclassified_files: int
+    unclassified_bytes: int
+    # {top-level directory, "." for files at the top or OUTSIDE_SOURCE: (files, output bytes)}
+    directories: Dict[str, Tuple[int, int]]
+    # (output bytes, relative path), largest first
+    heaviest: List[Tuple[int, str]]
+    sink_format: str = "text"
+
+    @property
+    def output_bytes(self) -> int:
+        return self.content_bytes + self.framing_bytes
+
+    @property
+    def tokens(self) -> int:
+        return self.output_bytes // BYTES_PER_TOKEN
+
+
+def estimate_tree(
+    tree: PathStore,
+    src_path: Path,
+    truncate_bytes: Optional[int] = None,
+    classified: bool = True,
+    top: int = DEFAULT_TOP_PATHS,
+    sink_format: str = "text",
+) -> Estimate:
+    """
+    Sums the sizes of the files in the tree and of their framing in sink_format, per top-level
+    directory, and finds the top heaviest files. Unless classified, files without a known
+    extension count as unclassified.
+    """
+    src_prefix = str(src_path) + os.sep
+    framing = SINK_CLASSES[sink_format].framing_bytes
+    files = content_bytes = framing_bytes = unclassified_files = unclassified_bytes = 0
+    directories: Dict[str, Tuple[int, int]] = {}
+    heaviest: List[Tuple[int, str]] = []
+    for file_path, size in tree.items():
+        if file_path.startswith(src_prefix):
+            relative = file_path[len(src_prefix) :].replace(os.sep, "/")
+            top_level = relative.split("/", 1)[0] + "/" if "/" in relative else "."
+        else:
+            relative, top_level = file_path, OUTSIDE_SOURCE  # Symlinked file, listed by its target path
+        content = min(size, truncate_bytes) if truncate_bytes is not None else size
+        files += 1
+        content_bytes += content
+        overhead = framing(relative)
+        framing_bytes += overhead
+        size = content + overhead
+        if not classified and not is_language_file(os.path.basename(file_path)):
+            unclassified_files += 1
+            unclassified_bytes += size
+        count, total = directories.get(top_level, (0, 0))
+        directories[top_level] = (count + 1, total + size)
+        if len(heaviest) < top:
+            heapq.heappush(heaviest, (size, relative))
+        elif top and size > heaviest[0][0]:
+            heapq.heapreplace(heaviest, (size, relative))
+    heaviest.sort(key=lambda entry: (-entry[0], entry[1]))
+    return Estimate(
+        files,
+        content_bytes,
+        framing_bytes,
+        unclassified_files,
+        unclassified_bytes,
+        directories,
+        heaviest,
+        sink_format,
+    )
+
+
+def format_bytes(count: int) -> str:
+    if count < 1024:
+        return f"{count} B"
+    scaled = float(count)
+    for unit in ("KiB", "MiB", "GiB", "TiB"):
+        scaled /= 1024
+        if scaled < 1024 or unit == "TiB":
+            break
+    return f"{scaled:.1f} {unit}"
+
+
+def format_estimate(estimate: Estimate) -> str:
+    """The --dry-run report: totals, per top-level directory (largest first) and heaviest files."""
+    lines = [
+        f"Dry run: {estimate.files} files, {format_bytes(estimate.output_bytes)} "
+        f"({estimate.output_bytes} bytes), ~{estimate.tokens} tokens (bytes / {BYTES_PER_TOKEN})",
+        f"  {format_bytes(estimate.content_bytes)} of content and {format_bytes(estimate.framing_bytes)} "
+        f"of {estimate.sink_format} headers and markers",
+    ]
+    if estimate.unclassified_files:
+        lines.append(
+            f"  including {estimate.unclassified_files} files, {format_bytes(estimate.unclassified_bytes)} "
+            "with no known extension: binary ones among them would be skipped"
+        )
+    lines.append("")
+    lines.append(f"{'bytes':>12} {'tokens':>10} {'files':>7}  directory")
+    by_size = sorted(estimate.directories.items(), key=lambda item: (-item[1][1], item[0]))
+    for directory, (count, total) in by_size:
+        lines.append(f"{format_bytes(total):>12} {total // BYTES_PER_TOKEN:>10} {count:>7}  {directory}")
+    if estimate.heaviest:
+        lines.append("")
+        lines.append(f"{'bytes':>12} {'tokens':>10}  heaviest files")
+        for size, relative in estimate.heaviest:
+            lines.append(f"{format_bytes(size):>12} {size // BYTES_PER_TOKEN:>10}  {relative}")
+    return "\n".join(lines) + "\n"
@@ -3,15 +3,27 @@
 import logging
 import os
 import re
-from pathlib import Path
-from typing import List, Optional
+import stat
+from collections import deque
+from pathlib import Path, PurePath
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-import magic
 import pathspec  # For .gitignore parsing
 
+from . import governor, trace
+from .deadline import WALK_SHARE, Deadline
+from .partition import Partition, partition_of
+from .path_store import PathStore
+from .sniff import ClassifierUnavailableError, detect_mime
+from .stats import RunStats
+
 logger = logging.getLogger(__name__)
 # Keep these constants or move them to config if they should be configurable
 EXCLUDED_MIME_TYPES = ("application", "image", "audio", "video")
+# What to do with files larger than max_file_bytes
+OVERSIZE_POLICIES = ("skip", "truncate")
+# Orders files can be prioritized by, most significant first; ties are broken by path
+PRIORITY_ORDERS = ("path", "shallow", "recent", "patterns")
 # This list becomes less important if whitelist is used effectively, but good fallback
 # (Keep your existing LANGUAGE_EXTENSIONS list here)
 LANGUAGE_EXTENSIONS = (
@@ -80,6 +92,16 @@ LANGUAGE_EXTENSIONS = (
 )
 
 
+def is_language_file(file_name: str) -> bool:
+    """True if the file name has a known text/code extension (or is a LICENSE file)."""
+    return file_name.lower().endswith(LANGUAGE_EXTENSIONS) or file_name == "LICENSE"
+
+
+def is_excluded_mime(mime_type: str) -> bool:
+    """True if the MIME type marks content that should not be concatenated (binary, media)."""
+    return any(excluded in mime_type for excluded in EXCLUDED_MIME_TYPES)
+
+
 # Need to re-add the load_gitignore_patterns function definition
 def load_gitignore_patterns(start_path: Path) -> Optional[pathspec.PathSpec]:
     """Loads .gitignore patterns starting from a path and walking upwards."""
@@ -121,148 +143,475 @@ def load_gitignore_patterns(start_path: Path) -> Optional[pathspec.PathSpec]:
     return None
 
 
-def generate_directory_tree(
-    src_path_str: str,
-    exclude_patterns: List[str],
-    whitelist_patterns: List[str],
-    use_gitignore: bool,
-) -> List[str]:
+def _scan_tree(
+    top: str, links: Optional["LinkTracker"] = None, breadth_first: bool = False
+) -> Iterator[Tuple[str, List[os.DirEntry], List[os.DirEntry]]]:
     """
-    Generates a list of file paths to include, applying filters.
-    Order of operations:
-    1. Check explicit exclude patterns (using relative paths).
-    2. Check .gitignore patterns (if enabled, using relative paths).
-    3. Check whitelist patterns (if provided, using relative paths).
-    4. Check default MIME type / extension (if no whitelist).
+    Top-down walk equivalent to os.walk(top) that yields os.DirEntry objects instead of names,
+    so the stat data gathered while scanning can be reused by the filters.
+    Callers may prune the yielded directory list in place, as with os.walk.
+    Symlinked directories are listed but not descended into (os.walk's default), unless a
+    LinkTracker is given: then every directory, symlinked or not, is entered once per
+    (st_dev, st_ino), in name order so the path a directory is first reached by is stable.
+    With breadth_first, shallower directories are all scanned before deeper ones.
     """
-    tree: List[str] = []
-    src_path = Path(src_path_str).resolve()
-    gitignore_spec = load_gitignore_patterns(src_path) if use_gitignore else None
+    stack: Deque[str] = deque([top])
+    if links is not None:
+        links.enter_dir(top)
+    while stack:
+        root = stack.popleft() if breadth_first else stack.pop()
+        try:
+            with trace.span("scandir", "walk", root), governor.file_slot(root), os.scandir(root) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Could not scan directory {root}. Error: {e}")
+            continue
 
-    # Compile regex patterns, skip empty strings
-    compiled_exclude = [re.compile(p) for p in exclude_patterns if p]
-    compiled_whitelist = [re.compile(p) for p in whitelist_patterns if p]
+        dirs: List[os.DirEntry] = []
+        files: List[os.DirEntry] = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            (dirs if is_dir else files).append(entry)
+        if links is not None:
+            dirs.sort(key=lambda e: e.name)
+            files.sort(key=lambda e: e.name)
+
+        yield root, dirs, files
+
+        for entry in dirs if breadth_first else reversed(dirs):
+            if links is not None:
+                if links.enter_dir(entry.path):
+                    stack.append(entry.path)
+            elif not entry.is_symlink():
+                stack.append(entry.path)
 
-    logger.debug(f"Source Path Resolved: {src_path}")
-    logger.debug(f"Compiled Excludes: {[p.pattern for p in compiled_exclude]}")
-    logger.debug(f"Compiled Whitelists: {[p.pattern for p in compiled_whitelist]}")
-    logger.debug(f"Gitignore Spec Loaded: {gitignore_spec is not None}")
 
-    for root, dirs, files in os.walk(str(src_path), topdown=True):  # Ensure os.walk gets a string
-        current_path = Path(root).resolve()
+FileKey = Tuple[int, int]
+
+
+class LinkTracker:
+    """
+    (st_dev, st_ino) bookkeeping for walks that follow symlinks: each physical directory is
+    walked once, which breaks cycles, and each physical file is emitted once. Later paths to
+    an already-seen directory or file are recorded as aliases of the first one.
+    """
+
+    def __init__(self, stats: RunStats) -> None:
+        self.stats = stats
+        self._dirs: Dict[FileKey, str] = {}
+        self._files: Dict[FileKey, str] = {}
+        self.dir_aliases: List[Tuple[str, str]] = []  # (alias path, walked path)
+        self.file_aliases: Dict[str, List[str]] = {}  # emitted path -> alias paths
+
+    def enter_dir(self, path: str) -> bool:
+        """Returns True if the directory at path has not been walked yet, and marks it walked."""
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            logger.warning(f"Could not follow directory {path}. Error: {e}")
+            return False
+        key = (st.st_dev, st.st_ino)
+        walked = self._dirs.get(key)
+        if walked is None:
+            self._dirs[key] = path
+            return True
+        if (path + os.sep).startswith(walked + os.sep):
+            logger.debug(f"Skipping symlink cycle: {path} leads back to {walked}")
+            self.stats.incr("symlink_cycles")
+        else:
+            logger.debug(f"Skipping directory {path}: same directory as {walked}")
+            self.stats.incr("symlink_dir_aliases")
+            self.dir_aliases.append((path, walked))
+        return False
+
+    def first_path(self, path: str, st: os.stat_result) -> Optional[str]:
+        """Returns the path the file was first seen at, or None (and records it) if it is new."""
+        key = (st.st_dev, st.st_ino)
+        first = self._files.get(key)
+        if first is None:
+            self._files[key] = path
+            return None
+        self.file_aliases.setdefault(first, []).append(path)
+        self.stats.incr("symlink_file_aliases")
+        return first
+
+    def aliases_of(self, tree: Sequence[str]) -> Dict[str, List[str]]:
+        """Maps each path of tree to the other paths it was reached by, directory aliases included."""
+        aliases = {path: list(self.file_aliases[path]) for path in tree if path in self.file_aliases}
+        for alias_dir, walked_dir in self.dir_aliases:
+            prefix = walked_dir + os.sep
+            for path in tree:
+                if path.startswith(prefix):
+                    aliases.setdefault(path, []).append(alias_dir + path[len(walked_dir) :])
+        return aliases
+
+
+class PathFilter:
+    """
+    Exclude, .gitignore and whitelist checks on paths relative to the source root.
+    Shared by the directory walker and by sources that list paths themselves.
+    """
+
+    def __init__(
+        self,
+        exclude_patterns: List[str],
+        whitelist_patterns: List[str],
+        gitignore_spec: Optional[pathspec.PathSpec] = None,
+        partition: Optional[Partition] = None,
+    ) -> None:
+        # Compile regex patterns, skip empty strings
+        self.compiled_exclude = [re.compile(p) for p in exclude_patterns if p]
+        self.compiled_whitelist = [re.compile(p) for p in whitelist_patterns if p]
+        self.gitignore_spec = gitignore_spec
+        self.partition = partition
+
+    @property
+    def has_whitelist(self) -> bool:
+        return bool(self.compiled_whitelist)
+
+    def excludes_dir(self, dir_path_rel_str: str) -> bool:
+        """True if a directory (and so everything below it) is excluded."""
+        if self._outside_partition(dir_path_rel_str):
+            return True
+
+        # Check compiled exclude patterns against RELATIVE path string
+        if self.compiled_exclude and self._matches_exclude(dir_path_rel_str):
+            logger.debug(f"Excluding dir by exclude pattern: {dir_path_rel_str}")
+            return True
+
+        # Check gitignore patterns (needs trailing slash for directories)
+        if self.gitignore_spec and self._matches_gitignore(dir_path_rel_str + "/"):
+            logger.debug(f"Excluding dir by gitignore: {dir_path_rel_str}")
+            return True
+        return False
+
+    def _outside_partition(self, path_rel_str: str) -> bool:
+        # Only top-level entries are checked: what is below them goes with them
+        if self.partition is None or os.sep in path_rel_str:
+            return False
+        number, count = self.partition
+        return partition_of(path_rel_str, count) != number
+
+    def _matches_exclude(self, path_rel_str: str) -> bool:
+        with trace.span("pattern", "filter", path_rel_str):
+            return any(p.search(path_rel_str) for p in self.compiled_exclude)
+
+    def _matches_gitignore(self, path_rel_str: str) -> bool:
+        assert self.gitignore_spec is not None
+        with trace.span("gitignore", "filter", path_rel_str):
+            return self.gitignore_spec.match_file(path_rel_str)
+
+    def _matches_whitelist(self, path_rel_str: str) -> bool:
+        with trace.span("whitelist", "filter", path_rel_str):
+            return any(p.search(path_rel_str) for p in self.compiled_whitelist)
+
+    def excludes_parents(self, relative_file_path: PurePath) -> bool:
+        """True if any directory containing the file is excluded (for paths not found by walking)."""
+        return any(self.excludes_dir(str(parent)) for parent in reversed(relative_file_path.parents[:-1]))
+
+    def excludes_file(self, relative_file_path_str: str) -> bool:
+        """True if a file is excluded by patterns or .gitignore, or missing from the whitelist."""
+        if self._outside_partition(relative_file_path_str):
+            return True
+
+        # 1. Check explicit exclude patterns against RELATIVE path string
+        if self.compiled_exclude and self._matches_exclude(relative_file_path_str):
+            logger.debug(f"Excluding file by exclude pattern: {relative_file_path_str}")
+            return True
+
+        # 2. Check .gitignore patterns
+        if self.gitignore_spec and self._matches_gitignore(relative_file_path_str):
+            logger.debug(f"Excluding file by gitignore: {relative_file_path_str}")
+            return True
+
+        # 3. Check whitelist patterns against RELATIVE path string
+        if self.compiled_whitelist and not self._matches_whitelist(relative_file_path_str):
+            logger.debug(f"Skipping file not in whitelist: {relative_file_path_str}")
+            return True
+        return False
+
+
+# (relative path, absolute path, file name, size, mtime) of a file that passed the path filters
+Candidate = Tuple[str, str, str, int, float]
+
+
+def _walk_candidates(
+    src_path: Path, path_filter: PathFilter, links: Optional[LinkTracker] = None, breadth_first: bool = False
+) -> Iterator[Candidate]:
+    """
+    Walks src_path, pruning excluded directories, and yields files passing the path filters.
+    With a LinkTracker, symlinked directories are followed, files keep the path they were
+    found at, and files already yielded under another path are skipped.
+    """
+    for root, dirs, files in _scan_tree(str(src_path), links, breadth_first):
+        current_path = Path(root)
 
         # --- Filter Directories ---
         original_dirs = list(dirs)
         dirs[:] = []  # Modify dirs in place
         for d in original_dirs:
-            dir_path_obj = current_path / d
+            dir_path_obj = current_path / d.name
             try:
                 # Use relative path for pattern matching and gitignore
-                dir_path_rel = dir_path_obj.relative_to(src_path)
-                dir_path_rel_str = str(dir_path_rel)
+                dir_path_rel_str = str(dir_path_obj.relative_to(src_path))
             except ValueError:
                 logger.warning(f"Could not get relative path for dir {dir_path_obj}, skipping checks.")
                 dirs.append(d)  # Keep dir if relative path fails? Or skip? Skipping is safer.
                 continue
-
-            # Check compiled exclude patterns against RELATIVE path string
-            if compiled_exclude and any(p.search(dir_path_rel_str) for p in compiled_exclude):
-                logger.debug(f"Excluding dir by exclude pattern: {dir_path_rel_str}")
-                continue
-
-            # Check gitignore patterns (needs trailing slash for directories)
-            if (
-                use_gitignore
-                and gitignore_spec
-                and gitignore_spec.match_file(dir_path_rel_str + "/")  # Add trailing slash for dir match
-            ):
-                logger.debug(f"Excluding dir by gitignore: {dir_path_rel_str}")
-                continue
-
-            dirs.append(d)  # Keep the directory if not excluded
+            if not path_filter.excludes_dir(dir_path_rel_str):
+                dirs.append(d)  # Keep the directory if not excluded
 
         # --- Filter Files ---
-        for file in files:
-            file_path_obj = current_path / file
+        for entry in files:
+            file_path_obj = current_path / entry.name
             try:
                 # Use relative path for pattern matching and gitignore
-                relative_file_path = file_path_obj.relative_to(src_path)
-                relative_file_path_str = str(relative_file_path)
-                # Keep absolute path only needed for magic
-                file_path_abs_str = str(file_path_obj.resolve())
+                relative_file_path_str = str(file_path_obj.relative_to(src_path))
+                # Absolute path is stored for reading later; only symlinks need resolving
+                # since the source path itself is already resolved. Followed links keep
+                # the path they were found at.
+                if links is None and entry.is_symlink():
+                    file_path_abs_str = os.path.realpath(entry.path)
+                else:
+                    file_path_abs_str = entry.path
             except ValueError:
                 logger.warning(f"Could not get relative path for file {file_path_obj}, skipping checks.")
                 continue
-
-            # 1. Check explicit exclude patterns against RELATIVE path string
-            if compiled_exclude and any(p.search(relative_file_path_str) for p in compiled_exclude):
-                logger.debug(f"Excluding file by exclude pattern: {relative_file_path_str}")
+            if path_filter.excludes_file(relative_file_path_str):
                 continue
 
-            # 2. Check .gitignore patterns
-            if use_gitignore and gitignore_spec and gitignore_spec.match_file(relative_file_path_str):
-                logger.debug(f"Excluding file by gitignore: {relative_file_path_str}")
+            # Size from the stat data cached on the directory entry
+            try:
+                with trace.span("stat", "walk", relative_file_path_str):
+                    file_stat = entry.stat()
+            except OSError as e:
+                logger.warning(f"Skipping file {relative_file_path_str} - stat failed: {e}")
                 continue
-
-            # 3. Check whitelist patterns against RELATIVE path string
-            is_whitelisted = False
-            if compiled_whitelist:
-                if any(p.search(relative_file_path_str) for p in compiled_whitelist):
-                    is_whitelisted = True
-                else:
-                    logger.debug(f"Skipping file not in whitelist: {relative_file_path_str}")
+            if links is not None:
+                first = links.first_path(file_path_abs_str, file_stat)
+                if first is not None:
+                    logger.debug(f"Skipping file {relative_file_path_str}: same file as {first}")
                     continue
+            file_size = file_stat.st_size
+            yield relative_file_path_str, file_path_abs_str, entry.name, file_size, file_stat.st_mtime
+
+
+def _listed_candidates(
+    src_path: Path, only_paths: Iterable[str], path_filter: PathFilter
+) -> Iterator[Candidate]:
+    """Yields the listed files (posix paths relative to src_path) that exist and pass the path filters."""
+    for listed in sorted(set(only_paths)):
+        relative_file_path = Path(listed)
+        relative_file_path_str = str(relative_file_path)
+        if path_filter.excludes_parents(relative_file_path) or path_filter.excludes_file(
+            relative_file_path_str
+        ):
+            continue
+        file_path_abs_str = os.path.realpath(src_path / relative_file_path)
+        try:
+            stat_result = os.stat(file_path_abs_str)
+        except OSError:
+            logger.debug(f"Skipping listed file not present on disk: {relative_file_path_str}")
+            continue
+        if not stat.S_ISREG(stat_result.st_mode):
+            continue
+        yield (
+            relative_file_path_str,
+            file_path_abs_str,
+            relative_file_path.name,
+            stat_result.st_size,
+            stat_result.st_mtime,
+        )
+
+
+def generate_directory_tree(
+    src_path_str: str,
+    exclude_patterns: List[str],
+    whitelist_patterns: List[str],
+    use_gitignore: bool,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    oversize_policy: str = "skip",
+    classifier: str = "builtin",
+    defer_classification: bool = False,
+    only_paths: Optional[Iterable[str]] = None,
+    stats: Optional[RunStats] = None,
+    follow_symlinks: bool = False,
+    aliases: Optional[Dict[str, List[str]]] = None,
+    priority: Optional[List[str]] = None,
+    priority_patterns: Optional[List[str]] = None,
+    deadline: Optional[Deadline] = None,
+    partition: Optional[Partition] = None,
+) -> PathStore:
+    """
+    Generates the sorted sequence of absolute file paths to include, applying filters.
+    The paths are held in a PathStore, which stays compact for trees of millions of files.
+    Order of operations:
+    1. Check explicit exclude patterns (using relative paths).
+    2. Check .gitignore patterns (if enabled, using relative paths).
+    3. Check whitelist patterns (if provided, using relative paths).
+    4. Check the per-file size limit (stat only, oversized files are never opened).
+    5. Check extension, then MIME type via the classifier backend (if no whitelist).
+    6. Sort by path, then by the priority orders (if any), and apply the total size budget
+       in that order.
+
+    With oversize_policy "skip", files larger than max_file_bytes are dropped; with "truncate"
+    they are kept and create_output emits only their head and tail.
+    With defer_classification, step 5 only checks the extension and leaves the MIME check to
+    create_output(sniff_unlisted=True), so no file is opened here; binary files then count
+    against max_total_bytes, so budgeted runs should not defer.
+    If only_paths is given (posix paths relative to the source), the tree is not walked: only
+    those files are checked, with their parent directories subject to the directory filters.
+    With follow_symlinks, symlinked directories are walked too, once per physical directory
+    (see LinkTracker), and each physical file is included once. If an aliases dict is given,
+    it is filled with {included path: [other absolute paths of the same file]}.
+    priority lists orders from PRIORITY_ORDERS, most significant first: "shallow" (fewer
+    directory levels), "recent" (newest mtime) and "patterns" (files matching an earlier
+    regex of priority_patterns, then the other files).
+    With a deadline, the tree is walked breadth-first and the walk stops once its share of
+    the budget is used; the files found so far are returned.
+    With a partition (number, count), only the top-level entries assigned to that partition
+    (see partition.partition_of) are walked.
+    """
+    if oversize_policy not in OVERSIZE_POLICIES:
+        raise ValueError(f"Unknown oversize policy: {oversize_policy!r}")
+    priority = priority or []
+    unknown_orders = [order for order in priority if order not in PRIORITY_ORDERS]
+    if unknown_orders:
+        raise ValueError(f"Unknown priority order(s): {', '.join(unknown_orders)}")
+
+    tree = PathStore(track_mtimes="recent" in priority)
+    stats = stats if stats is not None else RunStats()
+    src_path = Path(src_path_str).resolve()
+    gitignore_spec = load_gitignore_patterns(src_path) if use_gitignore else None
+    path_filter = PathFilter(exclude_patterns, whitelist_patterns, gitignore_spec, partition)
+
+    logger.debug(f"Source Path Resolved: {src_path}")
+    logger.debug(f"Compiled Excludes: {[p.pattern for p in path_filter.compiled_exclude]}")
+    logger.debug(f"Compiled Whitelists: {[p.pattern for p in path_filter.compiled_whitelist]}")
+    logger.debug(f"Gitignore Spec Loaded: {gitignore_spec is not None}")
+
+    links = LinkTracker(stats) if follow_symlinks else None
+    if only_paths is not None:
+        candidates = _listed_candidates(src_path, only_paths, path_filter)
+    else:
+        candidates = _walk_candidates(src_path, path_filter, links, breadth_first=deadline is not None)
+
+    for relative_file_path_str, file_path_abs_str, file_name, file_size, file_mtime in candidates:
+        if deadline is not None and deadline.expired("walk", WALK_SHARE):
+            break
 
-            # If whitelisted, add and continue (don't check default rules)
-            if is_whitelisted:
-                tree.append(file_path_abs_str)  # Store absolute path for reading later
-                logger.debug(f"Including whitelisted file: {relative_file_path_str}")
+        # 4. Check the size limit
+        if max_file_bytes is not None and file_size > max_file_bytes:
+            if oversize_policy == "skip":
+                logger.debug(f"Skipping oversized file ({file_size} bytes): {relative_file_path_str}")
+                stats.incr("files_skipped_oversize")
+                stats.incr("bytes_avoided", file_size)
                 continue
 
-            # 4. Default Inclusion (Only if NO whitelist was provided)
-            if not compiled_whitelist:
-                try:
-                    # Magic needs the absolute path
-                    mime_type = magic.from_file(file_path_abs_str, mime=True)
-                    is_excluded_mime = any(excluded in mime_type for excluded in EXCLUDED_MIME_TYPES)
-                    # Check extension on the filename itself
-                    file_name = file_path_obj.name
-                    is_language_file = (
-                        file_name.lower().endswith(LANGUAGE_EXTENSIONS) or file_name == "LICENSE"
-                    )
-
-                    if not is_excluded_mime or is_language_file:
-                        tree.append(file_path_abs_str)  # Store absolute path for reading later
-                        logger.debug(f"Including file by default rules: {relative_file_path_str}")
-
-                except magic.MagicException as e:
-                    # Check if libmagic is missing
-                    if "failed to find magic" in str(e).lower():
-                        logger.warning(f"libmagic not found. Relying on file extensions only. Error: {e}")
-                        # Fallback to extension check if magic fails critically
-                        file_name = file_path_obj.name
-                        is_language_file = (
-                            file_name.lower().endswith(LANGUAGE_EXTENSIONS) or file_name == "LICENSE"
-                        )
-                        if is_language_file:
-                            tree.append(file_path_abs_str)
-                            logger.debug(f"Including file by extension fallback: {relative_file_path_str}")
-                        else:
-                            logger.debug(f"Skipping file by extension fallback: {relative_file_path_str}")
-
-                    else:
-                        logger.warning(f"Skipping file {relative_file_path_str} - magic error: {e}")
-                except FileNotFoundError:
-                    # This might happen in race conditions, log and continue
-                    logger.warning(f"Skipping file {relative_file_path_str} - Not found during processing.")
-                except Exception as e:
-                    # Catch other potential errors during file processing
-                    logger.warning(f"Skipping file {relative_file_path_str} - Unexpected error: {e}")
+        # If whitelisted, add and continue (don't check default rules)
+        if path_filter.has_whitelist:
+            tree.add(file_path_abs_str, file_size, file_mtime)  # Absolute path, for reading later
+            logger.debug(f"Including whitelisted file: {relative_file_path_str}")
+            continue
+
+        # 5. Default Inclusion (Only if NO whitelist was provided)
+        # Known text/code extensions are included without classifying the content
+        if is_language_file(file_name):
+            tree.add(file_path_abs_str, file_size, file_mtime)  # Absolute path, for reading later
+            logger.debug(f"Including file by extension: {relative_file_path_str}")
+            continue
+
+        # Classification deferred to create_output, which sniffs the bytes it reads anyway
+        if defer_classification:
+            tree.add(file_path_abs_str, file_size, file_mtime)
+            logger.debug(f"Including file pending classification: {relative_file_path_str}")
+            continue
+
+        try:
+            with trace.span("classify", "classify", relative_file_path_str):
+                mime_type = detect_mime(file_path_abs_str, classifier)
+            stats.incr("files_classified")
+            if not is_excluded_mime(mime_type):
+                tree.add(file_path_abs_str, file_size, file_mtime)
+                logger.debug(f"Including file by default rules: {relative_file_path_str}")
+            else:
+                logger.debug(f"Skipping {mime_type} file: {relative_file_path_str}")
+
+        except ClassifierUnavailableError as e:
+            # Classifier backend missing (e.g. libmagic): only known extensions are included
+            logger.warning(f"{classifier} classifier unavailable, relying on file extensions. Error: {e}")
+            logger.debug(f"Skipping file by extension fallback: {relative_file_path_str}")
+        except FileNotFoundError:
+            # This might happen in race conditions, log and continue
+            logger.warning(f"Skipping file {relative_file_path_str} - Not found during processing.")
+        except Exception as e:
+            # Catch other potential errors during file processing
+            logger.warning(f"Skipping file {relative_file_path_str} - Unexpected error: {e}")
+
+    # Sort the tree for consistent output order (optional, but nice)
+    tree.sort()
+    if any(order != "path" for order in priority):
+        tree.reorder(_priority_key(priority, src_path, priority_patterns or []))
+
+    # 6. Apply the total size budget in output order so the result is deterministic
+    if max_total_bytes is not None:
+        _apply_total_budget(tree, max_file_bytes, oversize_policy, max_total_bytes, stats)
+    if links is not None and aliases is not None:
+        aliases.update(links.aliases_of(tree))
 
     logger.info(f"Found {len(tree)} files matching criteria.")
     if not tree:
         logger.warning("No files found matching the criteria. No output generated.")
 
-    # Sort the tree for consistent output order (optional, but nice)
-    tree.sort()
     return tree
+
+
+def _priority_key(
+    priority: List[str], src_path: Path, priority_patterns: List[str]
+) -> Callable[[str, int, float], Tuple[float, ...]]:
+    """Builds the PathStore.reorder key for the priority orders; smaller keys come first."""
+    compiled = [re.compile(p) for p in priority_patterns if p]
+    src_prefix = str(src_path) + os.sep
+
+    def key(file_path: str, size: int, mtime: float) -> Tuple[float, ...]:
+        parts: List[float] = []
+        for order in priority:
+            if order == "shallow":
+                parts.append(file_path.count(os.sep))
+            elif order == "recent":
+                parts.append(-mtime)
+            elif order == "patterns":
+                relative = file_path[len(src_prefix) :] if file_path.startswith(src_prefix) else file_path
+                parts.append(next((k for k, p in enumerate(compiled) if p.search(relative)), len(compiled)))
+        return tuple(parts)
+
+    return key
+
+
+def _apply_total_budget(
+    tree: PathStore,
+    max_file_bytes: Optional[int],
+    oversize_policy: str,
+    max_total_bytes: int,
+    stats: RunStats,
+) -> None:
+    """Keeps files, in order, while their (possibly truncated) sizes fit in max_total_bytes."""
+    total = 0
+
+    def fits(file_path: str, size: int) -> bool:
+        nonlocal total
+        if oversize_policy == "truncate" and max_file_bytes is not None:
+            size = min(size, max_file_bytes)
+        if total + size > max_total_bytes:
+            logger.debug(f"Skipping file over total size budget ({size} bytes): {file_path}")
+            stats.incr("files_skipped_budget")
+            stats.incr("bytes_avoided", size)
+            return False
+        total += size
+        return True
+
+    tree.retain(fits)
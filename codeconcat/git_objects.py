@@ -0,0 +1,597 @@
+# -*- coding: utf-8 -*-
+# codeconcat/git_objects.py
+"""
+Minimal pure-Python reader for a git repository's object database and index.
+
+Supports loose objects, version 2 pack indexes with their packfiles (including
+OFS_DELTA/REF_DELTA resolution), loose and packed refs, and index versions 2-4.
+Inflated objects are kept in a size-bounded LRU cache, so delta bases shared by many
+objects are only inflated and resolved once. Object sizes can be read from the object
+headers alone, so blobs over a size limit are skipped without being inflated.
+Only what codeconcat needs to list trees and read blobs is implemented.
+"""
+
+import bisect
+import hashlib
+import logging
+import os
+import re
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, Hashable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+PACK_INDEX_MAGIC = b"\xfftOc"
+# Longest loose object header: "commit <20 digits>\0"; delta size varints take at most 10 bytes each
+MAX_HEADER_BYTES = 32
+HEX_SHA = re.compile(r"[0-9a-f]{4,40}")
+# Names looked up directly in $GIT_DIR (HEAD, ORIG_HEAD...), as git does; others only under refs/
+PSEUDO_REF = re.compile(r"[A-Z_]+")
+DEFAULT_OBJECT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class GitError(Exception):
+    """Raised for missing objects, unresolvable revisions or unsupported repository data."""
+
+
+class TreeEntry(NamedTuple):
+    mode: int
+    path: str
+    sha: str
+
+
+class IndexEntry(NamedTuple):
+    path: str
+    sha: str
+    mode: int
+    size: int
+    mtime_ns: int
+    stage: int
+
+
+def find_git_dir(start: Path) -> Optional[Tuple[Path, Path]]:
+    """Returns (git dir, work tree) of the work tree containing start, or None."""
+    current = start.resolve()
+    while True:
+        dot_git = current / ".git"
+        if dot_git.is_dir():
+            return dot_git, current
+        if dot_git.is_file():
+            # Worktrees and submodules: ".git" is a file pointing at the real git dir
+            content = dot_git.read_text(encoding="utf-8").strip()
+            if content.startswith("gitdir:"):
+                return (current / content[len("gitdir:") :].strip()).resolve(), current
+        if current.parent == current:
+            return None
+        current = current.parent
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Reads a delta size (little-endian base 128) at pos: (value, position after it)."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Applies a git delta (copy/insert instructions) to base."""
+    base_size, pos = _read_varint(delta, 0)
+    result_size, pos = _read_varint(delta, pos)
+    if base_size != len(base):
+        raise GitError("Delta base size mismatch")
+
+    out = bytearray()
+    while pos < len(delta):
+        opcode = delta[pos]
+        pos += 1
+        if opcode & 0x80:  # Copy from base
+            offset = size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if opcode & (1 << (4 + i)):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset : offset + (size or 0x10000)]
+        elif opcode:  # Insert literal bytes
+            out += delta[pos : pos + opcode]
+            pos += opcode
+        else:
+            raise GitError("Invalid delta opcode 0")
+    if len(out) != result_size:
+        raise GitError("Delta result size mismatch")
+    return bytes(out)
+
+
+class _Pack:
+    """A packfile together with its version 2 index."""
+
+    def __init__(self, idx_path: Path) -> None:
+        self.pack_path = idx_path.with_suffix(".pack")
+        data = idx_path.read_bytes()
+        if data[:4] != PACK_INDEX_MAGIC or struct.unpack(">I", data[4:8])[0] != 2:
+            raise GitError(f"Unsupported pack index format: {idx_path}")
+        count = struct.unpack(">I", data[8 + 255 * 4 : 8 + 256 * 4])[0]
+        names_start = 8 + 256 * 4
+        offsets_start = names_start + count * 20 + count * 4
+        large_start = offsets_start + count * 4
+        self.names = [data[names_start + i * 20 : names_start + (i + 1) * 20] for i in range(count)]
+        self._offsets = data[offsets_start:large_start]
+        self._large_offsets = data[large_start:]
+        self._file: Optional[BinaryIO] = None
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Returns the pack offset of an object, or None if it is not in this pack."""
+        i = bisect.bisect_left(self.names, sha)
+        if i == len(self.names) or self.names[i] != sha:
+            return None
+        offset = struct.unpack(">I", self._offsets[i * 4 : i * 4 + 4])[0]
+        if offset & 0x80000000:
+            j = offset & 0x7FFFFFFF
+            offset = struct.unpack(">Q", self._large_offsets[j * 8 : j * 8 + 8])[0]
+        return offset
+
+    def _read_header(self, offset: int) -> Tuple[int, int, Optional[object]]:
+        """
+        Reads the header of the entry at offset, leaving the file at its compressed data:
+        (type number, inflated size, delta base). The base is a pack offset for OFS_DELTA,
+        a binary sha for REF_DELTA, else None.
+        """
+        if self._file is None:
+            self._file = open(self.pack_path, "rb")
+        file = self._file
+        file.seek(offset)
+        header = file.read(32)
+        byte = header[0]
+        type_num = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift, pos = 4, 1
+        while byte & 0x80:
+            byte = header[pos]
+            pos += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+
+        base: Optional[object] = None
+        if type_num == OFS_DELTA:
+            byte = header[pos]
+            pos += 1
+            base_distance = byte & 0x7F
+            while byte & 0x80:
+                byte = header[pos]
+                pos += 1
+                base_distance = ((base_distance + 1) << 7) | (byte & 0x7F)
+            base = offset - base_distance
+        elif type_num == REF_DELTA:
+            base = header[pos : pos + 20]
+            pos += 20
+        file.seek(offset + pos)
+        return type_num, size, base
+
+    def read_size(self, offset: int) -> int:
+        """Returns the content size of the entry at offset; for deltas, only their header is inflated."""
+        type_num, size, _ = self._read_header(offset)
+        if type_num not in (OFS_DELTA, REF_DELTA):
+            return size
+        assert self._file is not None
+        # The delta starts with the base size and the result size
+        delta = zlib.decompressobj().decompress(self._file.read(4 * MAX_HEADER_BYTES), 2 * MAX_HEADER_BYTES)
+        try:
+            _, pos = _read_varint(delta, 0)
+            return _read_varint(delta, pos)[0]
+        except IndexError:
+            raise GitError(f"Corrupt delta at offset {offset} in {self.pack_path}") from None
+
+    def read_raw(self, offset: int) -> Tuple[int, bytes, Optional[object]]:
+        """
+        Reads the entry at offset: (type number, inflated data, delta base).
+        The base is a pack offset for OFS_DELTA, a binary sha for REF_DELTA, else None.
+        """
+        type_num, size, base = self._read_header(offset)
+        assert self._file is not None
+        file = self._file
+        decompressor = zlib.decompressobj()
+        chunks = []
+        while not decompressor.eof:
+            chunk = file.read(64 * 1024)
+            if not chunk:
+                raise GitError(f"Truncated object in {self.pack_path}")
+            chunks.append(decompressor.decompress(chunk))
+        data = b"".join(chunks)
+        if len(data) != size:
+            raise GitError(f"Corrupt object at offset {offset} in {self.pack_path}")
+        return type_num, data, base
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ObjectCache:
+    """LRU cache of inflated (type, content) objects, bounded by the total content size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_OBJECT_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[str, bytes]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, obj_type: str, content: bytes) -> None:
+        # A single large blob must not flush everything else
+        if len(content) > self.max_bytes // 4 or key in self._entries:
+            return
+        self._entries[key] = (obj_type, content)
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class GitRepository:
+    """Read-only access to the objects, refs and index of a repository."""
+
+    def __init__(
+        self,
+        git_dir: Path,
+        work_tree: Optional[Path] = None,
+        cache_bytes: int = DEFAULT_OBJECT_CACHE_BYTES,
+    ) -> None:
+        self.git_dir = git_dir
+        self.work_tree = work_tree if work_tree is not None else git_dir.parent
+        # Linked worktrees keep objects and refs in the common dir
+        common_file = git_dir / "commondir"
+        if common_file.is_file():
+            self.common_dir = (git_dir / common_file.read_text(encoding="utf-8").strip()).resolve()
+        else:
+            self.common_dir = git_dir
+        self.objects_dir = self.common_dir / "objects"
+        self._packs: Optional[List[_Pack]] = None
+        self.cache = ObjectCache(cache_bytes)
+
+    @classmethod
+    def discover(cls, start: Path) -> Optional["GitRepository"]:
+        """Opens the repository containing start, or returns None if there is none."""
+        found = find_git_dir(start)
+        return cls(*found) if found is not None else None
+
+    # --- Objects ---
+
+    @property
+    def packs(self) -> List[_Pack]:
+        if self._packs is None:
+            pack_dir = self.objects_dir / "pack"
+            self._packs = [_Pack(p) for p in sorted(pack_dir.glob("*.idx"))] if pack_dir.is_dir() else []
+        return self._packs
+
+    def close(self) -> None:
+        for pack in self._packs or []:
+            pack.close()
+
+    def read_object(self, sha: str) -> Tuple[str, bytes]:
+        """Returns (type, content) of an object given its hex sha."""
+        cached = self.cache.get(sha)
+        if cached is not None:
+            return cached
+        loose_path = self.objects_dir / sha[:2] / sha[2:]
+        if loose_path.is_file():
+            raw = zlib.decompress(loose_path.read_bytes())
+            header, _, content = raw.partition(b"\x00")
+            obj_type = header.split(b" ", 1)[0].decode("ascii")
+            self.cache.put(sha, obj_type, content)
+            return obj_type, content
+
+        binary_sha = bytes.fromhex(sha)
+        for pack in self.packs:
+            offset = pack.find(binary_sha)
+            if offset is not None:
+                return self._read_packed(pack, offset)
+        raise GitError(f"Object not found: {sha}")
+
+    def object_size(self, sha: str) -> int:
+        """Returns the content size of an object given its hex sha, inflating only its header."""
+        loose_path = self.objects_dir / sha[:2] / sha[2:]
+        if loose_path.is_file():
+            with open(loose_path, "rb") as f:
+                raw = zlib.decompressobj().decompress(f.read(4 * MAX_HEADER_BYTES), MAX_HEADER_BYTES)
+            header, separator, _ = raw.partition(b"\x00")
+            if not separator:
+                raise GitError(f"Corrupt object header: {sha}")
+            return int(header.split(b" ", 1)[1])
+
+        binary_sha = bytes.fromhex(sha)
+        for pack in self.packs:
+            offset = pack.find(binary_sha)
+            if offset is not None:
+                return pack.read_size(offset)
+        raise GitError(f"Object not found: {sha}")
+
+    def _read_packed(self, pack: _Pack, offset: int) -> Tuple[str, bytes]:
+        # Follow the delta chain down to its base (or to a cached object), then apply the
+        # deltas back up. Every resolved object of the chain is cached by pack offset, since
+        # objects of the same chain tend to be read together.
+        deltas: List[Tuple[int, bytes]] = []
+        while True:
+            cached = self.cache.get((pack.pack_path, offset))
+            if cached is not None:
+                base_type, content = cached
+                break
+            type_num, data, base = pack.read_raw(offset)
+            if type_num == OFS_DELTA:
+                deltas.append((offset, data))
+                offset = base  # type: ignore[assignment]
+            elif type_num == REF_DELTA:
+                deltas.append((offset, data))
+                base_type, content = self.read_object(base.hex())  # type: ignore[union-attr]
+                break
+            else:
+                base_type, content = OBJECT_TYPES[type_num], data
+                self.cache.put((pack.pack_path, offset), base_type, content)
+                break
+        for delta_offset, delta in reversed(deltas):
+            content = _apply_delta(content, delta)
+            self.cache.put((pack.pack_path, delta_offset), base_type, content)
+        return base_type, content
+
+    # --- Refs and revisions ---
+
+    def _read_ref(self, name: str, depth: int = 0) -> Optional[str]:
+        if depth > 10:
+            raise GitError(f"Symbolic ref loop at {name}")
+        for base in (self.git_dir, self.common_dir):
+            ref_path = base / name
+            if ref_path.is_file():
+                value = ref_path.read_text(encoding="utf-8").strip()
+                if value.startswith("ref:"):
+                    return self._read_ref(value[4:].strip(), depth + 1)
+                return value
+        packed = self.common_dir / "packed-refs"
+        if packed.is_file():
+            for line in packed.read_text(encoding="utf-8").splitlines():
+                if line and line[0] not in "#^":
+                    sha, _, ref_name = line.partition(" ")
+                    if ref_name == name:
+                        return sha
+        return None
+
+    def _expand_abbreviated(self, prefix: str) -> Optional[str]:
+        matches: Set[str] = set()
+        loose_dir = self.objects_dir / prefix[:2]
+        if loose_dir.is_dir():
+            matches.update(prefix[:2] + n for n in os.listdir(loose_dir) if n.startswith(prefix[2:]))
+        binary_prefix = bytes.fromhex(prefix[: len(prefix) // 2 * 2])
+        for pack in self.packs:
+            i = bisect.bisect_left(pack.names, binary_prefix)
+            while i < len(pack.names) and pack.names[i].hex().startswith(prefix):
+                matches.add(pack.names[i].hex())
+                i += 1
+        if len(matches) > 1:
+            raise GitError(f"Ambiguous abbreviated object name: {prefix}")
+        return matches.pop() if matches else None
+
+    def resolve(self, rev: str) -> str:
+        """Resolves a commit-ish (sha, ref, branch, tag, with ~N / ^ suffixes) to a commit sha."""
+        match = re.fullmatch(r"(.+?)((?:[~^]\d*)*)", rev)
+        if not match:
+            raise GitError(f"Invalid revision: {rev}")
+        name, suffix = match.groups()
+
+        sha = None
+        # A branch named e.g. "config" must not resolve to the file $GIT_DIR/config
+        direct = PSEUDO_REF.fullmatch(name) or name.startswith("refs/")
+        for candidate in (
+            *((name,) if direct else ()),
+            f"refs/{name}",
+            f"refs/tags/{name}",
+            f"refs/heads/{name}",
+            f"refs/remotes/{name}",
+        ):
+            sha = self._read_ref(candidate)
+            if sha:
+                break
+        if sha is None and HEX_SHA.fullmatch(name):
+            sha = name if len(name) == 40 else self._expand_abbreviated(name)
+        if sha is None:
+            raise GitError(f"Unknown revision: {rev}")
+        sha = self.peel_to_commit(sha)
+
+        for op, count in re.findall(r"([~^])(\d*)", suffix):
+            steps = int(count) if count else 1
+            if op == "^":
+                # ^N selects the Nth parent; only a single step is taken
+                sha = self.parents(sha)[steps - 1] if steps else sha
+            else:
+                for _ in range(steps):
+                    sha = self.parents(sha)[0]
+        return sha
+
+    def peel_to_commit(self, sha: str) -> str:
+        """Follows annotated tags until a commit is reached."""
+        obj_type, content = self.read_object(sha)
+        while obj_type == "tag":
+            sha = content.split(b"\n", 1)[0].split(b" ", 1)[1].decode("ascii")
+            obj_type, content = self.read_object(sha)
+        if obj_type != "commit":
+            raise GitError(f"{sha} is a {obj_type}, not a commit")
+        return sha
+
+    def _commit_headers(self, sha: str) -> List[Tuple[bytes, bytes]]:
+        obj_type, content = self.read_object(sha)
+        if obj_type != "commit":
+            raise GitError(f"{sha} is not a commit")
+        headers = []
+        for line in content.split(b"\n\n", 1)[0].split(b"\n"):
+            if line and not line.startswith(b" "):
+                key, _, value = line.partition(b" ")
+                headers.append((key, value))
+        return headers
+
+    def parents(self, sha: str) -> List[str]:
+        parents = [v.decode("ascii") for k, v in self._commit_headers(sha) if k == b"parent"]
+        if not parents:
+            raise GitError(f"Commit {sha} has no parent")
+        return parents
+
+    def commit_tree(self, sha: str) -> str:
+        """Returns the root tree sha of a commit."""
+        for key, value in self._commit_headers(sha):
+            if key == b"tree":
+                return value.decode("ascii")
+        raise GitError(f"Commit {sha} has no tree")
+
+    # --- Trees ---
+
+    def read_tree(self, sha: str) -> List[TreeEntry]:
+        """Returns the direct entries of a tree object; names are relative to the tree."""
+        obj_type, content = self.read_object(sha)
+        if obj_type != "tree":
+            raise GitError(f"{sha} is not a tree")
+        entries = []
+        pos = 0
+        while pos < len(content):
+            space = content.index(b" ", pos)
+            nul = content.index(b"\x00", space)
+            mode = int(content[pos:space], 8)
+            name = content[space + 1 : nul].decode("utf-8", errors="surrogateescape")
+            entries.append(TreeEntry(mode, name, content[nul + 1 : nul + 21].hex()))
+            pos = nul + 21
+        return entries
+
+    def iter_tree(self, sha: str, prefix: str = "") -> Iterator[TreeEntry]:
+        """Recursively yields the non-tree entries of a tree, with posix paths from its root."""
+        for entry in self.read_tree(sha):
+            path = f"{prefix}{entry.path}"
+            if entry.mode == 0o040000:
+                yield from self.iter_tree(entry.sha, path + "/")
+            elif entry.mode != 0o160000:  # Skip submodule commits
+                yield TreeEntry(entry.mode, path, entry.sha)
+
+    # --- Index ---
+
+    def read_index(self) -> List[IndexEntry]:
+        """Parses the index (staging area); versions 2, 3 and 4 are supported."""
+        index_path = self.git_dir / "index"
+        if not index_path.is_file():
+            return []
+        data = index_path.read_bytes()
+        signature, version, count = struct.unpack(">4sII", data[:12])
+        if signature != b"DIRC" or version not in (2, 3, 4):
+            raise GitError(f"Unsupported index format (version {version})")
+
+        entries = []
+        pos = 12
+        previous_path = b""
+        for _ in range(count):
+            start = pos
+            fields = struct.unpack(">10I20sH", data[pos : pos + 62])
+            mtime_ns = fields[2] * 1_000_000_000 + fields[3]
+            mode, size, sha, flags = fields[6], fields[9], fields[10], fields[11]
+            pos += 62
+            if flags & 0x4000:  # Extended flags (version 3+)
+                pos += 2
+            if version == 4:
+                # Path is stored as "strip N bytes from the previous path" + NUL-terminated suffix
+                byte = data[pos]
+                pos += 1
+                strip = byte & 0x7F
+                while byte & 0x80:
+                    byte = data[pos]
+                    pos += 1
+                    strip = ((strip + 1) << 7) | (byte & 0x7F)
+                nul = data.index(b"\x00", pos)
+                path = previous_path[: len(previous_path) - strip] + data[pos:nul]
+                pos = nul + 1
+            else:
+                nul = data.index(b"\x00", pos)
+                path = data[pos:nul]
+                # Entries are NUL-padded to a multiple of 8 bytes
+                pos = start + ((nul - start) // 8 + 1) * 8
+            previous_path = path
+            entries.append(
+                IndexEntry(
+                    path.decode("utf-8", errors="surrogateescape"),
+                    sha.hex(),
+                    mode,
+                    size,
+                    mtime_ns,
+                    (flags >> 12) & 3,
+                )
+            )
+        return entries
+
+
+def hash_blob(data: bytes) -> str:
+    """Returns the sha git would assign to a blob with this content."""
+    return hashlib.sha1(b"blob %d\x00" % len(data) + data).hexdigest()
+
+
+def _mtime_matches(actual_ns: int, indexed_ns: int) -> bool:
+    # Git builds without nanosecond support store 0 in the nanoseconds field
+    if indexed_ns % 1_000_000_000 == 0:
+        return actual_ns // 1_000_000_000 == indexed_ns // 1_000_000_000
+    return actual_ns == indexed_ns
+
+
+def changed_paths_since(repo: GitRepository, rev: str) -> Dict[str, str]:
+    """
+    Returns the paths (posix, relative to the work tree) whose content differs between rev and
+    the working tree, mapped to "added", "modified" or "deleted". Untracked files are not listed.
+    Working files are only hashed when their size or mtime differ from the index entry.
+    """
+    base = {entry.path: entry.sha for entry in repo.iter_tree(repo.commit_tree(repo.resolve(rev)))}
+    changed: Dict[str, str] = {}
+    seen = set()
+    work_tree = repo.work_tree
+
+    for entry in repo.read_index():
+        if entry.stage > 1:
+            continue  # Only look at one side of a merge conflict
+        seen.add(entry.path)
+        file_path = work_tree / entry.path
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            if entry.path in base:
+                changed[entry.path] = "deleted"
+            continue
+
+        sha = entry.sha
+        if st.st_size != entry.size or not _mtime_matches(st.st_mtime_ns, entry.mtime_ns):
+            # The index is stale for this file: compare the actual content
+            try:
+                sha = hash_blob(file_path.read_bytes())
+            except OSError as e:
+                logger.warning(f"Could not read {file_path}: {e}")
+                continue
+
+        if entry.path not in base:
+            changed[entry.path] = "added"
+        elif base[entry.path] != sha:
+            changed[entry.path] = "modified"
+
+    for path in base.keys() - seen:
+        changed[path] = "deleted"
+    return changed
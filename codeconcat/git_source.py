@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# codeconcat/git_source.py
+"""
+Source backend reading the files of a commit straight from the object database, without
+checking it out. Trees are walked in git order, excluded directories are pruned before their
+subtrees are read, and blobs go through the same filters and formatting as archive members.
+"""
+
+import io
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pathspec
+
+from .archive import Member, member_entries
+from .encoding import DEFAULT_FALLBACKS
+from .file_utils import PathFilter
+from .git_objects import GitError, GitRepository
+from .stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+TREE_MODE = 0o040000
+# Regular and executable files; symlinks (0o120000) and submodules (0o160000) are skipped
+BLOB_MODES = (0o100644, 0o100755, 0o100664)
+
+
+def _subtree(repo: GitRepository, tree_sha: str, prefix: str) -> Optional[str]:
+    """Returns the sha of the tree at the posix path prefix ("" for the root), or None."""
+    for name in filter(None, prefix.split("/")):
+        entry = next((e for e in repo.read_tree(tree_sha) if e.path == name and e.mode == TREE_MODE), None)
+        if entry is None:
+            return None
+        tree_sha = entry.sha
+    return tree_sha
+
+
+def _gitignore_at_rev(repo: GitRepository, root_tree: str, src_prefix: str) -> Optional[pathspec.PathSpec]:
+    """Combines the .gitignore files of src_prefix and its parent directories, as of the commit."""
+    parts = [p for p in src_prefix.split("/") if p]
+    patterns: List[str] = []
+    for depth in range(len(parts), -1, -1):
+        tree_sha = _subtree(repo, root_tree, "/".join(parts[:depth]))
+        entry = (
+            next((e for e in repo.read_tree(tree_sha) if e.path == ".gitignore"), None) if tree_sha else None
+        )
+        if entry is None or entry.mode not in BLOB_MODES:
+            continue
+        lines = repo.read_object(entry.sha)[1].decode("utf-8", errors="replace").splitlines()
+        patterns.extend(line for line in lines if line.strip() and not line.strip().startswith("#"))
+    if not patterns:
+        return None
+    return pathspec.PathSpec.from_lines(pathspec.patterns.GitWildMatchPattern, patterns)
+
+
+class _LazyBlob(io.BytesIO):
+    """A blob inflated on its first read, so that blobs filtered out by size never are."""
+
+    def __init__(self, repo: GitRepository, sha: str) -> None:
+        super().__init__()
+        self._repo = repo
+        self._sha: Optional[str] = sha
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if self._sha is not None:
+            self.write(self._repo.read_object(self._sha)[1])
+            self.seek(0)
+            self._sha = None
+        return super().read(size)
+
+
+def _tree_members(
+    repo: GitRepository, tree_sha: str, path_filter: PathFilter, prefix: str = ""
+) -> Iterator[Member]:
+    """
+    Yields the blobs under a tree, pruning excluded directories and skipping excluded files
+    unread. Sizes come from the object headers: blobs are only inflated when read.
+    """
+    for entry in repo.read_tree(tree_sha):
+        path = prefix + entry.path
+        if entry.mode == TREE_MODE:
+            if not path_filter.excludes_dir(path):
+                yield from _tree_members(repo, entry.sha, path_filter, path + "/")
+        elif entry.mode in BLOB_MODES and not path_filter.excludes_file(path):
+            yield path, repo.object_size(entry.sha), _LazyBlob(repo, entry.sha)
+
+
+def rev_entries(
+    src_path: Path,
+    rev: str,
+    exclude_patterns: List[str],
+    whitelist_patterns: List[str],
+    use_gitignore: bool,
+    max_file_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    oversize_policy: str = "skip",
+    stats: Optional[RunStats] = None,
+    encoding_fallbacks: Sequence[str] = DEFAULT_FALLBACKS,
+    classifier: str = "builtin",
+) -> Iterator[Tuple[str, Iterator[str]]]:
+    """
+    Yields (path relative to src_path, content chunks) for the files under src_path as of the
+    commit rev (branch, tag, sha, with ~N / ^N suffixes), read from the repository containing
+    src_path. The .gitignore files used are those of the commit, not of the working tree.
+    """
+    stats = stats if stats is not None else RunStats()
+    repo = GitRepository.discover(src_path)
+    if repo is None:
+        raise GitError(f"{src_path} is not inside a git repository")
+    try:
+        commit = repo.resolve(rev)
+        root_tree = repo.commit_tree(commit)
+        src_prefix = src_path.resolve().relative_to(repo.work_tree.resolve()).as_posix()
+        src_prefix = "" if src_prefix == "." else src_prefix
+        tree_sha = _subtree(repo, root_tree, src_prefix)
+        if tree_sha is None:
+            raise GitError(f"{src_prefix} does not exist in {rev}")
+        logger.info(f"Reading {rev} ({commit[:12]}) from {repo.git_dir}")
+
+        spec = _gitignore_at_rev(repo, root_tree, src_prefix) if use_gitignore else None
+        path_filter = PathFilter(exclude_patterns, whitelist_patterns, spec)
+        yield from member_entries(
+            _tree_members(repo, tree_sha, path_filter),
+            exclude_patterns,
+            whitelist_patterns,
+            gitignore_spec=spec,
+            max_file_bytes=max_file_bytes,
+            max_total_bytes=max_total_bytes,
+            oversize_policy=oversize_policy,
+            stats=stats,
+            encoding_fallbacks=encoding_fallbacks,
+            classifier=classifier,
+        )
+    finally:
+        stats.incr("object_cache_hits", repo.cache.hits)
+        stats.incr("object_cache_misses", repo.cache.misses)
+        repo.close()
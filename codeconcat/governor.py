@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# codeconcat/governor.py
+"""
+Resource governor for runs on shared hosts: caps the read rate and the number of open files,
+and keeps the files a run reads and writes from crowding the page cache.
+
+Inputs (source files, classified files, archives) are opened through open_input(): reads are
+charged to a token bucket refilled at max_read_rate bytes per second, and a reader that
+overdraws it sleeps until the debt is repaid; a slot of the max_open_files semaphore is held
+from open to close (directory scans also take one). With drop_cache, inputs are opened with a
+sequential read-ahead hint and dropped from the page cache when closed, and file outputs are
+synced and dropped every flush_bytes written. The output write buffer is output_buffer bytes.
+Like trace, the governor is process-wide and off unless start() is called; waits are counted
+in the run stats and recorded as trace spans. Process pools (--outline) start a governor in
+each worker with an equal share of the limits (see worker_settings), whose waits are not
+counted in the parent's stats.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import IO, BinaryIO, Callable, ContextManager, Iterator, Optional, Tuple
+
+from . import trace
+from .stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+# Output written between syncs (and page cache drops) with drop_cache, unless output_buffer is set
+DEFAULT_FLUSH_BYTES = 8 * 1024 * 1024
+READ_BUFFER_BYTES = 64 * 1024
+_CAN_ADVISE = hasattr(os, "posix_fadvise")
+
+
+def _advise(fd: int, offset: int, length: int, advice_name: str) -> None:
+    """posix_fadvise where the platform has it; advice is only a hint, so failures are ignored."""
+    if not _CAN_ADVISE:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, advice_name))
+    except OSError:
+        pass
+
+
+class TokenBucket:
+    """Rate limiter: rate tokens per second, up to one second's worth saved up."""
+
+    def __init__(
+        self,
+        rate: float,
+        clock: Optional[Callable[[], float]] = None,
+        sleep: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self._clock = clock or time.monotonic
+        self._sleep = sleep or time.sleep
+        self._tokens = rate
+        self._updated = self._clock()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> float:
+        """Takes amount tokens, sleeping while the bucket is in debt; returns the seconds slept."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate) - amount
+            self._updated = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        # Sleep outside the lock: later readers see the deeper debt and wait longer
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class _GovernedFileIO(io.FileIO):
+    """A read-only raw file whose reads are charged to the governor and that holds an open-file slot."""
+
+    def __init__(self, path: str, governor: "Governor") -> None:
+        self._governor = governor
+        governor.acquire_file(path)
+        try:
+            super().__init__(path, "rb")
+        except BaseException:
+            governor.release_file()
+            raise
+        if governor.drop_cache:
+            _advise(self.fileno(), 0, 0, "POSIX_FADV_SEQUENTIAL")
+
+    def read(self, size: int = -1) -> bytes:  # type: ignore[override]
+        data = super().read(size)
+        self._governor.charge(len(data) if data else 0, self.name)
+        return data
+
+    def readinto(self, buffer) -> int:  # type: ignore[no-untyped-def, override]
+        count = super().readinto(buffer)
+        self._governor.charge(count or 0, self.name)
+        return count
+
+    def readall(self) -> bytes:
+        data = super().readall()
+        self._governor.charge(len(data), self.name)
+        return data
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self._governor.drop_cache:
+            _advise(self.fileno(), 0, 0, "POSIX_FADV_DONTNEED")
+        try:
+            super().close()
+        finally:
+            self._governor.release_file()
+
+
+class Governor:
+    def __init__(
+        self,
+        max_read_rate: Optional[int] = None,
+        max_open_files: Optional[int] = None,
+        drop_cache: bool = False,
+        output_buffer: Optional[int] = None,
+        stats: Optional[RunStats] = None,
+        clock: Optional[Callable[[], float]] = None,
+        sleep: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        if max_open_files is not None and max_open_files < 1:
+            raise ValueError(f"Open file limit must be positive, got {max_open_files}")
+        if output_buffer is not None and output_buffer < 1:
+            raise ValueError(f"Output buffer must be positive, got {output_buffer}")
+        self.bucket = TokenBucket(max_read_rate, clock, sleep) if max_read_rate else None
+        self.max_open_files = max_open_files
+        self._files = threading.BoundedSemaphore(max_open_files) if max_open_files else None
+        self.drop_cache = drop_cache
+        self.output_buffer = output_buffer
+        self.flush_bytes = output_buffer or DEFAULT_FLUSH_BYTES
+        self.stats = stats if stats is not None else RunStats()
+
+    def charge(self, amount: int, path: Optional[str] = None) -> None:
+        """Accounts for amount bytes read, sleeping if the read rate is over the limit."""
+        if self.bucket is None or not amount:
+            return
+        with trace.span("throttle", "governor", path):
+            waited = self.bucket.consume(amount)
+        if waited:
+            self.stats.incr("read_throttles")
+            self.stats.incr("read_throttle_ms", round(waited * 1000))
+
+    def acquire_file(self, path: Optional[str] = None) -> None:
+        """Takes an open-file slot, waiting for one if all are held."""
+        if self._files is None or self._files.acquire(blocking=False):
+            return
+        started = time.monotonic()
+        with trace.span("wait_file", "governor", path):
+            self._files.acquire()
+        self.stats.incr("open_file_waits")
+        self.stats.incr("open_file_wait_ms", round((time.monotonic() - started) * 1000))
+
+    def release_file(self) -> None:
+        if self._files is not None:
+            self._files.release()
+
+    @contextmanager
+    def file_slot(self, path: Optional[str] = None) -> Iterator[None]:
+        """Holds an open-file slot, e.g. while a directory is scanned."""
+        self.acquire_file(path)
+        try:
+            yield
+        finally:
+            self.release_file()
+
+    def open(self, path: str) -> BinaryIO:
+        """Opens a file for reading, like open(path, "rb"), under the governor's limits."""
+        return io.BufferedReader(_GovernedFileIO(path, self), READ_BUFFER_BYTES)
+
+    def drop_written(self, stream: IO, dropped: int) -> int:
+        """
+        With drop_cache, once flush_bytes have been written to a file output past offset dropped,
+        flushes and syncs them and drops them from the page cache. Returns the offset dropped up to.
+        """
+        if not self.drop_cache:
+            return dropped
+        position = stream.tell()
+        if position - dropped < self.flush_bytes:
+            return dropped
+        stream.flush()
+        fd = stream.fileno()
+        # Dirty pages cannot be dropped: write them out first
+        getattr(os, "fdatasync", os.fsync)(fd)
+        _advise(fd, dropped, position - dropped, "POSIX_FADV_DONTNEED")
+        self.stats.incr("output_cache_drops")
+        return position
+
+
+_active: Optional[Governor] = None
+
+
+def start(governor: Optional[Governor]) -> None:
+    """Puts governor in charge of the reads and writes of this process (None: no limits)."""
+    global _active
+    _active = governor
+    if governor is not None and governor.drop_cache and not _CAN_ADVISE:
+        logger.warning("posix_fadvise is not available on this platform; page cache hints are skipped.")
+
+
+def stop() -> None:
+    global _active
+    _active = None
+
+
+# (max_read_rate, max_open_files, drop_cache) of a pool worker's governor
+WorkerSettings = Tuple[Optional[int], Optional[int], bool]
+
+
+def pool_size(workers: int) -> int:
+    """Caps a process pool at the active governor's open-file limit: each worker reads one file at a time."""
+    governor = _active
+    if governor is None or not governor.max_open_files:
+        return workers
+    return max(1, min(workers, governor.max_open_files))
+
+
+def worker_settings(workers: int) -> Optional[WorkerSettings]:
+    """
+    The limits of each of `workers` pool processes, so that together they stay within the active
+    governor's: an equal share of the read rate and one open file. None without a governor.
+    """
+    governor = _active
+    if governor is None:
+        return None
+    rate = max(1, int(governor.bucket.rate) // workers) if governor.bucket is not None else None
+    return rate, 1 if governor.max_open_files else None, governor.drop_cache
+
+
+def start_worker(settings: Optional[WorkerSettings]) -> None:
+    """Process pool initializer: starts a governor with the limits from worker_settings()."""
+    if settings is not None:
+        start(Governor(*settings))
+
+
+def open_input(path: str) -> BinaryIO:
+    """Opens a source file for reading, under the active governor's limits if any."""
+    governor = _active
+    return open(path, "rb") if governor is None else governor.open(path)
+
+
+def file_slot(path: Optional[str] = None) -> ContextManager[None]:
+    """Holds one of the active governor's open-file slots, if any (e.g. around a directory scan)."""
+    governor = _active
+    return nullcontext() if governor is None else governor.file_slot(path)
+
+
+def output_buffering() -> int:
+    """The buffering argument for opening outputs: the governor's output_buffer, else the default."""
+    governor = _active
+    return governor.output_buffer if governor is not None and governor.output_buffer else -1
+
+
+def drop_written(stream: IO, dropped: int) -> int:
+    """See Governor.drop_written; a no-op without an active governor."""
+    governor = _active
+    return dropped if governor is None else governor.drop_written(stream, dropped)
@@ -4,18 +4,85 @@ import argparse
 import logging
 import re
 import sys
+import tarfile
+import zipfile
 from pathlib import Path
+from typing import Any, Dict, List
 
 # Import from local modules
+from . import governor, trace
+from .archive import archive_entries, is_archive
+from .async_io import IO_ENGINES
+from .changes import filter_changed_by_snapshot, git_changed_paths
 from .config import DEFAULT_CONFIG, get_config
-from .file_utils import generate_directory_tree
-from .output import create_output
+from .deadline import Deadline
+from .encoding import check_encodings
+from .estimate import DEFAULT_TOP_PATHS, estimate_tree, format_estimate
+from .file_utils import OVERSIZE_POLICIES, PRIORITY_ORDERS, generate_directory_tree
+from .git_objects import GitError
+from .git_source import rev_entries
+from .governor import Governor
+from .outline import compute_outlines, default_cache_dir
+from .output import create_output, write_entries
+from .partition import Partition, PartSink, index_path, merge_parts
+from .sinks import parse_sink_spec
+from .sniff import CLASSIFIERS
+from .stats import RunStats
+from .transforms import TRANSFORM_NAMES, TransformPipeline
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
 
+SIZE_SUFFIXES = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    """Parses a byte count with an optional k/M/G suffix (e.g. '512k', '2M')."""
+    match = re.fullmatch(r"\s*(\d+)\s*([kKmMgG]?)[bB]?\s*", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {value!r}")
+    return int(match.group(1)) * SIZE_SUFFIXES[match.group(2).lower()]
+
+
+DURATION_SUFFIXES = {"ms": 0.001, "s": 1, "": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float:
+    """Parses a duration in seconds with an optional ms/s/m/h suffix (e.g. '500ms', '2s', '1.5m')."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d*)?|\.\d+)\s*(ms|s|m|h|)\s*", value.lower())
+    if not match or float(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid duration: {value!r}")
+    return float(match.group(1)) * DURATION_SUFFIXES[match.group(2)]
+
+
+def parse_priority(value: str) -> List[str]:
+    """Parses a comma-separated list of priority orders (e.g. 'patterns,shallow')."""
+    orders = [order.strip() for order in value.split(",") if order.strip()]
+    unknown = [order for order in orders if order not in PRIORITY_ORDERS]
+    if not orders or unknown:
+        raise argparse.ArgumentTypeError(
+            f"Invalid priority {value!r}; expected orders among {', '.join(PRIORITY_ORDERS)}"
+        )
+    return orders
+
+
+def parse_partition(value: str) -> Partition:
+    """Parses I/K, partition I (1-based) of K."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"Invalid partition {value!r}; expected I/K with 1 <= I <= K")
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_setting(config: Dict[str, Any], key: str, cli_value: Any) -> Any:
+    """Returns the CLI value if one was given, else the config value, else the default."""
+    if cli_value is not None:
+        return cli_value
+    return config.get(key, DEFAULT_CONFIG[key])
+
+
 def parse_arguments() -> argparse.Namespace:
     """Parses command line arguments."""
     parser = argparse.ArgumentParser(
@@ -51,20 +118,312 @@ def parse_arguments() -> argparse.Namespace:
         action="store_true",
         help="Output the concatenated content to stdout instead of a file.",
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Walk and filter the tree without reading any file, and print the estimated output size: "
+            "bytes and tokens in total and per top-level directory, file counts and the heaviest files."
+        ),
+    )
+    parser.add_argument(
+        "--dry-run-top",
+        type=int,
+        default=DEFAULT_TOP_PATHS,
+        metavar="N",
+        help=f"Number of heaviest files listed by --dry-run (default: {DEFAULT_TOP_PATHS}).",
+    )
     parser.add_argument(
         "--no-gitignore",
         action="store_true",
         help="Do not use .gitignore files for exclusion patterns.",
     )
+    parser.add_argument(
+        "--max-file-bytes",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Per-file size limit (e.g. 512k, 2M). Larger files are skipped or truncated.",
+    )
+    parser.add_argument(
+        "--max-total-bytes",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Total size budget for all included files; files that do not fit are skipped.",
+    )
+    parser.add_argument(
+        "--oversize",
+        choices=OVERSIZE_POLICIES,
+        default=None,
+        help="What to do with files over --max-file-bytes: skip them or keep only head and tail.",
+    )
+    parser.add_argument(
+        "--follow-symlinks",
+        action="store_true",
+        default=None,
+        help=(
+            "Walk into symlinked directories. Cycles are broken and each physical file is emitted "
+            "once, with the other paths it was reached by listed as aliases."
+        ),
+    )
+    parser.add_argument(
+        "--changed-since",
+        default=None,
+        metavar="REF",
+        help=(
+            "Only include files added or modified since REF (branch, tag or commit), read from .git "
+            "without walking the tree. The source must be inside a git repository."
+        ),
+    )
+    parser.add_argument(
+        "--changed-since-snapshot",
+        default=None,
+        metavar="FILE",
+        help=(
+            "Only include files whose mtime or size differ from the snapshot FILE (all files if it does "
+            "not exist yet), then update FILE. For sources outside a git repository."
+        ),
+    )
+    parser.add_argument(
+        "--rev",
+        default=None,
+        metavar="COMMIT",
+        help=(
+            "Concatenate the files of COMMIT (branch, tag or sha) as committed, read directly from "
+            ".git without checking it out. source_path must be inside the repository's work tree."
+        ),
+    )
+    parser.add_argument(
+        "--classifier",
+        choices=CLASSIFIERS,
+        default=None,
+        help="Backend deciding whether files without a known extension are text or binary.",
+    )
+    parser.add_argument(
+        "--no-single-read",
+        action="store_true",
+        default=False,
+        help="Classify files while walking instead of from the bytes read for output (opens files twice).",
+    )
+    parser.add_argument(
+        "--transform",
+        action="append",
+        choices=TRANSFORM_NAMES,
+        default=None,
+        help=(
+            "Streaming content transform to shrink the output. Can be used multiple times. "
+            "strip-header and strip-comments apply to languages with known comment syntax."
+        ),
+    )
+    parser.add_argument(
+        "--outline",
+        action="store_true",
+        default=None,
+        help=(
+            "Emit only imports, class/function signatures and docstrings of Python and "
+            "JavaScript/TypeScript files; other files are emitted in full."
+        ),
+    )
+    parser.add_argument(
+        "--outline-workers",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of processes parsing files for --outline (default: CPU count).",
+    )
+    parser.add_argument(
+        "--outline-cache-dir",
+        default=None,
+        metavar="DIR",
+        help="Where --outline caches outlines by content hash (default: ~/.cache/codeconcat/outlines).",
+    )
+    parser.add_argument(
+        "--sink",
+        action="append",
+        default=None,
+        metavar="SPEC",
+        help=(
+            "Extra output written in the same pass, as TARGET[,filter=REGEX][,format=text|markdown|jsonl]; "
+            "TARGET is a file path or - for stdout, REGEX selects files by relative path. "
+            "Can be used multiple times; each file is still read once."
+        ),
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=parse_duration,
+        default=None,
+        metavar="DURATION",
+        help=(
+            "Best-effort mode: stop walking at half of DURATION (e.g. 2s, 500ms) and stop writing at "
+            "DURATION, ending the output with a footer giving the fraction of files covered."
+        ),
+    )
+    parser.add_argument(
+        "--priority",
+        type=parse_priority,
+        default=None,
+        metavar="ORDER[,ORDER]",
+        help=(
+            f"Order files are written in, most significant first, among {', '.join(PRIORITY_ORDERS)}: "
+            "shallow paths first, recently modified first, --priority-pattern matches first; "
+            "ties are broken by path. Decides what fits in --time-budget and --max-total-bytes."
+        ),
+    )
+    parser.add_argument(
+        "--priority-pattern",
+        action="append",
+        default=None,
+        metavar="REGEX",
+        help="Relative path regex whose files come first with --priority patterns. Can be repeated.",
+    )
+    parser.add_argument(
+        "--partition",
+        type=parse_partition,
+        default=None,
+        metavar="I/K",
+        help=(
+            "Process only partition I of K: the top-level files and directories whose name hashes to I. "
+            "Writes destination_file and an index next to it; combine all K with 'codeconcat merge'."
+        ),
+    )
+    parser.add_argument(
+        "--contains",
+        action="append",
+        default=None,
+        metavar="STRING",
+        help=(
+            "Only emit files whose text contains STRING (a literal, case-sensitive). Can be used "
+            "multiple times: files containing any of the strings are emitted. Matched before --transform."
+        ),
+    )
+    parser.add_argument(
+        "--encoding-fallback",
+        action="append",
+        default=None,
+        metavar="ENCODING",
+        help=(
+            "Encoding tried, in order, for files that have no BOM and are not valid UTF-8 "
+            "(default: cp1252, then latin-1). Can be used multiple times."
+        ),
+    )
+    parser.add_argument(
+        "--io-engine",
+        choices=IO_ENGINES,
+        default=None,
+        help="How file contents are read: one at a time, or concurrently (helps on network storage).",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of concurrent reads for --io-engine async.",
+    )
+    parser.add_argument(
+        "--max-buffered-bytes",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Memory cap for content read ahead by --io-engine async before it is written.",
+    )
+    parser.add_argument(
+        "--max-read-rate",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Limit reads from the source to SIZE bytes per second (e.g. 20M), to share disk bandwidth.",
+    )
+    parser.add_argument(
+        "--max-open-files",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Limit the source files and directories open at once to N (readers wait for a free slot).",
+    )
+    parser.add_argument(
+        "--drop-cache",
+        action="store_true",
+        default=None,
+        help=(
+            "Keep the run from filling the page cache: sources are read with a sequential hint and "
+            "dropped from the cache once read, outputs are synced and dropped as they are written."
+        ),
+    )
+    parser.add_argument(
+        "--output-buffer",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Output write buffer size; with --drop-cache, outputs are also synced every SIZE bytes.",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="FILE",
+        help=(
+            "Record a per-file timeline of each stage (scandir, stat, pattern, gitignore, classify, "
+            "open, read, write) to FILE in Chrome trace format, for Perfetto or chrome://tracing."
+        ),
+    )
+    parser.add_argument(
+        "--trace-capacity",
+        type=int,
+        default=trace.DEFAULT_CAPACITY,
+        metavar="N",
+        help="Spans kept by --trace; past this, the oldest spans are dropped.",
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose debug logging.")
 
     return parser.parse_args()
 
 
+def merge_main(argv: List[str]) -> None:
+    """codeconcat merge OUTPUT PART...: combines the outputs of --partition runs."""
+    parser = argparse.ArgumentParser(
+        prog="codeconcat merge",
+        description=(
+            "Combine the part files of all K --partition runs (each with its .index.json) into "
+            "the output a single run would have written."
+        ),
+    )
+    parser.add_argument("output", help="Path of the merged output file.")
+    parser.add_argument("parts", nargs="+", help="Part files written by --partition I/K, for I = 1..K.")
+    args = parser.parse_args(argv)
+    try:
+        count = merge_parts(Path(args.output), args.parts)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not merge parts: {e}")
+        sys.exit(1)
+    logger.info(f"Merged {count} files from {len(args.parts)} parts into {args.output}")
+
+
 def main() -> None:
     """Main execution function."""
+    if sys.argv[1:2] == ["merge"]:
+        merge_main(sys.argv[2:])
+        return
     args = parse_arguments()
+    if args.trace:
+        try:
+            trace.start(args.trace_capacity)
+        except ValueError as e:
+            logger.error(f"Error: {e}")
+            sys.exit(1)
+    try:
+        run(args)
+    finally:
+        governor.stop()
+        tracer = trace.stop()
+        if tracer is not None:
+            try:
+                tracer.export(Path(args.trace))
+            except OSError as e:
+                logger.error(f"Could not write trace {args.trace}: {e}")
+
 
+def run(args: argparse.Namespace) -> None:
+    """Runs a concatenation with the parsed command line arguments."""
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
         logger.debug("Verbose logging enabled.")
@@ -94,19 +453,104 @@ def main() -> None:
         else config.get("whitelist_patterns", DEFAULT_CONFIG["whitelist_patterns"])
     )
 
+    follow_symlinks = get_setting(config, "follow_symlinks", args.follow_symlinks)
+    max_file_bytes = get_setting(config, "max_file_bytes", args.max_file_bytes)
+    max_total_bytes = get_setting(config, "max_total_bytes", args.max_total_bytes)
+    oversize_policy = get_setting(config, "oversize_policy", args.oversize)
+    classifier = get_setting(config, "classifier", args.classifier)
+    single_read = get_setting(config, "single_read", False if args.no_single_read else None)
+    # Only the builtin sniffer can classify from an in-memory prefix; whitelisted runs never classify.
+    # A total budget is applied by the walk, so binary files must be dropped before it is spent.
+    defer_classification = (
+        bool(single_read)
+        and classifier == "builtin"
+        and not any(final_whitelist_patterns or [])
+        and max_total_bytes is None
+    )
+    try:
+        transforms = TransformPipeline(get_setting(config, "transforms", args.transform))
+    except ValueError as e:
+        logger.error(f"Error: {e}")
+        sys.exit(1)
+    outline = get_setting(config, "outline", args.outline)
+    outline_workers = get_setting(config, "outline_workers", args.outline_workers)
+    outline_cache_dir = get_setting(config, "outline_cache_dir", args.outline_cache_dir)
+    time_budget = get_setting(config, "time_budget", args.time_budget)
+    priority = get_setting(config, "priority", args.priority)
+    priority_patterns = get_setting(config, "priority_patterns", args.priority_pattern)
+    encoding_fallbacks = get_setting(config, "encoding_fallbacks", args.encoding_fallback)
+    try:
+        check_encodings(encoding_fallbacks)
+    except ValueError as e:
+        logger.error(f"Error: {e}")
+        sys.exit(1)
+    io_engine = get_setting(config, "io_engine", args.io_engine)
+    max_in_flight = get_setting(config, "max_in_flight", args.max_in_flight)
+    max_buffered_bytes = get_setting(config, "max_buffered_bytes", args.max_buffered_bytes)
+    max_read_rate = get_setting(config, "max_read_rate", args.max_read_rate)
+    max_open_files = get_setting(config, "max_open_files", args.max_open_files)
+    drop_cache = get_setting(config, "drop_cache", args.drop_cache)
+    output_buffer = get_setting(config, "output_buffer", args.output_buffer)
+
+    try:
+        sinks = [parse_sink_spec(spec) for spec in args.sink or []]
+    except ValueError as e:
+        logger.error(f"Error: {e}")
+        sys.exit(1)
+
+    if args.contains is not None and not any(args.contains):
+        logger.error("Error: --contains needs a non-empty string.")
+        sys.exit(1)
+
+    if args.dry_run and (args.rev or is_archive(Path(args.source_path))):
+        logger.error("Error: --dry-run only applies to directory sources.")
+        sys.exit(1)
+    if args.dry_run and (args.contains or outline):
+        logger.warning("--contains and --outline need file contents; the dry run estimate ignores them.")
+
     # Ensure output target is valid
-    if not args.destination_file and not args.stdout:
-        logger.error("Error: Either destination_file or --stdout must be specified.")
+    if not args.destination_file and not args.stdout and not sinks and not args.dry_run:
+        logger.error("Error: Either destination_file, --stdout or --sink must be specified.")
         sys.exit(1)
     if args.destination_file and args.stdout:
         logger.error("Error: Cannot specify both destination_file and --stdout.")
         sys.exit(1)
+    if int(bool(args.stdout)) + sum(sink.to_stdout for sink in sinks) > 1:
+        logger.error("Error: Only one output can be written to stdout.")
+        sys.exit(1)
 
-    # Add destination file to exclude patterns if it's specified AND inside source_path
-    if args.destination_file:
+    # A partition writes its part and index to destination_file; merged parts must match a single run
+    output_path = args.destination_file
+    if args.partition is not None:
+        conflicts = {
+            "--stdout": args.stdout,
+            "--sink": sinks,
+            "--rev": args.rev,
+            "--time-budget": time_budget,
+            "--max-total-bytes": max_total_bytes,
+            "--priority": any(order != "path" for order in priority),
+            "--follow-symlinks": follow_symlinks,
+            "--transform strip-header": "strip-header" in transforms.names,
+            "an archive source": is_archive(Path(args.source_path)),
+        }
+        used = [name for name, value in conflicts.items() if value]
+        if used or not (args.destination_file or args.dry_run):
+            reason = f"cannot be combined with {', '.join(used)}" if used else "needs a destination_file"
+            logger.error(f"Error: --partition {reason}.")
+            sys.exit(1)
+        # A dry run only estimates the partition: no part or index is written
+        sinks = [] if args.dry_run else [PartSink(args.destination_file, args.partition)]
+        output_path = None
+
+    # Add destination files to exclude patterns if they're specified AND inside source_path
+    output_files = [args.destination_file] if args.destination_file else []
+    output_files += [sink.target for sink in sinks if not sink.to_stdout]
+    output_files += [args.trace] if args.trace else []
+    output_files += [index_path(args.destination_file)] if args.partition and args.destination_file else []
+    for destination_file in output_files:
         try:
             src_path_abs = Path(args.source_path).resolve()
-            dest_path_abs = Path(args.destination_file).resolve()
+            dest_path_abs = Path(destination_file).resolve()
 
             # Check if destination is within source directory using is_relative_to
             if dest_path_abs.is_relative_to(src_path_abs):
@@ -132,7 +576,7 @@ def main() -> None:
             logger.debug("Destination file is not within the source directory, no implicit exclusion needed.")
         except OSError as e:  # Catch potential path resolution errors
             logger.warning(
-                f"Could not reliably check if destination '{args.destination_file}'",
+                f"Could not reliably check if destination '{destination_file}'",
                 f"is within source '{args.source_path}'. "
                 f"Manual exclusion might be needed if it is. Error: {e}",
             )
@@ -150,10 +594,114 @@ def main() -> None:
         "stdout" if args.stdout else Path(args.destination_file).resolve() if args.destination_file else "N/A"
     )
     logger.info(f"Output Target: {output_target}")  # Log resolved path
+    for sink in sinks:
+        sink_filter = sink.path_pattern.pattern if sink.path_pattern else "all files"
+        logger.info(f"Sink: {sink.describe()} ({sink.format}, {sink_filter})")
     logger.info(f"Using .gitignore: {use_gitignore}")
     # Use pprint or similar if lists get too long? For now, just log.
     logger.info(f"Final Exclude Patterns: {final_exclude_patterns}")
     logger.info(f"Final Whitelist Patterns: {final_whitelist_patterns}")
+    if max_file_bytes is not None or max_total_bytes is not None:
+        logger.info(
+            f"Size Limits: per-file={max_file_bytes} total={max_total_bytes} oversize={oversize_policy}"
+        )
+    stats = RunStats()
+    aliases: Dict[str, List[str]] = {}
+    try:
+        deadline = Deadline(float(time_budget)) if time_budget else None
+        if max_read_rate or max_open_files or drop_cache or output_buffer:
+            governor.start(Governor(max_read_rate, max_open_files, bool(drop_cache), output_buffer, stats))
+    except ValueError as e:
+        logger.error(f"Error: {e}")
+        sys.exit(1)
+
+    # --- Archive Source ---
+    if is_archive(Path(args.source_path)):
+        if args.changed_since or args.changed_since_snapshot or outline:
+            logger.warning("--changed-since and --outline do not apply to archive sources; ignoring them.")
+        try:
+            entries = archive_entries(
+                Path(args.source_path),
+                final_exclude_patterns,
+                final_whitelist_patterns,
+                use_gitignore,
+                max_file_bytes=max_file_bytes,
+                max_total_bytes=max_total_bytes,
+                oversize_policy=oversize_policy,
+                stats=stats,
+                encoding_fallbacks=encoding_fallbacks,
+                classifier=classifier,
+            )
+            write_entries(
+                args.destination_file,
+                entries,
+                args.stdout,
+                stats=stats,
+                transforms=transforms,
+                sinks=sinks,
+                deadline=deadline,
+                contains=args.contains,
+            )
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            logger.error(f"Could not read archive {args.source_path}: {e}", exc_info=args.verbose)
+            sys.exit(1)
+        stats.log_summary()
+        return
+
+    # --- Git Revision Source ---
+    if args.rev:
+        if args.changed_since or args.changed_since_snapshot or outline or follow_symlinks:
+            logger.warning(
+                "--changed-since, --outline and --follow-symlinks do not apply to --rev; ignoring them."
+            )
+        try:
+            entries = rev_entries(
+                Path(args.source_path),
+                args.rev,
+                final_exclude_patterns,
+                final_whitelist_patterns,
+                use_gitignore,
+                max_file_bytes=max_file_bytes,
+                max_total_bytes=max_total_bytes,
+                oversize_policy=oversize_policy,
+                stats=stats,
+                encoding_fallbacks=encoding_fallbacks,
+                classifier=classifier,
+            )
+            write_entries(
+                args.destination_file,
+                entries,
+                args.stdout,
+                stats=stats,
+                transforms=transforms,
+                sinks=sinks,
+                deadline=deadline,
+                contains=args.contains,
+            )
+        except (GitError, OSError, ValueError) as e:
+            logger.error(f"Could not read {args.rev}: {e}", exc_info=args.verbose)
+            sys.exit(1)
+        stats.log_summary()
+        return
+
+    # --- Changed Files Only ---
+    only_paths = None
+    snapshot_path = Path(args.changed_since_snapshot) if args.changed_since_snapshot else None
+    if args.changed_since and snapshot_path is not None:
+        logger.error("Error: Cannot specify both --changed-since and --changed-since-snapshot.")
+        sys.exit(1)
+    if args.changed_since:
+        try:
+            only_paths = git_changed_paths(Path(args.source_path), args.changed_since)
+        except (GitError, OSError, ValueError) as e:
+            logger.error(f"Could not compute changes since {args.changed_since}: {e}", exc_info=args.verbose)
+            sys.exit(1)
+        if only_paths is None:
+            logger.error(
+                f"Error: {args.source_path} is not inside a git repository, so --changed-since has no "
+                "ref to compare against; use --changed-since-snapshot FILE instead."
+            )
+            sys.exit(1)
 
     # --- Generate File List ---
     try:
@@ -163,25 +711,85 @@ def main() -> None:
             final_exclude_patterns,
             final_whitelist_patterns,
             use_gitignore,
+            max_file_bytes=max_file_bytes,
+            max_total_bytes=max_total_bytes,
+            oversize_policy=oversize_policy,
+            classifier=classifier,
+            # A dry run opens no file: content classification is left undone
+            defer_classification=defer_classification or args.dry_run,
+            only_paths=only_paths,
+            stats=stats,
+            follow_symlinks=follow_symlinks,
+            aliases=aliases,
+            priority=priority,
+            priority_patterns=priority_patterns,
+            deadline=deadline,
+            partition=args.partition,
         )
+        if snapshot_path is not None:
+            # A dry run leaves the snapshot as it is, for the real run to compare against
+            changed = set(
+                filter_changed_by_snapshot(
+                    tree, Path(args.source_path), snapshot_path, update=not args.dry_run
+                )
+            )
+            tree.retain(lambda file_path, size: file_path in changed)
     except Exception as e:
         logger.error(f"An error occurred during file collection: {e}", exc_info=args.verbose)
         sys.exit(1)
 
+    # --- Dry Run: report the estimate instead of writing ---
+    if args.dry_run:
+        estimate = estimate_tree(
+            tree,
+            Path(args.source_path).resolve(),
+            truncate_bytes=max_file_bytes if oversize_policy == "truncate" else None,
+            classified=bool(final_whitelist_patterns),  # Whitelisted files are never classified
+            top=args.dry_run_top,
+            # Estimated for the main output, else the first sink (a partition writes text)
+            sink_format=sinks[0].format if sinks and not (args.destination_file or args.stdout) else "text",
+        )
+        sys.stdout.write(format_estimate(estimate))
+        stats.log_summary()
+        return
+
     # --- Create Output ---
-    if tree:  # Only proceed if files were found
+    # Only proceed if files were found; empty partitions still get a part, and cut walks a footer
+    if tree or args.partition or (deadline is not None and deadline.cut_stages):
         try:
+            outlines = None
+            if outline:
+                outlines = compute_outlines(
+                    tree,
+                    workers=outline_workers,
+                    cache_dir=Path(outline_cache_dir) if outline_cache_dir else default_cache_dir(),
+                    stats=stats,
+                )
             # Pass resolved source path string for relative path calculation in output
             create_output(
-                args.destination_file,
+                output_path,
                 str(Path(args.source_path).resolve()),
                 tree,
                 args.stdout,
+                truncate_bytes=max_file_bytes if oversize_policy == "truncate" else None,
+                stats=stats,
+                io_engine=io_engine,
+                max_in_flight=max_in_flight,
+                max_buffered_bytes=max_buffered_bytes,
+                sniff_unlisted=defer_classification,
+                transforms=transforms,
+                outlines=outlines,
+                aliases=aliases,
+                sinks=sinks,
+                deadline=deadline,
+                encoding_fallbacks=encoding_fallbacks,
+                contains=args.contains,
             )
         except Exception as e:
             logger.error(f"An error occurred during output creation: {e}", exc_info=args.verbose)
             sys.exit(1)
     # If no tree, generate_directory_tree already logged a warning
+    stats.log_summary()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# codeconcat/outline.py
+"""
+Outline (skeleton) extraction: imports, class/function signatures and docstrings only.
+
+Python is parsed with `ast`; JavaScript/TypeScript use a lightweight line tokenizer that
+tracks brace and parenthesis depth. Parsing runs in a process pool since it is CPU-bound,
+and outlines are cached on disk by content hash.
+"""
+
+import ast
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import governor
+from .stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+# Bump when the outline format changes so stale cache entries are not reused
+OUTLINE_VERSION = "1"
+PYTHON_EXTENSIONS = (".py", ".pyi")
+SCRIPT_EXTENSIONS = (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts")
+OUTLINE_EXTENSIONS = PYTHON_EXTENSIONS + SCRIPT_EXTENSIONS
+# Below this many files, a process pool costs more to start than it saves
+MIN_FILES_FOR_POOL = 8
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "codeconcat" / "outlines"
+
+
+def supports_outline(file_path: str) -> bool:
+    return file_path.lower().endswith(OUTLINE_EXTENSIONS)
+
+
+# --- Python ---
+
+
+def _python_outline(source: str) -> str:
+    lines = source.splitlines(keepends=True)
+    tree = ast.parse(source)
+    out: List[str] = []
+
+    def segment(first: int, last: int) -> str:
+        return "".join(lines[first - 1 : last])
+
+    def docstring_of(node: ast.AST) -> Optional[ast.stmt]:
+        body = getattr(node, "body", [])
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+            if isinstance(body[0].value.value, str):
+                return body[0]
+        return None
+
+    def emit_definition(node: ast.stmt) -> None:
+        assert isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        body = node.body
+        if body[0].lineno == node.lineno:
+            # One-liner such as "def f(): pass": keep the line up to the body
+            header_line = lines[node.lineno - 1]
+            body_col = body[0].col_offset
+            out.append(segment(first, node.lineno - 1) + header_line[:body_col].rstrip() + " ...\n")
+            return
+        out.append(segment(first, body[0].lineno - 1))
+        doc = docstring_of(node)
+        if doc is not None:
+            out.append(segment(doc.lineno, doc.end_lineno or doc.lineno))
+        indent = " " * body[0].col_offset
+        if isinstance(node, ast.ClassDef):
+            members = [n for n in body if n is not doc]
+            emitted = emit_body(members)
+            if not emitted and doc is None:
+                out.append(f"{indent}...\n")
+        elif doc is None:
+            out.append(f"{indent}...\n")
+
+    def emit_body(nodes: Iterable[ast.stmt]) -> bool:
+        emitted = False
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                emit_definition(node)
+                emitted = True
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                out.append(segment(node.lineno, node.end_lineno or node.lineno))
+                emitted = True
+            elif isinstance(node, ast.AnnAssign) or (
+                isinstance(node, ast.Assign)
+                and any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets)
+            ):
+                # Annotated names (e.g. dataclass fields) and __all__ are part of the API surface
+                out.append(segment(node.lineno, node.end_lineno or node.lineno))
+                emitted = True
+        return emitted
+
+    module_doc = docstring_of(tree)
+    if module_doc is not None:
+        out.append(segment(module_doc.lineno, module_doc.end_lineno or module_doc.lineno))
+    emit_body(n for n in tree.body if n is not module_doc)
+    return "".join(out)
+
+
+# --- JavaScript / TypeScript ---
+
+_SCRIPT_DECLARATION = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?"
+    r"(import|function\*?|class|interface|type|enum|namespace|module|const|let|var)\b"
+)
+_SCRIPT_REEXPORT = re.compile(r"^\s*export\s*(?:\*|\{)")
+_CLASS_MEMBER = re.compile(
+    r"^\s*(?:(?:public|private|protected|static|readonly|abstract|async|override|declare|get|set)\s+)*"
+    r"(?:constructor|#?[A-Za-z_$][\w$]*)\s*[?!]?\s*(?:[(<:=;]|$)"
+)
+# Declarations whose braces hold API surface (members, import lists) rather than code
+_KEPT_DECLARATIONS = ("import", "interface", "type", "enum", "namespace", "module")
+_STRING_OR_COMMENT = re.compile(r"""//.*|/\*.*?\*/|"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`""")
+
+
+def _script_outline(source: str) -> str:
+    out: List[str] = []
+    # Kind of each open brace: "keep" (type bodies, imports), "class" or "body" (skipped)
+    stack: List[str] = []
+    pending = 0  # Open parentheses/brackets of an emitted statement spanning lines
+    statement_kind = "keep"
+    in_block_comment = False
+
+    for line in source.splitlines(keepends=True):
+        code = line
+        if in_block_comment:
+            end = code.find("*/")
+            if end == -1:
+                continue
+            code = code[end + 2 :]
+            in_block_comment = False
+        code = _STRING_OR_COMMENT.sub('""', code)
+        if "/*" in code:
+            code, in_block_comment = code[: code.index("/*")], True
+
+        container = stack[-1] if stack else None
+        declaration = _SCRIPT_DECLARATION.match(line)
+        keyword = declaration.group(1) if declaration else None
+        if pending > 0:
+            emit, kind = True, statement_kind
+        elif container == "keep":
+            emit, kind = True, "keep"
+        elif container is None:
+            emit = declaration is not None or _SCRIPT_REEXPORT.match(line) is not None
+            if keyword == "class":
+                kind = "class"
+            elif keyword is None or keyword in _KEPT_DECLARATIONS:
+                kind = "keep"
+            else:
+                kind = "body"
+        elif container == "class":
+            emit, kind = bool(code.strip()) and _CLASS_MEMBER.match(line) is not None, "body"
+        else:
+            emit, kind = False, "body"
+
+        net = code.count("{") - code.count("}")
+        if emit:
+            if kind == "body" and net > 0:
+                # Function/method body: keep only the signature
+                out.append(line[: line.rfind("{") + 1].rstrip() + " ... }\n")
+            else:
+                out.append(line)
+        for _ in range(-net):
+            if stack and stack.pop() == "class":
+                out.append(line[: len(line) - len(line.lstrip())] + "}\n")
+        stack.extend([kind if emit else "body"] * max(net, 0))
+
+        parens = code.count("(") + code.count("[") - code.count(")") - code.count("]")
+        pending = max(pending + parens, 0) if emit and net <= 0 else 0
+        statement_kind = kind
+    return "".join(out)
+
+
+def outline_source(file_path: str, source: str) -> Optional[str]:
+    """Returns the outline of a source file, or None if it cannot be parsed."""
+    try:
+        if file_path.lower().endswith(PYTHON_EXTENSIONS):
+            return _python_outline(source)
+        if file_path.lower().endswith(SCRIPT_EXTENSIONS):
+            return _script_outline(source)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        logger.debug(f"Could not outline {file_path}: {e}")
+    return None
+
+
+def _outline_worker(job: Tuple[str, Optional[str]]) -> Tuple[str, Optional[str], bool]:
+    """Process pool entry point: (path, cache dir) -> (path, outline, cache hit)."""
+    file_path, cache_dir = job
+    try:
+        with governor.open_input(file_path) as f:
+            data = f.read()
+    except OSError as e:
+        # Left to the normal read path, which reports the error and skips the file
+        logger.debug(f"Could not read {file_path} to outline it: {e}")
+        return file_path, None, False
+    kind = "py" if file_path.lower().endswith(PYTHON_EXTENSIONS) else "js"
+    digest = hashlib.sha256(f"{OUTLINE_VERSION}:{kind}:".encode() + data).hexdigest()
+    cache_file = Path(cache_dir) / digest[:2] / f"{digest}.txt" if cache_dir else None
+
+    if cache_file is not None:
+        try:
+            return file_path, cache_file.read_text(encoding="utf-8"), True
+        except OSError:
+            pass
+
+    source = data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    outline = outline_source(file_path, source)
+    if outline is not None and cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(outline, encoding="utf-8")
+            os.replace(tmp_file, cache_file)  # Atomic, so concurrent runs never see partial entries
+        except OSError as e:
+            logger.debug(f"Could not write outline cache {cache_file}: {e}")
+    return file_path, outline, False
+
+
+def compute_outlines(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    stats: Optional[RunStats] = None,
+) -> Dict[str, str]:
+    """
+    Computes outlines for the supported files among paths, in a process pool of `workers`
+    processes (default: CPU count, capped at the governor's open-file limit); the workers share
+    the active governor's limits. Returns {path: outline}; unparsable files are left out
+    so their full content is emitted instead.
+    """
+    stats = stats if stats is not None else RunStats()
+    jobs = [(p, str(cache_dir) if cache_dir else None) for p in paths if supports_outline(p)]
+    workers = governor.pool_size(workers or os.cpu_count() or 1)
+    outlines: Dict[str, str] = {}
+
+    if workers <= 1 or len(jobs) < MIN_FILES_FOR_POOL:
+        results = map(_outline_worker, jobs)
+        outlines.update(_collect(results, stats))
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=governor.start_worker,
+            initargs=(governor.worker_settings(workers),),
+        )
+        with pool:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            outlines.update(_collect(pool.map(_outline_worker, jobs, chunksize=chunksize), stats))
+    logger.info(f"Outlined {len(outlines)} of {len(jobs)} supported files")
+    return outlines
+
+
+def _collect(results: Iterable[Tuple[str, Optional[str], bool]], stats: RunStats) -> Dict[str, str]:
+    outlines = {}
+    for file_path, outline, cache_hit in results:
+        stats.incr("outline_cache_hits" if cache_hit else "outline_cache_misses")
+        if outline is not None:
+            outlines[file_path] = outline
+        else:
+            stats.incr("outline_failures")
+    return outlines
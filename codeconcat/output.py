@@ -1,74 +1,511 @@
 # -*- coding: utf-8 -*-
 # codeconcat/output.py
+import codecs
 import logging
-import sys
+import os
+from functools import partial
 from pathlib import Path
-from typing import List, Optional, TextIO
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from . import governor, trace
+from .async_io import DEFAULT_MAX_BUFFERED_BYTES, DEFAULT_MAX_IN_FLIGHT, read_in_order
+from .contains import LiteralMatcher, chunks_if_contains, text_if_contains
+from .deadline import Deadline
+from .encoding import DEFAULT_FALLBACKS, code_unit_size, detect_encoding
+from .file_utils import is_excluded_mime, is_language_file
+from .sinks import STDOUT_TARGET, Sink, TextSink
+from .sniff import SNIFF_BYTES, sniff_mime
+from .stats import RunStats
+from .transforms import TransformPipeline, apply_transforms
 
 logger = logging.getLogger(__name__)
 
+TRUNCATION_MARKER = "\n[... truncated {omitted} bytes ...]\n"
+READ_CHUNK_BYTES = 64 * 1024
+
+T = TypeVar("T")
+
+
+def _normalize_newlines(text: str) -> str:
+    """Translates \\r\\n and \\r line endings to \\n, like text-mode open()."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _decode(data: bytes, encoding: str = "utf-8") -> str:
+    """Decodes with replacement characters and universal newlines."""
+    return _normalize_newlines(data.decode(encoding, errors="replace"))
+
+
+def file_encoding(prefix: bytes, fallbacks: Sequence[str], stats: RunStats) -> Tuple[str, int]:
+    """Detects the encoding of a file from its first bytes (see encoding.detect_encoding) and counts it."""
+    encoding, bom_len = detect_encoding(prefix, fallbacks)
+    stats.incr(f"encoding_{encoding}")
+    return encoding, bom_len
+
+
+def tail_start(size: int, tail_len: int, encoding: str, bom_len: int) -> int:
+    """Where the last tail_len bytes start, moved forward to a code unit boundary."""
+    start = size - tail_len
+    return start + (bom_len - start) % code_unit_size(encoding)
+
+
+def _read_head_tail(
+    file: BinaryIO,
+    prefix: bytes,
+    size: int,
+    limit: int,
+    stats: RunStats,
+    encoding: str = "utf-8",
+    bom_len: int = 0,
+) -> str:
+    """
+    Reads the first and last limit/2 bytes of an open file, joined by a truncation marker.
+    `prefix` holds the bytes already read from the start of the file.
+    """
+    head_len = limit // 2
+    tail_len = limit - head_len
+    head = prefix[:head_len]
+    if len(head) < head_len:
+        head += file.read(head_len - len(head))
+        stats.incr("read_calls")
+    start = tail_start(size, tail_len, encoding, bom_len)
+    file.seek(start)
+    tail = file.read(size - start)
+    stats.incr("read_calls")
+    return join_head_tail(head[bom_len:], tail, size - head_len - tail_len, encoding)
+
+
+def join_head_tail(head: bytes, tail: bytes, omitted: int, encoding: str = "utf-8") -> str:
+    """Decodes head and tail joined by a truncation marker; tail must start on a code unit boundary."""
+    # Drop partial sequences at the cut points instead of emitting replacement characters
+    head_text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(head, final=False)
+    if encoding == "utf-8":
+        while tail and 0x80 <= tail[0] <= 0xBF:
+            tail = tail[1:]
+    tail_text = _decode(tail, encoding)
+    return _normalize_newlines(head_text) + TRUNCATION_MARKER.format(omitted=omitted) + tail_text
+
+
+def stream_chunks(
+    file: BinaryIO, prefix: bytes, stats: RunStats, encoding: str = "utf-8", bom_len: int = 0
+) -> Iterator[str]:
+    """
+    Decodes an open file chunk by chunk, starting with the already-read prefix (whose first
+    bom_len bytes are skipped), and closes it. The content is transcoded from encoding.
+    A trailing \\r is held back so \\r\\n split across chunks still becomes a single \\n.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending_cr = ""
+    name = getattr(file, "name", None)
+    file_path = name if isinstance(name, str) else None
+    try:
+        # A short read means end of file (regular files only return fewer bytes at EOF)
+        data, expected, start = prefix, SNIFF_BYTES, bom_len
+        while True:
+            final = len(data) < expected
+            text = pending_cr + decoder.decode(data[start:], final=final)
+            pending_cr = ""
+            if text.endswith("\r") and not final:
+                text, pending_cr = text[:-1], "\r"
+            if text:
+                yield _normalize_newlines(text)
+            if final:
+                return
+            with trace.span("read", "io", file_path):
+                data, expected, start = file.read(READ_CHUNK_BYTES), READ_CHUNK_BYTES, 0
+            stats.incr("read_calls")
+    finally:
+        file.close()
+
+
+def _open_file_chunks(
+    file_path_str: str,
+    truncate_bytes: Optional[int],
+    stats: RunStats,
+    sniff_unlisted: bool = False,
+    fallbacks: Sequence[str] = DEFAULT_FALLBACKS,
+) -> Optional[Iterator[str]]:
+    """
+    Opens one file and returns an iterator over its decoded text, reading it chunk by chunk with
+    a single open. Files over truncate_bytes are reduced to head + marker + tail.
+    The encoding is detected from the first bytes, trying the fallbacks for non-UTF-8 text.
+    If sniff_unlisted is set, files without a known extension are classified from the first
+    bytes read and None is returned for binary ones; those bytes are then reused as the start
+    of the content instead of being read again.
+    """
+    with trace.span("open", "io", file_path_str):
+        file = governor.open_input(file_path_str)
+    try:
+        stats.incr("files_opened")
+        with trace.span("read", "io", file_path_str):
+            prefix = file.read(SNIFF_BYTES)
+        stats.incr("read_calls")
+
+        if sniff_unlisted and not is_language_file(os.path.basename(file_path_str)):
+            with trace.span("sniff", "classify", file_path_str):
+                mime_type = sniff_mime(prefix)
+            stats.incr("files_classified")
+            if is_excluded_mime(mime_type):
+                logger.debug(f"Skipping {mime_type} file: {file_path_str}")
+                stats.incr("files_skipped_binary")
+                file.close()
+                return None
+
+        encoding, bom_len = file_encoding(prefix, fallbacks, stats)
+        if truncate_bytes is not None:
+            size = os.fstat(file.fileno()).st_size
+            if size > truncate_bytes:
+                stats.incr("files_truncated")
+                stats.incr("bytes_avoided", size - truncate_bytes)
+                with trace.span("read", "io", file_path_str):
+                    text = _read_head_tail(file, prefix, size, truncate_bytes, stats, encoding, bom_len)
+                file.close()
+                return iter([text])
+    except BaseException:
+        file.close()
+        raise
+    return stream_chunks(file, prefix, stats, encoding, bom_len)
+
+
+def _read_file_content(
+    file_path_str: str,
+    truncate_bytes: Optional[int],
+    stats: RunStats,
+    sniff_unlisted: bool = False,
+    fallbacks: Sequence[str] = DEFAULT_FALLBACKS,
+) -> Optional[str]:
+    """Reads a whole file as text (see _open_file_chunks); used by the async engine's workers."""
+    chunks = _open_file_chunks(file_path_str, truncate_bytes, stats, sniff_unlisted, fallbacks)
+    return None if chunks is None else "".join(chunks)
+
+
+def _count_chars(chunks: Iterable[str], stats: RunStats, counter: str) -> Iterator[str]:
+    for chunk in chunks:
+        stats.incr(counter, len(chunk))
+        yield chunk
+
+
+def _write_entry(
+    sinks: List[Sink], relative_path: str, chunks: Iterable[str], aliases: Optional[List[str]] = None
+) -> None:
+    """
+    Writes one file block to every sink: header, content streamed chunk by chunk, footer.
+    Its trace span includes the reads of content streamed from disk.
+    """
+    with trace.span("write", "io", relative_path):
+        for sink in sinks:
+            sink.begin(relative_path, aliases)
+        try:
+            for chunk in chunks:
+                for sink in sinks:
+                    sink.write(chunk)
+        finally:
+            for sink in sinks:
+                sink.end()
+
+
+def _relative_posix(path: str, src_path: Path) -> str:
+    try:
+        return Path(path).relative_to(src_path).as_posix()
+    except ValueError:
+        return Path(path).as_posix()
+
+
+ReadResults = Generator[Tuple[str, Optional[Iterable[str]], Optional[BaseException]], None, None]
+
+
+def _open_serially(tree: Iterable[str], open_fn: Callable[[str], Optional[Iterator[str]]]) -> ReadResults:
+    """Opens files one after another, yielding (path, chunks, error); chunks are read lazily."""
+    for file_path_str in tree:
+        try:
+            yield file_path_str, open_fn(file_path_str), None
+        except Exception as e:
+            yield file_path_str, None, e
+
+
+def _with_outlines(
+    read_fn: Callable[[str], T], outlines: Dict[str, str], wrap: Callable[[str], T]
+) -> Callable[[str], T]:
+    """Wraps a read function so that outlined files return their outline without being opened."""
+
+    def read(file_path_str: str) -> T:
+        outline = outlines.get(file_path_str)
+        return wrap(outline) if outline is not None else read_fn(file_path_str)
+
+    return read
+
+
+def _with_contains(
+    read_fn: Callable[[str], Optional[T]], select: Callable[[T], Optional[T]], stats: RunStats
+) -> Callable[[str], Optional[T]]:
+    """
+    Wraps a read function so that the content is checked by select (see chunks_if_contains)
+    where it is read, e.g. in the async engine's workers; rejected files read as None.
+    """
+
+    def read(file_path_str: str) -> Optional[T]:
+        content = read_fn(file_path_str)
+        if content is None:
+            return None
+        selected = select(content)
+        if selected is None:
+            logger.debug(f"Skipping file without any --contains string: {file_path_str}")
+            stats.incr("files_skipped_contains")
+        return selected
+
+    return read
+
+
+def _open_sinks(output_path_str: Optional[str], to_stdout: bool, sinks: Optional[List[Sink]]) -> List[Sink]:
+    """Opens the main output (a text sink for the file path or stdout, if any) and the extra sinks."""
+    targets: List[Sink] = []
+    if to_stdout:
+        targets.append(TextSink(STDOUT_TARGET))
+    elif output_path_str:
+        targets.append(TextSink(output_path_str))
+    targets.extend(sinks or [])
+    if not targets:
+        logger.error("Output target not specified (file path, --stdout or sinks).")
+    for sink in targets:
+        sink.open()
+    return targets
+
+
+def _close_sinks(sinks: List[Sink]) -> None:
+    for sink in sinks:
+        sink.close()
+
+
+def _describe(output_path_str: Optional[str], to_stdout: bool, sinks: Optional[List[Sink]]) -> str:
+    names = ["stdout" if to_stdout else output_path_str or ""] + [sink.describe() for sink in sinks or []]
+    return ", ".join(name for name in names if name)
+
+
+def _log_written(sinks: List[Sink]) -> None:
+    for sink in sinks:
+        logger.info(f"Successfully wrote {sink.written} files to {sink.describe()}")
+
+
+def _write_deadline_footer(
+    sinks: List[Sink], deadline: Deadline, processed: int, total: Optional[int], stats: RunStats
+) -> None:
+    """Ends every output with a note on what the time budget left out; total is None if unknown."""
+    walk_complete = "walk" not in deadline.cut_stages
+    details: Dict[str, object] = {"time_budget_s": deadline.seconds, "files_processed": processed}
+    note = f"codeconcat: time budget of {deadline.seconds:g}s exhausted; {processed}"
+    if total is not None:
+        coverage = processed / total if total else float(walk_complete)
+        details.update(files_found=total, coverage=round(coverage, 4))
+        note += f" of {total} files found were processed ({100 * coverage:.1f}%)"
+        stats.incr("files_skipped_deadline", total - processed)
+    else:
+        note += " files were processed before the rest of the source was read"
+    details["walk_complete"] = walk_complete
+    if not walk_complete:
+        note += "; the walk stopped before the whole tree was found"
+    logger.warning(note)
+    for sink in sinks:
+        sink.write_footer(note, details)
+
+
+def _transform(
+    chunks: Iterable[str], file_path: str, transforms: TransformPipeline, stats: RunStats
+) -> Iterator[str]:
+    chunks = _count_chars(chunks, stats, "transform_chars_in")
+    chunks = apply_transforms(chunks, transforms.for_file(file_path))
+    return _count_chars(chunks, stats, "transform_chars_out")
+
 
 def create_output(
     output_path_str: Optional[str],
     src_path_str: str,
-    tree: List[str],
+    tree: Sequence[str],
     to_stdout: bool = False,
+    truncate_bytes: Optional[int] = None,
+    stats: Optional[RunStats] = None,
+    io_engine: str = "sync",
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    max_buffered_bytes: int = DEFAULT_MAX_BUFFERED_BYTES,
+    sniff_unlisted: bool = False,
+    transforms: Optional[TransformPipeline] = None,
+    outlines: Optional[Dict[str, str]] = None,
+    aliases: Optional[Dict[str, List[str]]] = None,
+    sinks: Optional[List[Sink]] = None,
+    deadline: Optional[Deadline] = None,
+    encoding_fallbacks: Sequence[str] = DEFAULT_FALLBACKS,
+    contains: Optional[Sequence[str]] = None,
 ) -> None:
-    """Writes the content of the files in the tree to the output, wrapping content."""
-    output_stream: Optional[TextIO] = None
+    """
+    Writes the content of the files in the tree to the output, wrapping content.
+    Extra sinks (see sinks.Sink) are written in the same pass: each file is read once and
+    its content routed to the main output and to every sink whose filter accepts it.
+    Files larger than truncate_bytes (if set) are emitted as head + marker + tail.
+    With io_engine "async", up to max_in_flight files are read concurrently and written
+    back in tree order; see async_io.read_in_order.
+    With sniff_unlisted, files without a known extension are classified from the bytes read
+    for their content (see generate_directory_tree's defer_classification), so every file
+    is opened and read once.
+    Content is transcoded to UTF-8 from the encoding detected for each file (a BOM, UTF-8,
+    else the first of encoding_fallbacks that decodes its first chunk).
+    Content is streamed through the transforms (if any) on its way to the output.
+    Files with an entry in outlines (see outline.compute_outlines) are emitted as that
+    outline instead of being read.
+    Files with an entry in aliases (other paths of the same file, see generate_directory_tree's
+    follow_symlinks) get an "Aliases:" line after their "File:" header.
+    With a deadline, writing stops between files once it expires (or if the walk was cut
+    short), and each output ends with a footer giving the fraction of files processed.
+    With contains, only files whose content (or outline) includes one of those strings are
+    written; the content is matched as read, before the transforms.
+    """
+    targets: List[Sink] = []
+    stats = stats if stats is not None else RunStats()
     src_path = Path(src_path_str).resolve()
+    matcher = LiteralMatcher(contains) if contains else None
 
     try:
-        if to_stdout:
-            output_stream = sys.stdout
-        elif output_path_str:
-            output_path = Path(output_path_str)
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            output_stream = open(output_path, "w", encoding="utf-8")
-        else:
-            logger.error("Output target not specified (file path or --stdout).")
+        targets = _open_sinks(output_path_str, to_stdout, sinks)
+        if any(sink.path_pattern is not None for sink in targets):
+            # Files no sink wants are never read
+            tree = [p for p in tree if any(s.accepts(_relative_posix(p, src_path)) for s in targets)]
+        # A walk cut short by the deadline before finding any file still gets its footer
+        if not targets or not (tree or (deadline is not None and deadline.cut_stages)):
             return
 
-        if not tree:
-            return
+        results: ReadResults
+        if io_engine == "async":
+            read_fn: Callable[[str], Optional[str]] = partial(
+                _read_file_content,
+                truncate_bytes=truncate_bytes,
+                stats=stats,
+                sniff_unlisted=sniff_unlisted,
+                fallbacks=encoding_fallbacks,
+            )
+            if outlines:
+                read_fn = _with_outlines(read_fn, outlines, lambda outline: outline)
+            if matcher is not None:
+                read_fn = _with_contains(read_fn, partial(text_if_contains, matcher=matcher), stats)
+            results = (
+                (path, None if content is None else [content], error)
+                for path, content, error in read_in_order(tree, read_fn, max_in_flight, max_buffered_bytes)
+            )
+        else:
+            open_fn: Callable[[str], Optional[Iterator[str]]] = partial(
+                _open_file_chunks,
+                truncate_bytes=truncate_bytes,
+                stats=stats,
+                sniff_unlisted=sniff_unlisted,
+                fallbacks=encoding_fallbacks,
+            )
+            if outlines:
+                open_fn = _with_outlines(open_fn, outlines, lambda outline: iter([outline]))
+            if matcher is not None:
+                open_fn = _with_contains(open_fn, partial(chunks_if_contains, matcher=matcher), stats)
+            results = _open_serially(tree, open_fn)
 
-        for file_path_str in tree:
-            file_path = Path(file_path_str)
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="replace") as file:
-                    content = file.read()
-            except UnicodeDecodeError:
+        processed = 0
+        for file_path_str, chunks, error in results:
+            if deadline is not None and deadline.expired("write"):
+                results.close()  # Stops the reads in flight
+                break
+            processed += 1
+            if isinstance(error, UnicodeDecodeError):
                 logger.warning(f"Skipping file {file_path_str} due to unhandled encoding issue.")
                 continue
-            except OSError as e:
-                logger.warning(f"Skipping file {file_path_str} due to read error: {e}")
+            elif isinstance(error, OSError):
+                logger.warning(f"Skipping file {file_path_str} due to read error: {error}")
                 continue
-            except Exception as e:
-                logger.warning(f"Skipping file {file_path_str} due to unexpected error: {e}")
+            elif error is not None:
+                logger.warning(f"Skipping file {file_path_str} due to unexpected error: {error}")
                 continue
+            elif chunks is None:
+                continue  # Classified as binary while reading
+
+            relative_path = _relative_posix(file_path_str, src_path)
+            matching = [sink for sink in targets if sink.accepts(relative_path)]
+            alias_paths = None
+            if aliases and file_path_str in aliases:
+                alias_paths = [_relative_posix(alias, src_path) for alias in aliases[file_path_str]]
 
+            if transforms:
+                chunks = _transform(chunks, file_path_str, transforms, stats)
             try:
-                relative_path = file_path.relative_to(src_path)
-            except ValueError:
-                relative_path = file_path
-
-            # --- Write Output with New Formatting ---
-            output_stream.write(f"File: {relative_path.as_posix()}\n")
-            output_stream.write('""""""\n')
-            output_stream.write(content)
-            # Ensure newline before closing marker
-            if not content.endswith("\n"):
-                output_stream.write("\n")
-            output_stream.write('""""""\n')
-            output_stream.write("\n\n")
-            # --- End of Formatting Change ---
-
-        logger.info(f"Successfully wrote {len(tree)} files to {'stdout' if to_stdout else output_path_str}")
+                _write_entry(matching, relative_path, chunks, alias_paths)
+            except (OSError, UnicodeDecodeError) as e:
+                if any(sink.stream is not None and sink.stream.closed for sink in matching):
+                    raise
+                logger.warning(f"File {file_path_str} is incomplete in the output due to read error: {e}")
+
+        if deadline is not None and deadline.cut_stages:
+            _write_deadline_footer(targets, deadline, processed, len(tree), stats)
+        _log_written(targets)
 
     except OSError as e:
-        logger.error(f"Error writing to output {'stdout' if to_stdout else output_path_str}. Error: {e}")
+        logger.error(f"Error writing to output {_describe(output_path_str, to_stdout, sinks)}. Error: {e}")
     except Exception as e:
         logger.error(f"An unexpected error occurred during output generation: {e}")
     finally:
-        if not to_stdout and output_stream and not output_stream.closed:
-            output_stream.close()
+        _close_sinks(targets)
+
+
+def write_entries(
+    output_path_str: Optional[str],
+    entries: Iterable[Tuple[str, Iterable[str]]],
+    to_stdout: bool = False,
+    stats: Optional[RunStats] = None,
+    transforms: Optional[TransformPipeline] = None,
+    sinks: Optional[List[Sink]] = None,
+    deadline: Optional[Deadline] = None,
+    contains: Optional[Sequence[str]] = None,
+) -> None:
+    """
+    Writes (relative path, chunks) entries produced by a source other than the directory
+    walk (e.g. archive.archive_entries), in the order they come, like create_output.
+    Entries no sink accepts are skipped without consuming their chunks.
+    With a deadline, the source stops being read once it expires, and a footer is written.
+    With contains, entries whose content includes none of those strings (before the
+    transforms) are skipped.
+    """
+    targets: List[Sink] = []
+    stats = stats if stats is not None else RunStats()
+    matcher = LiteralMatcher(contains) if contains else None
+    try:
+        targets = _open_sinks(output_path_str, to_stdout, sinks)
+        if not targets:
+            return
+        processed = 0
+        for relative_path, chunks in entries:
+            if deadline is not None and deadline.expired("write"):
+                break
+            processed += 1
+            matching = [sink for sink in targets if sink.accepts(relative_path)]
+            if not matching:
+                continue
+            if matcher is not None:
+                selected = chunks_if_contains(chunks, matcher)
+                if selected is None:
+                    logger.debug(f"Skipping entry without any --contains string: {relative_path}")
+                    stats.incr("files_skipped_contains")
+                    continue
+                chunks = selected
+            if transforms:
+                chunks = _transform(chunks, relative_path, transforms, stats)
+            _write_entry(matching, relative_path, chunks)
+        if deadline is not None and deadline.cut_stages:
+            _write_deadline_footer(targets, deadline, processed, None, stats)
+        _log_written(targets)
+    except OSError as e:
+        logger.error(f"Error writing to output {_describe(output_path_str, to_stdout, sinks)}. Error: {e}")
+    finally:
+        _close_sinks(targets)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# codeconcat/partition.py
+"""
+Partitioned runs (--partition I/K) and the merge of their parts (codeconcat merge).
+
+Each top-level entry of the source (directory or file) belongs to one of K partitions, by
+the CRC-32 of its name, so independent processes or machines can each walk and write one
+partition. A partition's output is a part file in the usual text format plus an index
+(PART.index.json) giving the byte range of each file's block. Merging sorts the blocks of
+all parts by path, the order of a single run, and copies them: no content is re-read.
+"""
+
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, TextIO, Tuple, cast
+
+from .sinks import TextSink
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+COPY_CHUNK_BYTES = 1024 * 1024
+
+# (partition number, 1..K; partition count K)
+Partition = Tuple[int, int]
+
+
+def partition_of(top_level_name: str, count: int) -> int:
+    """The partition number (1..count) of a top-level file or directory name."""
+    return zlib.crc32(top_level_name.encode("utf-8", "surrogateescape")) % count + 1
+
+
+def index_path(part_path: str) -> str:
+    return part_path + INDEX_SUFFIX
+
+
+class _CountingStream:
+    """
+    A text output that counts the bytes written to it, for offsets without tell(), which
+    flushes a text file. Newlines count as os.linesep, which text mode writes for them.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self._stream = stream
+        self._extra_per_newline = len(os.linesep) - 1
+        self.offset = 0
+
+    def write(self, text: str) -> int:
+        self.offset += len(text) if text.isascii() else len(text.encode("utf-8"))
+        if self._extra_per_newline:
+            self.offset += text.count("\n") * self._extra_per_newline
+        return self._stream.write(text)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class PartSink(TextSink):
+    """The text output of one partition; its index is written next to it when it is closed."""
+
+    def __init__(self, target: str, partition: Partition) -> None:
+        super().__init__(target)
+        self.partition = partition
+        self.entries: List[Tuple[str, int, int]] = []
+        self._entry_path = ""
+        self._entry_start = 0
+
+    def open(self) -> None:
+        if self.to_stdout:
+            raise ValueError("A partition's output must be a file, so that it can be indexed")
+        super().open()
+        self.stream = cast(TextIO, _CountingStream(cast(TextIO, self.stream)))
+
+    def begin(self, relative_path: str, aliases: Optional[List[str]] = None) -> None:
+        assert self.stream is not None
+        self._entry_start = self.stream.tell()  # Counted, see _CountingStream
+        super().begin(relative_path, aliases)
+        self._entry_path = relative_path
+
+    def end(self) -> None:
+        assert self.stream is not None
+        super().end()
+        self.entries.append((self._entry_path, self._entry_start, self.stream.tell() - self._entry_start))
+
+    def close(self) -> None:
+        if self.stream is None or self.stream.closed:
+            return
+        super().close()
+        index = {
+            "version": INDEX_VERSION,
+            "partition": self.partition[0],
+            "partitions": self.partition[1],
+            "entries": self.entries,
+        }
+        with open(index_path(self.target), "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        logger.info(f"Wrote part {self.partition[0]}/{self.partition[1]} index to {index_path(self.target)}")
+
+
+def _load_index(part_path: str) -> Dict:
+    with open(index_path(part_path), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        raise ValueError(f"{index_path(part_path)} is not a version {INDEX_VERSION} part index")
+    return index
+
+
+def _copy_range(source: BinaryIO, offset: int, length: int, out: BinaryIO) -> None:
+    source.seek(offset)
+    while length > 0:
+        data = source.read(min(length, COPY_CHUNK_BYTES))
+        if not data:
+            raise ValueError(f"{source.name} is shorter than its index says")
+        out.write(data)
+        length -= len(data)
+
+
+def merge_parts(output_path: Path, part_paths: Sequence[str]) -> int:
+    """
+    Combines the part files of all K partitions into output_path, byte-identical to the
+    output of a single run. Raises ValueError if parts are missing, repeated or inconsistent.
+    Returns the number of files in the output.
+    """
+    entries: List[Tuple[str, str, int, int]] = []
+    partitions: Dict[int, str] = {}
+    count: Optional[int] = None
+    for part_path in part_paths:
+        index = _load_index(part_path)
+        number, part_count = index["partition"], index["partitions"]
+        if count is not None and part_count != count:
+            raise ValueError(
+                f"{part_path} is part of a {part_count}-way split, the others of a {count}-way one"
+            )
+        if number in partitions:
+            raise ValueError(f"{part_path} and {partitions[number]} are both part {number}")
+        count, partitions[number] = part_count, part_path
+        entries.extend((relative, part_path, offset, length) for relative, offset, length in index["entries"])
+    missing = sorted(set(range(1, (count or 0) + 1)) - set(partitions))
+    if missing:
+        raise ValueError(f"Missing part(s) {', '.join(map(str, missing))} of {count}")
+
+    # A single run sorts absolute paths, i.e. relative paths with the native separator
+    entries.sort(key=lambda entry: entry[0].replace("/", os.sep))
+    for previous, entry in zip(entries, entries[1:]):
+        if previous[0] == entry[0]:
+            raise ValueError(f"{entry[0]} is in both {previous[1]} and {entry[1]}")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    sources: Dict[str, BinaryIO] = {}
+    try:
+        with open(output_path, "wb") as out:
+            for _, part_path, offset, length in entries:
+                if part_path not in sources:
+                    sources[part_path] = open(part_path, "rb")
+                _copy_range(sources[part_path], offset, length, out)
+    finally:
+        for source in sources.values():
+            source.close()
+    return len(entries)
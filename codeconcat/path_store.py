@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# codeconcat/path_store.py
+"""
+Compact storage for the list of included files, for trees with millions of files.
+
+A list of absolute path strings costs ~60 bytes of object overhead per path plus the full
+path text, with every file repeating its directory. PathStore interns each directory once
+and keeps, per file, a directory id, the end offset of its name in a shared bytes buffer and
+its size in flat arrays: a few bytes plus the file name. Path strings are rebuilt on access.
+
+Sorting materializes path strings only for up to spill_threshold files at a time: larger
+stores are sorted in runs written to temporary files, then merged with heapq.merge.
+"""
+
+import heapq
+import logging
+import os
+import tempfile
+from array import array
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+logger = logging.getLogger(__name__)
+
+# Above this many paths, sort() spills sorted runs to disk instead of sorting in memory
+DEFAULT_SPILL_THRESHOLD = 200_000
+_RUN_READ_BYTES = 1024 * 1024
+
+
+def _read_run(run: BinaryIO) -> Iterator[Tuple[str, int]]:
+    """Reads the (path, index) records of a spilled run: NUL-separated, as paths cannot hold NUL."""
+    pending = b""
+    while True:
+        data = run.read(_RUN_READ_BYTES)
+        if not data:
+            return
+        fields = (pending + data).split(b"\0")
+        pending = fields.pop()
+        if len(fields) % 2:  # A record split across reads: keep its path for the next one
+            pending = fields.pop() + b"\0" + pending
+        for k in range(0, len(fields), 2):
+            yield fields[k].decode("utf-8", "surrogateescape"), int(fields[k + 1])
+
+
+class PathStore(Sequence[str]):
+    """
+    A sequence of absolute file paths with their sizes (and modification times, if
+    track_mtimes). Paths are kept in insertion order until sort() or reorder(); retain()
+    drops paths while keeping the order.
+    """
+
+    def __init__(
+        self,
+        spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+        spill_dir: Optional[str] = None,
+        track_mtimes: bool = False,
+    ) -> None:
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        # Directory prefixes, trailing separator included, and their ids
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_of = array("I")
+        self._name_ends = array("Q")
+        self._names = bytearray()
+        self._sizes = array("q")
+        self._mtimes: Optional[array] = array("d") if track_mtimes else None
+        # Indices of the paths in sequence order; None means insertion order, all paths
+        self._order: Optional[array] = None
+
+    def add(self, path: str, size: int = 0, mtime: float = 0.0) -> None:
+        cut = path.rfind(os.sep) + 1
+        prefix = path[:cut]
+        dir_id = self._dir_ids.get(prefix)
+        if dir_id is None:
+            dir_id = self._dir_ids[prefix] = len(self._dirs)
+            self._dirs.append(prefix)
+        self._dir_of.append(dir_id)
+        self._names += path[cut:].encode("utf-8", "surrogateescape")
+        self._name_ends.append(len(self._names))
+        self._sizes.append(size)
+        if self._mtimes is not None:
+            self._mtimes.append(mtime)
+        if self._order is not None:
+            self._order.append(len(self._sizes) - 1)
+
+    def _path(self, i: int) -> str:
+        start = self._name_ends[i - 1] if i else 0
+        name = self._names[start : self._name_ends[i]].decode("utf-8", "surrogateescape")
+        return self._dirs[self._dir_of[i]] + name
+
+    def _indices(self) -> Sequence[int]:
+        return self._order if self._order is not None else range(len(self._sizes))
+
+    def __len__(self) -> int:
+        return len(self._indices())
+
+    @overload
+    def __getitem__(self, k: int) -> str: ...
+
+    @overload
+    def __getitem__(self, k: slice) -> List[str]: ...
+
+    def __getitem__(self, k: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(k, slice):
+            return [self._path(i) for i in self._indices()[k]]
+        return self._path(self._indices()[k])
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._path(i) for i in self._indices())
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Yields (path, size) in sequence order."""
+        return ((self._path(i), self._sizes[i]) for i in self._indices())
+
+    def retain(self, keep: Callable[[str, int], bool]) -> None:
+        """Keeps the paths for which keep(path, size) is true, in order; keep is called in order."""
+        self._order = array("Q", (i for i in self._indices() if keep(self._path(i), self._sizes[i])))
+
+    def reorder(self, key: Callable[[str, int, float], Any]) -> None:
+        """
+        Stable-sorts the paths by key(path, size, mtime), mtime being 0.0 unless tracked.
+        All keys are held at once, so they should be small (numbers or tuples of numbers).
+        """
+        mtimes = self._mtimes
+        self._order = array(
+            "Q",
+            sorted(
+                self._indices(),
+                key=lambda i: key(self._path(i), self._sizes[i], mtimes[i] if mtimes is not None else 0.0),
+            ),
+        )
+
+    def sort(self) -> None:
+        """Sorts by path string, spilling to disk above spill_threshold paths."""
+        indices = self._indices()
+        if len(indices) <= self.spill_threshold:
+            self._order = array("Q", sorted(indices, key=self._path))
+            return
+
+        with tempfile.TemporaryDirectory(prefix="codeconcat-sort-", dir=self.spill_dir) as run_dir:
+            run_paths: List[str] = []
+            for start in range(0, len(indices), self.spill_threshold):
+                run = sorted(indices[start : start + self.spill_threshold], key=self._path)
+                run_path = os.path.join(run_dir, f"run{len(run_paths)}")
+                with open(run_path, "wb") as f:
+                    for i in run:
+                        f.write(b"%s\0%d\0" % (self._path(i).encode("utf-8", "surrogateescape"), i))
+                run_paths.append(run_path)
+            logger.debug(f"Sorting {len(indices)} paths in {len(run_paths)} runs spilled to {run_dir}")
+
+            runs = [open(p, "rb") for p in run_paths]
+            try:
+                order = array("Q", (i for _, i in heapq.merge(*map(_read_run, runs))))
+            finally:
+                for run_file in runs:
+                    run_file.close()
+        self._order = order
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# codeconcat/sinks.py
+"""
+Output sinks: where concatenated files are written, and in which format.
+
+A run can write to several sinks at once. Each file is read once and its chunks are routed
+to every sink whose path filter accepts it, so extra outputs cost no extra walking or reading.
+"""
+
+import json
+import os
+import re
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Pattern, TextIO
+
+from . import governor
+
+SINK_FORMATS = ("text", "markdown", "jsonl")
+STDOUT_TARGET = "-"
+# Four backticks, so that ``` blocks inside Markdown/README content do not close the fence
+MARKDOWN_FENCE = "````"
+
+
+class Sink(ABC):
+    """
+    One output target (a file path, or "-" for stdout) with an optional regex filter on the
+    relative posix path of files. Subclasses implement the format: begin() writes an entry's
+    header, write() one chunk of its content, end() its footer, and framing_bytes() tells
+    their size (for --dry-run).
+    """
+
+    format = "text"
+
+    def __init__(self, target: str, path_pattern: Optional[str] = None) -> None:
+        self.target = target
+        self.path_pattern: Optional[Pattern[str]] = re.compile(path_pattern) if path_pattern else None
+        self.stream: Optional[TextIO] = None
+        self.written = 0
+        self._dropped = 0  # Output offset synced and dropped from the page cache (see governor)
+
+    @property
+    def to_stdout(self) -> bool:
+        return self.target == STDOUT_TARGET
+
+    def describe(self) -> str:
+        return "stdout" if self.to_stdout else self.target
+
+    def open(self) -> None:
+        if self.to_stdout:
+            self.stream = sys.stdout
+        else:
+            output_path = Path(self.target)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.stream = open(output_path, "w", encoding="utf-8", buffering=governor.output_buffering())
+
+    def close(self) -> None:
+        if self.stream is not None and not self.to_stdout and not self.stream.closed:
+            self.stream.close()
+
+    def accepts(self, relative_path: str) -> bool:
+        return self.path_pattern is None or self.path_pattern.search(relative_path) is not None
+
+    @abstractmethod
+    def begin(self, relative_path: str, aliases: Optional[List[str]] = None) -> None:
+        """Writes the header of an entry."""
+
+    @classmethod
+    @abstractmethod
+    def framing_bytes(cls, relative_path: str) -> int:
+        """Bytes written around the content of an entry (no aliases, content ending with a newline)."""
+
+    def write(self, chunk: str) -> None:
+        assert self.stream is not None
+        self.stream.write(chunk)
+
+    def end(self) -> None:
+        self.written += 1
+        if self.stream is not None and not self.to_stdout:
+            self._dropped = governor.drop_written(self.stream, self._dropped)
+
+    def write_footer(self, note: str, details: Dict[str, Any]) -> None:
+        """Ends an incomplete output with a note (e.g. the time budget ran out) and its details."""
+        assert self.stream is not None
+        self.stream.write(f"[{note}]\n")
+
+
+class TextSink(Sink):
+    """The classic format: File: header, content between \"\"\"\"\"\" markers."""
+
+    format = "text"
+
+    def begin(self, relative_path: str, aliases: Optional[List[str]] = None) -> None:
+        assert self.stream is not None
+        self.stream.write(f"File: {relative_path}\n")
+        if aliases:
+            self.stream.write(f"Aliases: {', '.join(aliases)}\n")
+        self.stream.write('""""""\n')
+        self._last_chunk = ""
+
+    @classmethod
+    def framing_bytes(cls, relative_path: str) -> int:
+        # "File: <path>\n", two marker lines and the blank lines after the entry
+        return len(relative_path.encode("utf-8")) + 23
+
+    def write(self, chunk: str) -> None:
+        super().write(chunk)
+        if chunk:
+            self._last_chunk = chunk
+
+    def end(self) -> None:
+        assert self.stream is not None
+        # Ensure newline before closing marker
+        if not self._last_chunk.endswith("\n"):
+            self.stream.write("\n")
+        self.stream.write('""""""\n')
+        self.stream.write("\n\n")
+        super().end()
+
+
+class MarkdownSink(TextSink):
+    """A heading per file and its content in a fenced code block tagged with the extension."""
+
+    format = "markdown"
+
+    def begin(self, relative_path: str, aliases: Optional[List[str]] = None) -> None:
+        assert self.stream is not None
+        self.stream.write(f"## `{relative_path}`\n\n")
+        if aliases:
+            self.stream.write(f"Aliases: {', '.join(f'`{a}`' for a in aliases)}\n\n")
+        language = os.path.splitext(relative_path)[1].lstrip(".").lower()
+        self.stream.write(f"{MARKDOWN_FENCE}{language}\n")
+        self._last_chunk = ""
+
+    @classmethod
+    def framing_bytes(cls, relative_path: str) -> int:
+        language = os.path.splitext(relative_path)[1].lstrip(".").lower()
+        return len(relative_path.encode("utf-8")) + len(language) + 2 * len(MARKDOWN_FENCE) + 10
+
+    def end(self) -> None:
+        assert self.stream is not None
+        if not self._last_chunk.endswith("\n"):
+            self.stream.write("\n")
+        self.stream.write(f"{MARKDOWN_FENCE}\n\n")
+        Sink.end(self)
+
+    def write_footer(self, note: str, details: Dict[str, Any]) -> None:
+        assert self.stream is not None
+        self.stream.write(f"> {note}\n")
+
+
+class JsonlSink(Sink):
+    """One JSON object per line: {"path": ..., ["aliases": [...],] "content": ...}."""
+
+    format = "jsonl"
+
+    def begin(self, relative_path: str, aliases: Optional[List[str]] = None) -> None:
+        assert self.stream is not None
+        self.stream.write(f'{{"path": {json.dumps(relative_path, ensure_ascii=False)}, ')
+        if aliases:
+            self.stream.write(f'"aliases": {json.dumps(aliases, ensure_ascii=False)}, ')
+        self.stream.write('"content": "')
+
+    @classmethod
+    def framing_bytes(cls, relative_path: str) -> int:
+        # Content escaping is not counted: it depends on the content
+        return len(json.dumps(relative_path, ensure_ascii=False).encode("utf-8")) + 26
+
+    def write(self, chunk: str) -> None:
+        # JSON escaping is per character, so escaped chunks can be concatenated as they come
+        super().write(json.dumps(chunk, ensure_ascii=False)[1:-1])
+
+    def end(self) -> None:
+        assert self.stream is not None
+        self.stream.write('"}\n')
+        super().end()
+
+    def write_footer(self, note: str, details: Dict[str, Any]) -> None:
+        # A record without "path", so readers of file records can tell it apart
+        assert self.stream is not None
+        self.stream.write(json.dumps({"truncated": True, "note": note, **details}, ensure_ascii=False) + "\n")
+
+
+SINK_CLASSES = {"text": TextSink, "markdown": MarkdownSink, "jsonl": JsonlSink}
+
+
+def make_sink(target: str, path_pattern: Optional[str] = None, format: str = "text") -> Sink:
+    if format not in SINK_CLASSES:
+        raise ValueError(f"Unknown sink format {format!r}; expected one of {', '.join(SINK_FORMATS)}")
+    return SINK_CLASSES[format](target, path_pattern)
+
+
+def parse_sink_spec(spec: str) -> Sink:
+    """
+    Parses TARGET[,filter=REGEX][,format=FORMAT], where TARGET is a file path or "-" for stdout.
+    Commas inside the regex are kept (only ",filter=" and ",format=" start a new option).
+    """
+    parts = re.split(r",(?=(?:filter|format)=)", spec)
+    target, options = parts[0], {}
+    for part in parts[1:]:
+        key, _, value = part.partition("=")
+        options[key] = value
+    if not target:
+        raise ValueError(f"Sink {spec!r} has no target")
+    try:
+        return make_sink(target, options.get("filter"), options.get("format", "text"))
+    except re.error as e:
+        raise ValueError(f"Invalid filter in sink {spec!r}: {e}") from e
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# codeconcat/sniff.py
+import logging
+from typing import Tuple, Union
+
+from .encoding import BOM_ENCODINGS, is_utf8
+from .governor import open_input
+
+try:
+    import magic  # Optional: only needed for the "libmagic" classifier
+except ImportError:  # pragma: no cover - depends on the environment
+    magic = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIERS = ("builtin", "libmagic")
+# How much of each file the builtin classifier looks at
+SNIFF_BYTES = 8192
+
+BOMS: Tuple[bytes, ...] = tuple(bom for bom, _ in BOM_ENCODINGS)
+
+# Leading magic numbers of common binary formats, mapped to the MIME type libmagic reports
+MAGIC_NUMBERS: Tuple[Tuple[bytes, str], ...] = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"\x00\x00\x01\x00", "image/vnd.microsoft.icon"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"PK\x05\x06", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"BZh", "application/x-bzip2"),
+    (b"\xfd7zXZ\x00", "application/x-xz"),
+    (b"(\xb5/\xfd", "application/zstd"),
+    (b"7z\xbc\xaf'\x1c", "application/x-7z-compressed"),
+    (b"\x7fELF", "application/x-executable"),
+    (b"\xca\xfe\xba\xbe", "application/x-java-applet"),
+    (b"\xcf\xfa\xed\xfe", "application/x-mach-binary"),
+    (b"\x00asm", "application/wasm"),
+    (b"SQLite format 3\x00", "application/vnd.sqlite3"),
+    (b"wOFF", "font/woff"),
+    (b"wOF2", "font/woff2"),
+    (b"ID3", "audio/mpeg"),
+    (b"OggS", "audio/ogg"),
+    (b"fLaC", "audio/flac"),
+    (b"\x1aE\xdf\xa3", "video/webm"),
+)
+RIFF_TYPES = {b"WAVE": "audio/x-wav", b"AVI ": "video/x-msvideo", b"WEBP": "image/webp"}
+
+# Control characters that do not occur in text (everything below 0x20 except \b \t \n \f \r ESC)
+_TEXT_CONTROL_BYTES = {0x08, 0x09, 0x0A, 0x0C, 0x0D, 0x1B}
+_BINARY_BYTES = bytes(b for b in range(0x20) if b not in _TEXT_CONTROL_BYTES) + b"\x7f"
+# Share of non-text control bytes above which non-UTF-8 content is treated as binary
+BINARY_CONTROL_RATIO = 0.1
+
+
+class ClassifierUnavailableError(Exception):
+    """Raised when the requested classifier backend cannot be used (e.g. libmagic is missing)."""
+
+
+def sniff_mime(prefix: bytes) -> str:
+    """
+    Guesses a coarse MIME type from the first bytes of a file.
+    Only the top-level type is meaningful: text is reported as "text/plain" and
+    unknown binary content as "application/octet-stream".
+    """
+    if not prefix:
+        return "inode/x-empty"
+    if prefix.startswith(BOMS):
+        return "text/plain"
+    for magic_number, mime_type in MAGIC_NUMBERS:
+        if prefix.startswith(magic_number):
+            return mime_type
+    if prefix.startswith(b"RIFF") and prefix[8:12] in RIFF_TYPES:
+        return RIFF_TYPES[prefix[8:12]]
+    if prefix[4:8] == b"ftyp":
+        return "video/mp4"
+    if b"\x00" in prefix:
+        return "application/octet-stream"
+    if is_utf8(prefix):
+        return "text/plain"
+    # Not UTF-8: single-byte encoded text (Latin-1, cp1252...) has few control bytes
+    control_bytes = len(prefix) - len(prefix.translate(None, _BINARY_BYTES))
+    if control_bytes / len(prefix) > BINARY_CONTROL_RATIO:
+        return "application/octet-stream"
+    return "text/plain"
+
+
+def _magic_mime(source: Union[str, bytes]) -> str:
+    """The MIME type python-magic reports for a file path or for content already read."""
+    if magic is None:
+        raise ClassifierUnavailableError("python-magic is not installed")
+    try:
+        if isinstance(source, bytes):
+            return magic.from_buffer(source, mime=True)
+        return magic.from_file(source, mime=True)
+    except magic.MagicException as e:
+        if "failed to find magic" in str(e).lower():
+            raise ClassifierUnavailableError(str(e)) from e
+        raise
+
+
+def detect_mime(file_path: str, classifier: str = "builtin") -> str:
+    """
+    Returns the MIME type of a file using the given classifier backend:
+    "builtin" reads the first SNIFF_BYTES and calls sniff_mime, "libmagic" uses python-magic.
+    """
+    if classifier == "builtin":
+        with open_input(file_path) as file:
+            return sniff_mime(file.read(SNIFF_BYTES))
+    if classifier == "libmagic":
+        return _magic_mime(file_path)
+    raise ValueError(f"Unknown classifier: {classifier!r}")
+
+
+def classify_prefix(prefix: bytes, classifier: str = "builtin") -> str:
+    """Like detect_mime, for the first SNIFF_BYTES of content that cannot be reopened (archive members)."""
+    if classifier == "builtin":
+        return sniff_mime(prefix)
+    if classifier == "libmagic":
+        return _magic_mime(prefix)
+    raise ValueError(f"Unknown classifier: {classifier!r}")
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# codeconcat/stats.py
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class RunStats:
+    """Named counters collected while walking and writing, summarised at the end of a run."""
+
+    def __init__(self) -> None:
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()  # Reads may update counters from worker threads
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Adds `amount` to the counter `name`."""
+        with self._lock:
+            self.counters[name] += amount
+
+    def __getitem__(self, name: str) -> int:
+        return self.counters[name]
+
+    def log_summary(self) -> None:
+        """Logs all non-zero counters in a single line."""
+        items = [f"{name}={value}" for name, value in sorted(self.counters.items()) if value]
+        if items:
+            logger.info(f"Run stats: {', '.join(items)}")
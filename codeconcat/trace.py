@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# codeconcat/trace.py
+"""
+Per-file timeline tracing, exported in the Chrome trace event format (viewable in Perfetto
+or chrome://tracing).
+
+Spans are recorded into a ring buffer preallocated when tracing starts, so recording a span
+allocates nothing but the span itself and takes no lock; when the buffer is full the oldest
+spans are overwritten. Tracing is off unless start() is called: span() then returns a
+shared no-op context manager.
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 1 << 18
+_NULL_SPAN: ContextManager[None] = nullcontext()
+
+
+class Tracer:
+    """Ring buffer of completed spans: name, category, detail (a path), thread, start and duration."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        if capacity < 1:
+            raise ValueError(f"Trace capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._names: List[Optional[str]] = [None] * capacity
+        self._categories: List[Optional[str]] = [None] * capacity
+        self._details: List[Optional[str]] = [None] * capacity
+        self._tids = array("q", bytes(8 * capacity))
+        self._starts = array("q", bytes(8 * capacity))
+        self._durations = array("q", bytes(8 * capacity))
+        self._thread_names: Dict[int, str] = {}
+        # next() on itertools.count is atomic under the GIL, so threads never share a slot
+        self._slots = itertools.count()
+        self._origin = time.perf_counter_ns()
+
+    def record(self, name: str, category: str, detail: Optional[str], start_ns: int, end_ns: int) -> None:
+        i = next(self._slots) % self.capacity
+        tid = threading.get_native_id()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._names[i] = name
+        self._categories[i] = category
+        self._details[i] = detail
+        self._tids[i] = tid
+        self._starts[i] = start_ns - self._origin
+        self._durations[i] = end_ns - start_ns
+
+    def span(self, name: str, category: str, detail: Optional[str] = None) -> "_Span":
+        return _Span(self, name, category, detail)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """The recorded spans as Chrome trace "X" events (times in µs), plus thread name metadata."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "codeconcat"}}
+        ]
+        events += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._thread_names.items()
+        ]
+        recorded = [i for i in range(self.capacity) if self._names[i] is not None]
+        for i in sorted(recorded, key=self._starts.__getitem__):
+            event: Dict[str, Any] = {
+                "name": self._names[i],
+                "cat": self._categories[i],
+                "ph": "X",
+                "ts": self._starts[i] / 1000,
+                "dur": self._durations[i] / 1000,
+                "pid": pid,
+                "tid": self._tids[i],
+            }
+            if self._details[i] is not None:
+                event["args"] = {"path": self._details[i]}
+            events.append(event)
+        return events
+
+    def export(self, output_path: Path) -> None:
+        recorded = next(self._slots)
+        events = self.events()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        dropped = max(recorded - self.capacity, 0)
+        logger.info(
+            f"Wrote {min(recorded, self.capacity)} trace spans to {output_path}"
+            + (f" (the {dropped} oldest were dropped, see --trace-capacity)" if dropped else "")
+        )
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "detail", "start_ns")
+
+    def __init__(self, tracer: Tracer, name: str, category: str, detail: Optional[str]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.detail = detail
+
+    def __enter__(self) -> None:
+        self.start_ns = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.tracer.record(self.name, self.category, self.detail, self.start_ns, time.perf_counter_ns())
+
+
+_active: Optional[Tracer] = None
+
+
+def start(capacity: int = DEFAULT_CAPACITY) -> Tracer:
+    """Starts recording spans from all threads into a new tracer."""
+    global _active
+    _active = Tracer(capacity)
+    return _active
+
+
+def stop() -> Optional[Tracer]:
+    """Stops recording and returns the tracer that was active, if any."""
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+
+def span(name: str, category: str, detail: Optional[str] = None) -> ContextManager[None]:
+    """A context manager timing one stage (e.g. "read" of category "io") of one file, if tracing."""
+    tracer = _active
+    return _NULL_SPAN if tracer is None else tracer.span(name, category, detail)
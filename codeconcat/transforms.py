@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+# codeconcat/transforms.py
+"""
+Streaming content transforms applied between reading a file and writing it to the output.
+
+Each transform is fed decoded text chunks and returns the text to pass on, holding back at
+most the current incomplete line (or a bounded header block), so files are never
+materialized as a whole. Lines longer than MAX_LINE_CHARS (minified bundles are often a
+single line) are not held back: they are passed on piece by piece, untransformed except by
+the comment stripper, whose comment and string state must follow them.
+"""
+
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+# Applied in this order regardless of the order they are requested in
+TRANSFORM_NAMES = (
+    "strip-header",
+    "strip-comments",
+    "strip-trailing-whitespace",
+    "collapse-blank-lines",
+)
+# A leading comment block longer than this is not treated as a repeated header
+MAX_HEADER_LINES = 60
+# Longest line held back to be transformed whole; longer lines are passed through as they come
+MAX_LINE_CHARS = 256 * 1024
+
+
+class LanguageSyntax:
+    """Comment and string delimiters of a language family, as used by the comment stripper."""
+
+    def __init__(
+        self,
+        line_comments: Tuple[str, ...],
+        block_comment: Optional[Tuple[str, str]],
+        quotes: Tuple[str, ...],
+        multiline_quotes: Tuple[str, ...] = (),
+        comment_after_space: bool = False,
+    ) -> None:
+        self.line_comments = line_comments
+        # Shell-like languages: "#" only starts a comment at line start or after whitespace
+        self.comment_after_space = comment_after_space
+        self.block_comment = block_comment
+        self.quotes = quotes
+        self.multiline_quotes = multiline_quotes
+        # Longest delimiters first so ''' wins over '
+        tokens = list(line_comments) + list(multiline_quotes) + list(quotes)
+        if block_comment:
+            tokens.append(block_comment[0])
+        # Longest delimiter, including the block comment closer
+        self.max_token = max(len(t) for t in tokens + list(block_comment or ()))
+        self.token_pattern: Pattern[str] = re.compile(
+            "|".join(re.escape(t) for t in sorted(tokens, key=len, reverse=True))
+        )
+        self.comment_prefixes = line_comments + ((block_comment[0], "*") if block_comment else ())
+
+
+HASH = LanguageSyntax(("#",), None, ('"', "'"), comment_after_space=True)
+PYTHON = LanguageSyntax(("#",), None, ('"', "'"), ('"""', "'''"))
+C_LIKE = LanguageSyntax(("//",), ("/*", "*/"), ('"', "'"))
+JS_LIKE = LanguageSyntax(("//",), ("/*", "*/"), ('"', "'"), ("`",))
+CSS = LanguageSyntax((), ("/*", "*/"), ('"', "'"))
+DASH = LanguageSyntax(("--",), None, ('"', "'"))
+
+SYNTAX_BY_EXTENSION: Dict[str, LanguageSyntax] = {
+    ".py": PYTHON,
+    ".sh": HASH,
+    ".rb": HASH,
+    ".pl": HASH,
+    ".pm": HASH,
+    ".r": HASH,
+    ".yaml": HASH,
+    ".yml": HASH,
+    ".toml": HASH,
+    ".c": C_LIKE,
+    ".h": C_LIKE,
+    ".cpp": C_LIKE,
+    ".hpp": C_LIKE,
+    ".cs": C_LIKE,
+    ".java": C_LIKE,
+    ".go": C_LIKE,
+    ".rs": C_LIKE,
+    ".kt": C_LIKE,
+    ".scala": C_LIKE,
+    ".swift": C_LIKE,
+    ".php": C_LIKE,
+    ".js": JS_LIKE,
+    ".jsx": JS_LIKE,
+    ".ts": JS_LIKE,
+    ".tsx": JS_LIKE,
+    ".css": CSS,
+    ".scss": C_LIKE,
+    ".less": C_LIKE,
+    ".sql": DASH,
+    ".lua": DASH,
+    ".hs": DASH,
+}
+
+
+def syntax_for(file_path: str) -> Optional[LanguageSyntax]:
+    return SYNTAX_BY_EXTENSION.get(os.path.splitext(file_path)[1].lower())
+
+
+class Transform:
+    """A streaming text transform: feed() chunks in order, then flush() once."""
+
+    def feed(self, text: str) -> str:
+        return text
+
+    def flush(self) -> str:
+        return ""
+
+
+class LineTransform(Transform, ABC):
+    """
+    Base for transforms that work on complete lines; buffers only the trailing partial line, up
+    to MAX_LINE_CHARS. A longer line goes to process_fragment() in pieces, up to its newline.
+    """
+
+    def __init__(self) -> None:
+        self._partial = ""
+        self._overlong = False  # In a line too long to buffer, until its newline
+
+    def feed(self, text: str) -> str:
+        out: List[str] = []
+        if self._overlong:
+            end = text.find("\n") + 1
+            if not end:
+                return self.process_fragment(text)
+            out.append(self.process_fragment(text[:end]))
+            self._overlong = False
+            text = text[end:]
+        text = self._partial + text
+        end = text.rfind("\n") + 1
+        self._partial = text[end:]
+        out.extend(self.process_line(line) for line in text[:end].splitlines(keepends=True))
+        if len(self._partial) > MAX_LINE_CHARS:
+            out.append(self.process_fragment(self._partial))
+            self._partial, self._overlong = "", True
+        return "".join(out)
+
+    def flush(self) -> str:
+        partial, self._partial, self._overlong = self._partial, "", False
+        return (self.process_line(partial) if partial else "") + self.finish()
+
+    @abstractmethod
+    def process_line(self, line: str) -> str:
+        """Transforms one line, with its newline unless it is the last line of the file."""
+
+    def process_fragment(self, text: str) -> str:
+        """Handles a piece of a line over MAX_LINE_CHARS; passed through untransformed by default."""
+        return text
+
+    def finish(self) -> str:
+        return ""
+
+
+class CollapseBlankLines(LineTransform):
+    """Collapses runs of blank (whitespace-only) lines into a single empty line."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._previous_blank = False
+
+    def process_line(self, line: str) -> str:
+        if line.strip():
+            self._previous_blank = False
+            return line
+        if self._previous_blank:
+            return ""
+        self._previous_blank = True
+        return "\n" if line.endswith("\n") else ""
+
+    def process_fragment(self, text: str) -> str:
+        self._previous_blank = False
+        return text
+
+
+class StripTrailingWhitespace(LineTransform):
+    """Removes trailing spaces and tabs from every line."""
+
+    def process_line(self, line: str) -> str:
+        return line.rstrip() + "\n" if line.endswith("\n") else line.rstrip()
+
+
+class StripRepeatedHeader(LineTransform):
+    """
+    Drops a file's leading comment block (typically a license header) if an identical block
+    already opened a previous file. `seen_headers` is shared by all files of a run.
+    """
+
+    def __init__(self, syntax: LanguageSyntax, seen_headers: Set[str]) -> None:
+        super().__init__()
+        self._prefixes = syntax.comment_prefixes
+        self._seen_headers = seen_headers
+        self._header: Optional[List[str]] = []  # None once the header has been dealt with
+
+    def _end_header(self) -> str:
+        header = "".join(self._header or [])
+        self._header = None
+        key = header.strip()  # Surrounding blank lines do not make headers different
+        if key and key in self._seen_headers:
+            return ""
+        self._seen_headers.add(key)
+        return header
+
+    def process_line(self, line: str) -> str:
+        if self._header is None:
+            return line
+        stripped = line.strip()
+        if stripped and not stripped.startswith(self._prefixes):
+            return self._end_header() + line
+        self._header.append(line)
+        if len(self._header) > MAX_HEADER_LINES:
+            header, self._header = "".join(self._header), None  # Too long to be a header
+            return header
+        return ""
+
+    def process_fragment(self, text: str) -> str:
+        # A line that long is code, not a comment: the header (if any) ends before it
+        return (self._end_header() if self._header is not None else "") + text
+
+    def finish(self) -> str:
+        return self._end_header() if self._header is not None else ""
+
+
+class StripComments(LineTransform):
+    """
+    Removes line and block comments outside string literals. Lines left empty by the removal
+    are dropped. Only multi-line quotes (Python triple quotes, JS template literals) carry
+    string state across lines, so a stray quote cannot swallow the rest of a file.
+    """
+
+    def __init__(self, syntax: LanguageSyntax) -> None:
+        super().__init__()
+        self._syntax = syntax
+        self._in_block = False
+        self._open_quote: Optional[str] = None  # Multi-line string spanning lines
+        # Pieces of an overlong line: in a line comment until its newline, the end of the
+        # previous piece, held back since a delimiter may be cut there, and whether the text
+        # before the current piece ends with whitespace (for comment_after_space)
+        self._in_line_comment = False
+        self._held = ""
+        self._after_space = True
+
+    def _skip_string(self, line: str, pos: int, quote: str, final: bool = True) -> Tuple[int, bool]:
+        """
+        Returns the position after the closing quote and whether it was found on this line.
+        Unless final, an unclosed string ends before an escape or a quote that may be cut.
+        """
+        while True:
+            end = line.find(quote, pos)
+            if end == -1 and final:
+                return len(line), False
+            backslash = line.find("\\", pos)
+            if backslash != -1 and (end == -1 or backslash < end):
+                if backslash + 1 == len(line):
+                    return backslash, False
+                pos = backslash + 2
+                continue
+            if end == -1:
+                return max(pos, len(line) - len(quote) + 1), False
+            return end + len(quote), True
+
+    def _scan(self, line: str, final: bool = True) -> Tuple[str, bool]:
+        """
+        Returns the line without its comments and whether it had any, carrying block comment and
+        multi-line string state over. Unless final, line is a piece of a line too long to buffer:
+        any unclosed string carries over, and its end is held back if a delimiter may be cut there.
+        """
+        syntax = self._syntax
+        out: List[str] = []
+        pos = 0
+        had_comment = False
+        length = len(line)
+        while pos < length:
+            if self._in_block:
+                assert syntax.block_comment is not None
+                closer = syntax.block_comment[1]
+                end = line.find(closer, pos)
+                had_comment = True
+                if end == -1:
+                    pos = length if final else max(pos, length - len(closer) + 1)
+                    break
+                pos = end + len(closer)
+                self._in_block = False
+                continue
+            if self._open_quote is not None:
+                end, closed = self._skip_string(line, pos, self._open_quote, final)
+                out.append(line[pos:end])
+                pos = end
+                if not closed:
+                    break
+                self._open_quote = None
+                continue
+
+            match = syntax.token_pattern.search(line, pos)
+            if not final and (match is None or match.start() > length - syntax.max_token):
+                held = max(pos, length - syntax.max_token + 1) if match is None else match.start()
+                out.append(line[pos:held])
+                pos = held
+                break
+            if match is None:
+                out.append(line[pos:])
+                pos = length
+                break
+            token = match.group()
+            out.append(line[pos : match.start()])
+            if token in syntax.line_comments:
+                start = match.start()
+                if syntax.comment_after_space and not (
+                    line[start - 1].isspace() if start else self._after_space
+                ):
+                    out.append(token)
+                    pos = match.end()
+                    continue
+                had_comment = True
+                self._in_line_comment = not final
+                pos = length
+                break
+            if syntax.block_comment and token == syntax.block_comment[0]:
+                self._in_block = True
+                pos = match.end()
+                continue
+            # String literal: copy it through untouched
+            end, closed = self._skip_string(line, match.end(), token, final)
+            out.append(line[match.start() : end])
+            pos = end
+            # In a piece of an overlong line, any string may go on in the next piece
+            if not closed and (token in syntax.multiline_quotes or not final):
+                self._open_quote = token
+
+        self._held = line[pos:] if not final else ""
+        self._after_space = final or (line[pos - 1].isspace() if pos else self._after_space)
+        if final and self._open_quote not in syntax.multiline_quotes:
+            self._open_quote = None  # A string opened in a piece of an overlong line ends with it
+        return "".join(out), had_comment
+
+    def process_line(self, line: str) -> str:
+        text, had_comment = self._scan(line)
+        if had_comment:
+            if not text.strip():
+                return ""
+            text = text.rstrip() + ("\n" if line.endswith("\n") else "")
+        return text
+
+    def process_fragment(self, text: str) -> str:
+        # Earlier pieces of the line are already out, so its newline is always kept
+        final = text.endswith("\n")
+        if self._in_line_comment:
+            self._in_line_comment = not final
+            self._after_space = final or self._after_space
+            return "\n" if final else ""
+        text, _ = self._scan(self._held + text, final)
+        return text + "\n" if final and not text.endswith("\n") else text
+
+    def finish(self) -> str:
+        # A file ending in an overlong line: what was held back of it
+        held, self._held, self._in_line_comment = self._held, "", False
+        self._after_space = True
+        return self._scan(held)[0] if held else ""
+
+
+def apply_transforms(chunks: Iterable[str], transforms: List[Transform]) -> Iterator[str]:
+    """Streams chunks through the transforms in order, flushing each one at the end."""
+    for chunk in chunks:
+        for transform in transforms:
+            chunk = transform.feed(chunk)
+        if chunk:
+            yield chunk
+    tail = ""
+    for transform in transforms:
+        tail = transform.feed(tail) + transform.flush()
+    if tail:
+        yield tail
+
+
+class TransformPipeline:
+    """Builds the per-file transform chain for the requested transform names."""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        names = set(names)
+        unknown = names - set(TRANSFORM_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown transforms: {sorted(unknown)}")
+        self.names = [n for n in TRANSFORM_NAMES if n in names]
+        self._seen_headers: Set[str] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.names)
+
+    def for_file(self, file_path: str) -> List[Transform]:
+        syntax = syntax_for(file_path)
+        transforms: List[Transform] = []
+        for name in self.names:
+            if name == "strip-header" and syntax is not None:
+                transforms.append(StripRepeatedHeader(syntax, self._seen_headers))
+            elif name == "strip-comments" and syntax is not None:
+                transforms.append(StripComments(syntax))
+            elif name == "strip-trailing-whitespace":
+                transforms.append(StripTrailingWhitespace())
+            elif name == "collapse-blank-lines":
+                transforms.append(CollapseBlankLines())
+        return transforms
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# tests/test_contains.py
+import pytest
+
+from codeconcat.contains import LiteralMatcher, chunks_if_contains
+
+
+@pytest.mark.parametrize("literals", [["needle"], ["needle", "pin", "a.b"]])
+def test_match_across_chunk_boundaries(literals):
+    matcher = LiteralMatcher(literals)
+    text = "hay" * 10 + "needle" + "hay" * 10
+    for cut in range(1, len(text)):
+        chunks = chunks_if_contains(iter([text[:cut], text[cut:]]), matcher)
+        assert chunks is not None and "".join(chunks) == text
+    assert chunks_if_contains(iter(["axb", "ne", "edl", ""]), matcher) is None
+
+
+def test_literals_are_not_patterns():
+    with pytest.raises(ValueError):
+        LiteralMatcher([""])
+    assert not LiteralMatcher(["a.b", "(x"]).search("axb (y")
+    assert LiteralMatcher(["a.b", "(x"]).search("f(x)")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# tests/test_governor.py
+import threading
+from pathlib import Path
+
+from codeconcat import governor
+from codeconcat.governor import Governor, TokenBucket
+from codeconcat.stats import RunStats
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket_holds_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(1000, clock, clock.sleep)
+    assert bucket.consume(1000) == 0  # One second's worth is saved up
+    for _ in range(10):
+        bucket.consume(500)
+    assert clock.now == 5.0
+    clock.now += 100  # Idle time saves up no more than one second's worth
+    assert bucket.consume(1500) == 0.5
+
+
+def test_governed_reads_are_throttled_and_limited(tmp_path: Path):
+    (tmp_path / "a.txt").write_bytes(b"x" * 3000)
+    clock = FakeClock()
+    stats = RunStats()
+    governor = Governor(
+        max_read_rate=1000, max_open_files=1, drop_cache=True, stats=stats, clock=clock, sleep=clock.sleep
+    )
+    with governor.open(str(tmp_path / "a.txt")) as f:
+        assert f.read(100) == b"x" * 100 and f.read() == b"x" * 2900
+        opened = threading.Thread(target=lambda: governor.open(str(tmp_path / "a.txt")).close())
+        opened.start()
+        opened.join(timeout=0.2)
+        assert opened.is_alive()  # Waiting for the only open-file slot
+    opened.join()
+    assert clock.now == 2.0
+    assert stats["read_throttles"] == 1 and stats["open_file_waits"] == 1
+
+
+def test_pool_workers_share_the_limits():
+    governor.start(Governor(max_read_rate=1000, max_open_files=3, drop_cache=True))
+    try:
+        assert governor.pool_size(8) == 3
+        assert governor.worker_settings(3) == (333, 1, True)
+        governor.start_worker(governor.worker_settings(3))
+        assert governor._active is not None and governor._active.bucket.rate == 333
+    finally:
+        governor.stop()
+    assert governor.pool_size(8) == 8 and governor.worker_settings(8) is None
@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
 # tests/test_main.py
+import json
 import logging
+import shutil
+import subprocess
 import sys
+import tarfile
+import zipfile
 from pathlib import Path
 from unittest.mock import patch
 
+import pytest
+
+import codeconcat.output
+
 # Import config constants and functions for patching/checking
 from codeconcat.config import (
     HOME_CONFIG_PATH,
@@ -12,7 +21,10 @@ from codeconcat.config import (
 )
 
 # Assuming your main function is in codeconcat.main
+from codeconcat.deadline import Deadline
+from codeconcat.git_objects import GitRepository
 from codeconcat.main import main
+from codeconcat.outline import compute_outlines
 
 
 # Helper function to create test files
@@ -312,3 +324,695 @@ def test_exclude_output_file_implicitly(tmp_path: Path):
     assert "print('hello')" in content
     assert "PRE_EXISTING_OUTPUT_CONTENT" not in content
     assert f"File: {output_file.name}" not in content
+
+
+# --- Tests focusing on size limits ---
+
+
+def test_max_file_bytes_skips_oversized(tmp_path: Path, caplog):
+    """Test that files over --max-file-bytes are skipped and reported as bytes avoided."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"small.py": "x = 1\n", "big.py": "y = 2\n" * 100})
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--max-file-bytes", "100"]
+    with patch.object(sys, "argv", test_args), caplog.at_level(logging.INFO):
+        main()
+
+    content = output_file.read_text()
+    assert "File: small.py" in content
+    assert "big.py" not in content
+    assert "bytes_avoided=600" in caplog.text
+
+
+def test_max_file_bytes_truncates_head_and_tail(tmp_path: Path):
+    """Test the truncate policy keeps the head and tail of oversized files."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"big.txt": "HEAD" + "-" * 1000 + "TAIL"})
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--max-file-bytes",
+        "100",
+        "--oversize",
+        "truncate",
+    ]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    content = output_file.read_text()
+    assert "File: big.txt" in content
+    assert '""""""\nHEAD' in content
+    assert "[... truncated 908 bytes ...]" in content
+    assert "TAIL\n" in content
+
+
+def test_max_total_bytes_budget(tmp_path: Path):
+    """Test that files are kept in sorted order until the total budget is used up."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"a.py": "a" * 40, "b.py": "b" * 40, "c.py": "c" * 10})
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--max-total-bytes", "55"]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    content = output_file.read_text()
+    assert "File: a.py" in content
+    assert "File: b.py" not in content
+    assert "File: c.py" in content
+
+
+def test_max_total_bytes_not_spent_on_binary_files(tmp_path: Path):
+    """Test that binary files without a known extension are dropped before the total budget is applied."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    source_dir.mkdir()
+    (source_dir / "a_blob").write_bytes(b"\x00\x01\x02" * 17)
+    (source_dir / "b.py").write_text("b" * 40)
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--max-total-bytes", "60"]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    content = output_file.read_text()
+    assert "File: b.py" in content and "a_blob" not in content
+
+
+def test_async_io_engine_preserves_order(tmp_path: Path):
+    """Test that the async engine produces the same output as the serial engine."""
+    source_dir = tmp_path / "src"
+    create_test_files(
+        source_dir, {f"dir{i % 3}/file{i:02d}.py": f"value = {i}\n" * (i + 1) for i in range(30)}
+    )
+    outputs = {}
+    for engine in ("sync", "async"):
+        output_file = tmp_path / f"output_{engine}.txt"
+        test_args = [
+            "codeconcat",
+            str(source_dir),
+            str(output_file),
+            "--io-engine",
+            engine,
+            "--max-in-flight",
+            "4",
+            "--max-buffered-bytes",
+            "64",
+        ]
+        with patch.object(sys, "argv", test_args):
+            main()
+        outputs[engine] = output_file.read_text()
+
+    assert "File: dir0/file00.py" in outputs["async"]
+    assert outputs["async"] == outputs["sync"]
+
+
+def test_single_read_pipeline_opens_each_file_once(tmp_path: Path, caplog):
+    """Test that classification reuses the bytes read for output: one open per file."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"code.py": "x = 1\n", "README": "plain text\n"})
+    (source_dir / "blob").write_bytes(bytes(range(256)))
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--exclude", ""]
+    with patch.object(sys, "argv", test_args), caplog.at_level(logging.INFO):
+        main()
+
+    content = output_file.read_text()
+    assert "File: code.py" in content
+    assert "File: README" in content
+    assert "File: blob" not in content
+    assert "files_opened=3" in caplog.text
+    assert "files_skipped_binary=1" in caplog.text
+
+
+# --- Tests focusing on --changed-since ---
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_changed_since_git_ref(tmp_path: Path):
+    """Test that --changed-since only includes files added or modified since the ref."""
+    source_dir = tmp_path / "repo"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"same.py": "same", "edited.py": "before", "gone.py": "bye"})
+
+    def git(*args: str) -> None:
+        subprocess.run(["git", "-C", str(source_dir), *args], check=True, capture_output=True)
+
+    git("init", "-q")
+    git("add", "-A")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "base")
+    git("gc", "-q")  # Read the base tree from a packfile
+    (source_dir / "edited.py").write_text("after")
+    (source_dir / "gone.py").unlink()
+    create_test_files(source_dir, {"staged.py": "new"})
+    git("add", "staged.py")
+
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--changed-since", "HEAD"]
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    content = output_file.read_text()
+    assert "File: edited.py" in content
+    assert "after" in content
+    assert "File: staged.py" in content
+    assert "same.py" not in content
+    assert "gone.py" not in content
+
+
+def test_changed_since_snapshot_fallback(tmp_path: Path):
+    """Test that --changed-since-snapshot compares against (and updates) an mtime snapshot."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    snapshot = tmp_path / "snapshot.json"
+    create_test_files(source_dir, {"a.py": "a", "b.py": "b"})
+    ref_args = ["codeconcat", str(source_dir), str(output_file), "--changed-since", "main"]
+    with patch.object(sys, "argv", ref_args), pytest.raises(SystemExit):
+        main()  # Not a git repository: a ref is not taken for a snapshot path
+    assert not Path("main").exists()
+
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--changed-since-snapshot", str(snapshot)]
+    with patch.object(sys, "argv", test_args):
+        main()
+    assert "File: a.py" in output_file.read_text()
+    assert snapshot.exists()
+
+    (source_dir / "b.py").write_text("b changed")
+    with patch.object(sys, "argv", test_args):
+        main()
+    content = output_file.read_text()
+    assert "File: b.py" in content
+    assert "File: a.py" not in content
+
+
+def test_transforms_shrink_output(tmp_path: Path):
+    """Test comment stripping, repeated header removal and blank line collapsing."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    header = "# Copyright ACME\n# Licensed under MIT\n"
+    create_test_files(
+        source_dir,
+        {
+            "a.py": header + "\nx = 1  # set x\n\n\n\ny = '# kept'   \n",
+            "b.py": header + "z = 2\n",
+            "c.js": "/* block\n comment */\nconst s = `// kept`; // dropped\n",
+        },
+    )
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--transform",
+        "strip-header",
+        "--transform",
+        "collapse-blank-lines",
+        "--transform",
+        "strip-trailing-whitespace",
+    ]
+    with patch.object(sys, "argv", test_args):
+        main()
+    content = output_file.read_text()
+    assert content.count("# Copyright ACME") == 1
+    assert '""""""\nz = 2\n""""""' in content
+    assert "x = 1  # set x\n\ny = '# kept'\n" in content
+
+    with patch.object(sys, "argv", test_args + ["--transform", "strip-comments"]):
+        main()
+    content = output_file.read_text()
+    assert "Copyright" not in content
+    assert "x = 1\n\ny = '# kept'\n" in content
+    assert '""""""\nconst s = `// kept`;\n""""""' in content
+
+
+def test_outline_mode(tmp_path: Path):
+    """Test that --outline keeps signatures and docstrings, drops bodies, and uses its cache."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    cache_dir = tmp_path / "cache"
+    create_test_files(
+        source_dir,
+        {
+            "mod.py": (
+                'import os\n\n\nclass A:\n    """A doc."""\n\n    def f(self, x: int) -> int:\n'
+                "        secret = x * 2\n        return secret\n"
+            ),
+            "app.ts": (
+                "import { b } from './b';\nexport function g(a: number): number {\n  return a + 1;\n}\n"
+            ),
+            "notes.md": "# Notes\nkept in full\n",
+        },
+    )
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--outline",
+        "--outline-cache-dir",
+        str(cache_dir),
+    ]
+    with patch.object(sys, "argv", test_args):
+        main()
+    content = output_file.read_text()
+    assert 'class A:\n    """A doc."""\n    def f(self, x: int) -> int:\n        ...\n' in content
+    assert "secret" not in content
+    assert "export function g(a: number): number { ... }" in content
+    assert "return a + 1" not in content
+    assert "kept in full" in content
+    assert len(list(cache_dir.rglob("*.txt"))) == 2
+
+    with patch.object(sys, "argv", test_args):
+        main()
+    assert output_file.read_text() == content
+
+
+def test_outline_skips_files_that_cannot_be_read(tmp_path: Path):
+    """Test that a file vanishing before it is outlined is left to the normal read path."""
+    create_test_files(tmp_path, {"kept.py": "def f():\n    return 1\n"})
+    paths = [str(tmp_path / "gone.py"), str(tmp_path / "kept.py")]
+    outlines = compute_outlines(paths, workers=1, cache_dir=None)
+    assert list(outlines) == [str(tmp_path / "kept.py")]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="creating symlinks needs privileges on Windows")
+def test_follow_symlinks_dedup_and_cycles(tmp_path: Path):
+    """Test that --follow-symlinks walks linked dirs once, breaks cycles and notes aliases."""
+    source_dir = tmp_path / "src"
+    external_dir = tmp_path / "external"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"shared/lib.py": "LIB = 1"})
+    create_test_files(external_dir, {"ext.py": "EXT = 1"})
+    (source_dir / "app").mkdir()
+    (source_dir / "app" / "vendored").symlink_to(source_dir / "shared")
+    (source_dir / "ext").symlink_to(external_dir)
+    (source_dir / "shared" / "loop").symlink_to(source_dir)
+
+    with patch.object(sys, "argv", ["codeconcat", str(source_dir), str(output_file)]):
+        main()
+    content = output_file.read_text()
+    assert "File: shared/lib.py" in content
+    assert "ext.py" not in content
+
+    with patch.object(sys, "argv", ["codeconcat", str(source_dir), str(output_file), "--follow-symlinks"]):
+        main()
+    content = output_file.read_text()
+    assert content.count("LIB = 1") == 1
+    assert "File: shared/lib.py\nAliases: app/vendored/lib.py\n" in content
+    assert "File: ext/ext.py" in content
+    assert "loop" not in content
+
+
+def test_archive_source_matches_directory(tmp_path: Path):
+    """Test that tar.gz and zip sources give the same output as the extracted directory."""
+    source_dir = tmp_path / "src"
+    create_test_files(
+        source_dir,
+        {
+            ".config/ignored.py": "IGNORED = 1",
+            ".config/kept.py": "KEPT = 1",
+            ".gitignore": ".config/ignored.py\n",
+            "a.py": "print('a')",
+            "sub/notes": "plain text without extension",
+        },
+    )
+    (source_dir / "data.bin").write_bytes(b"\x00\x01\x02binary")
+    expected_file = tmp_path / "expected.txt"
+    with patch.object(sys, "argv", ["codeconcat", str(source_dir), str(expected_file)]):
+        main()
+    expected = expected_file.read_text()
+    assert "IGNORED" not in expected and "KEPT = 1" in expected
+
+    tar_path = tmp_path / "snapshot.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as archive:
+        archive.add(source_dir, arcname=".")  # Adds members in sorted order, .config/ before .gitignore
+    zip_path = tmp_path / "snapshot.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for path in sorted(source_dir.rglob("*")):
+            archive.write(path, path.relative_to(source_dir).as_posix())
+
+    for archive_path in (tar_path, zip_path):
+        output_file = tmp_path / "output.txt"
+        with patch.object(sys, "argv", ["codeconcat", str(archive_path), str(output_file)]):
+            main()
+        assert output_file.read_text() == expected
+
+    # With no bytes allowed, only the truncation marker is written, as for the directory
+    big_dir = tmp_path / "big"
+    create_test_files(big_dir, {"big.py": "x" * 100000})
+    with tarfile.open(tar_path, "w:gz") as archive:
+        archive.add(big_dir, arcname=".")
+    limit_args = ["--max-file-bytes", "0", "--oversize", "truncate"]
+    with patch.object(sys, "argv", ["codeconcat", str(big_dir), str(expected_file), *limit_args]):
+        main()
+    with patch.object(sys, "argv", ["codeconcat", str(tar_path), str(output_file), *limit_args]):
+        main()
+    assert output_file.read_text() == expected_file.read_text()
+    assert "truncated 100000 bytes" in expected_file.read_text() and "x" not in expected_file.read_text()
+
+    # Members are classified by the selected backend
+    fake_magic = patch("codeconcat.sniff.magic")
+    with patch.object(
+        sys, "argv", ["codeconcat", str(zip_path), str(output_file), "--classifier", "libmagic"]
+    ):
+        with fake_magic as magic:
+            magic.from_buffer.return_value = "text/plain"
+            main()
+    assert "File: data.bin" in output_file.read_text()
+    assert magic.from_buffer.call_count == 2  # data.bin and sub/notes
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_rev_reads_commit_from_object_database(tmp_path: Path):
+    """Test that --rev concatenates committed content, from packs with deltas, without checkout."""
+    repo_dir = tmp_path / "repo"
+    output_file = tmp_path / "output.txt"
+    lines = "".join(f"line {i}\n" for i in range(500))
+    create_test_files(
+        repo_dir, {"pkg/big.py": lines + "VERSION = 1\n", "pkg/keep.py": "keep", "top.py": "top"}
+    )
+    create_test_files(repo_dir, {".gitignore": "*.dat\n", "pkg/tracked.dat": "ignored at rev"})
+
+    def git(*args: str) -> None:
+        subprocess.run(["git", "-C", str(repo_dir), *args], check=True, capture_output=True)
+
+    git("init", "-q")
+    git("add", "-A", "-f")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "v1")
+    (repo_dir / "pkg" / "big.py").write_text(lines + "VERSION = 2\n")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qam", "v2")
+    git("gc", "-q", "--aggressive")  # Packs big.py v1 as a delta
+    (repo_dir / "pkg" / "keep.py").write_text("uncommitted edit")
+
+    test_args = ["codeconcat", str(repo_dir / "pkg"), str(output_file), "--rev", "HEAD~1"]
+    with patch.object(sys, "argv", test_args):
+        main()
+    content = output_file.read_text()
+    assert "File: big.py" in content and "VERSION = 1" in content
+    assert '""""""\nkeep\n""""""' in content
+    assert "tracked.dat" not in content
+    assert "top.py" not in content
+
+    with patch.object(sys, "argv", test_args[:-1] + ["HEAD"]):
+        main()
+    assert "VERSION = 2" in output_file.read_text()
+
+    git("branch", "config", "HEAD~1")  # Not $GIT_DIR/config
+    with patch.object(sys, "argv", test_args[:-1] + ["config"]):
+        main()
+    assert "VERSION = 1" in output_file.read_text()
+
+    # Sizes are read from the headers of packed, delta and loose objects alike
+    create_test_files(repo_dir, {"pkg/loose.py": lines})
+    git("add", "pkg/loose.py")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "v3")
+    repo = GitRepository.discover(repo_dir)
+    assert repo is not None
+    for rev in ("HEAD", "HEAD~2"):
+        tree = repo.read_tree(repo.commit_tree(repo.resolve(rev)))
+        pkg = next(entry.sha for entry in tree if entry.path == "pkg")
+        for entry in repo.read_tree(pkg):
+            assert repo.object_size(entry.sha) == len(repo.read_object(entry.sha)[1])
+    repo.close()
+
+    # Blobs over --max-file-bytes are skipped without being inflated
+    read_object = GitRepository.read_object
+    inflated = []
+
+    def spy_read_object(self, sha):
+        obj_type, content = read_object(self, sha)
+        inflated.append((obj_type, len(content)))
+        return obj_type, content
+
+    for rev in ("HEAD", "HEAD~2"):
+        limited_args = test_args[:-1] + [rev, "--max-file-bytes", "1000"]
+        with (
+            patch.object(sys, "argv", limited_args),
+            patch.object(GitRepository, "read_object", spy_read_object),
+        ):
+            main()
+        content = output_file.read_text()
+        assert "File: keep.py" in content and "big.py" not in content and "loose.py" not in content
+    assert all(size <= 1000 for obj_type, size in inflated if obj_type == "blob")
+
+
+def test_multiple_sinks_single_pass(tmp_path: Path, caplog):
+    """Test that --sink outputs get their own filter and format while each file is read once."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    markdown_file = tmp_path / "pkg.md"
+    jsonl_file = tmp_path / "all.jsonl"
+    create_test_files(source_dir, {"pkg/mod.py": 'x = "a\\tb"\n', "top.py": "top = 1\n", "other/o.py": "o\n"})
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--sink",
+        f"{markdown_file},filter=^(pkg|top),format=markdown",
+        "--sink",
+        f"{jsonl_file},format=jsonl",
+    ]
+    with patch.object(sys, "argv", test_args), caplog.at_level(logging.INFO):
+        main()
+
+    assert output_file.read_text().count("File: ") == 3
+    markdown = markdown_file.read_text()
+    assert '## `pkg/mod.py`\n\n````py\nx = "a\\tb"\n````\n' in markdown
+    assert "top.py" in markdown and "other/o.py" not in markdown
+    records = [json.loads(line) for line in jsonl_file.read_text().splitlines()]
+    assert [r["path"] for r in records] == ["other/o.py", "pkg/mod.py", "top.py"]
+    assert records[1]["content"] == 'x = "a\\tb"\n'
+    assert "files_opened=3" in caplog.text
+
+
+def test_trace_timeline_export(tmp_path: Path):
+    """Test that --trace writes Chrome trace spans per file and stage, with thread ids."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    trace_file = source_dir / "trace.json"  # Inside the source: must not be concatenated
+    create_test_files(source_dir, {"a.py": "a = 1\n", "sub/b.py": "b = 2\n", "data": "text\n"})
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--trace", str(trace_file)]
+    with patch.object(sys, "argv", test_args + ["--io-engine", "async"]):
+        main()
+    with patch.object(sys, "argv", test_args):
+        main()
+
+    assert "trace.json" not in output_file.read_text()
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    assert {"scandir", "stat", "pattern", "open", "read", "write"} <= {e["name"] for e in spans}
+    assert all(e["dur"] >= 0 and isinstance(e["tid"], int) for e in spans)
+    assert {e["args"]["path"] for e in spans if e["name"] == "stat"} == {"a.py", "data", "sub/b.py"}
+    assert [e["ts"] for e in spans] == sorted(e["ts"] for e in spans)
+
+
+def test_time_budget_prioritized_partial_output(tmp_path: Path):
+    """Test that --time-budget writes files in priority order, then stops with a coverage footer."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    create_test_files(
+        source_dir,
+        {"a/b/deep.py": "1\n", "a/mid.py": "2\n", "top.py": "3\n", "z.py": "4\n", "a/b/c/d.py": "5\n"},
+    )
+    # Fake clock: each file written takes 3s of a 10s budget, so 4 files fit
+    clock = [0.0]
+    write_entry = codeconcat.output._write_entry
+
+    def slow_write_entry(*args, **kwargs):
+        write_entry(*args, **kwargs)
+        clock[0] += 3
+
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--time-budget",
+        "10s",
+        "--priority",
+        "shallow",
+    ]
+    fake_clock = patch("codeconcat.deadline.time.monotonic", lambda: clock[0])
+    slow_writes = patch.object(codeconcat.output, "_write_entry", slow_write_entry)
+    with patch.object(sys, "argv", test_args), fake_clock, slow_writes:
+        main()
+
+    content = output_file.read_text()
+    written = [line[len("File: ") :] for line in content.splitlines() if line.startswith("File: ")]
+    assert written == ["top.py", "z.py", "a/mid.py", "a/b/deep.py"]
+    assert content.endswith("4 of 5 files found were processed (80.0%)]\n")
+
+
+def test_time_budget_spent_by_walk_still_writes_footer(tmp_path: Path):
+    """Test that a walk cut by --time-budget before finding any file still ends the output with a footer."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    create_test_files(source_dir, {"a.py": "1\n", "b.py": "2\n"})
+    # The budget has run out by the time the walk checks it for the first file
+    times = iter([0.0])
+    deadline = patch(
+        "codeconcat.main.Deadline", lambda seconds: Deadline(seconds, lambda: next(times, 100.0))
+    )
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--time-budget", "10s"]
+    with patch.object(sys, "argv", test_args), deadline:
+        main()
+
+    content = output_file.read_text()
+    assert "File: " not in content
+    assert content.endswith(
+        "0 of 0 files found were processed (0.0%); the walk stopped before the whole tree was found]\n"
+    )
+
+
+def test_partitions_merge_to_single_run_output(tmp_path: Path, caplog):
+    """Test that merging the parts of a --partition I/K split gives the single-run output, byte for byte."""
+    source_dir = tmp_path / "src"
+    single_file = tmp_path / "single.txt"
+    merged_file = tmp_path / "merged.txt"
+    files = {f"pkg{i}/mod.py": f"value = {i}\n" for i in range(8)}
+    files.update({"pkg0/sub/é.py": "accent = 'é'\n", "top.py": "top = 1\n", "README.md": "# Readme\n"})
+    create_test_files(source_dir, files)
+    with patch.object(sys, "argv", ["codeconcat", str(source_dir), str(single_file)]):
+        main()
+
+    parts = [str(tmp_path / f"part{i}.txt") for i in range(1, 4)]
+    for i, part in enumerate(parts, start=1):
+        with patch.object(sys, "argv", ["codeconcat", str(source_dir), part, "--partition", f"{i}/3"]):
+            main()
+    assert all(Path(part + ".index.json").is_file() for part in parts)
+    assert sum(len(Path(part).read_text()) for part in parts) == len(single_file.read_text())
+
+    with patch.object(sys, "argv", ["codeconcat", "merge", str(merged_file), *reversed(parts)]):
+        main()
+    assert merged_file.read_bytes() == single_file.read_bytes()
+
+    with patch.object(sys, "argv", ["codeconcat", "merge", str(merged_file), *parts[:2]]):
+        with pytest.raises(SystemExit):
+            main()
+    assert "Missing part(s) 3 of 3" in caplog.text
+
+
+def test_non_utf8_sources_are_transcoded(tmp_path: Path, caplog):
+    """Test that BOM-marked UTF-16 and Latin-1 files come out as correct UTF-8 text, also when truncated."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    source_dir.mkdir()
+    (source_dir / "win.cs").write_bytes("// Überprüfung\nclass Café {}\n".encode("utf-16"))
+    (source_dir / "legacy.c").write_bytes("/* naïve façade */\n".encode("latin-1"))
+    (source_dir / "bom.py").write_bytes("x = 'é'\n".encode("utf-8-sig"))
+    (source_dir / "long.cs").write_bytes(
+        b"\xfe\xff" + ("é" * 600 + "\n" + "ü" * 600 + "\n").encode("utf-16-be")
+    )
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--max-file-bytes",
+        "1k",
+        "--oversize",
+        "truncate",
+    ]
+    with patch.object(sys, "argv", test_args), caplog.at_level(logging.INFO):
+        main()
+
+    content = output_file.read_text(encoding="utf-8")
+    assert "// Überprüfung\nclass Café {}\n" in content
+    assert "/* naïve façade */\n" in content
+    assert 'File: bom.py\n""""""\nx = \'é\'\n' in content
+    head, _, tail = content.split("File: long.cs\n")[1].partition("[... truncated")
+    assert head.endswith("é" * 255 + "\n") and tail.split("\n")[1].strip("ü") == ""
+    assert "�" not in content
+    assert "encoding_cp1252=1" in caplog.text and "encoding_utf-16-be=1" in caplog.text
+
+
+@pytest.mark.parametrize("io_engine", ["sync", "async"])
+def test_contains_keeps_only_matching_files(tmp_path: Path, caplog, io_engine):
+    """Test that --contains emits only files containing one of the strings, whole, with either engine."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    source_dir.mkdir()
+    (source_dir / "a.py").write_text("import os\nrun_query()\n")
+    (source_dir / "b.py").write_text("x = 1\n" * 20000 + "Connection.open()\n")
+    (source_dir / "c.py").write_text("def unrelated():\n    pass\n")
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(output_file),
+        "--contains",
+        "run_query",
+        "--contains",
+        "Connection",
+        "--io-engine",
+        io_engine,
+    ]
+    with patch.object(sys, "argv", test_args), caplog.at_level(logging.INFO):
+        main()
+
+    content = output_file.read_text()
+    assert "File: a.py" in content and "File: c.py" not in content
+    assert "x = 1\n" * 20000 + "Connection.open()\n" in content
+    assert "files_skipped_contains=1" in caplog.text
+
+
+def test_dry_run_estimates_without_reading(tmp_path: Path, capsys):
+    """Test that --dry-run reports sizes, tokens and heaviest files from stat alone, writing nothing."""
+    source_dir = tmp_path / "src"
+    output_file = tmp_path / "output.txt"
+    (source_dir / "pkg").mkdir(parents=True)
+    (source_dir / "pkg" / "big.py").write_text("x" * 4000)
+    (source_dir / "pkg" / "small.py").write_text("y" * 400)
+    (source_dir / "README.md").write_text("z" * 40)
+    (source_dir / "data.bin").write_bytes(bytes(range(256)) * 4)
+    test_args = ["codeconcat", str(source_dir), str(output_file), "--dry-run", "--dry-run-top", "2"]
+    classify = patch("codeconcat.file_utils.detect_mime", side_effect=AssertionError("classified"))
+    output = patch("codeconcat.main.create_output", side_effect=AssertionError("read"))
+    with patch.object(sys, "argv", test_args), classify, output:
+        main()
+
+    report = capsys.readouterr().out
+    # Content plus "File: <path>" headers and markers: 23 bytes and the path per file
+    assert report.startswith(
+        "Dry run: 4 files, 5.5 KiB (5595 bytes), ~1398 tokens (bytes / 4)\n"
+        "  5.3 KiB of content and 131 B of text headers and markers\n"
+    )
+    assert "including 1 files, 1.0 KiB with no known extension" in report
+    assert "4.4 KiB       1117       2  pkg/" in report
+    assert report.endswith("3.9 KiB       1008  pkg/big.py\n     1.0 KiB        263  data.bin\n")
+    assert not output_file.exists()
+
+    # A partition is estimated without a destination, and no part or index is written
+    with (
+        patch.object(sys, "argv", ["codeconcat", str(source_dir), "--dry-run", "--partition", "1/1"]),
+        output,
+    ):
+        main()
+    assert capsys.readouterr().out.startswith("Dry run: 4 files, 5.5 KiB (5595 bytes)")
+
+
+def test_resource_governor_limits_do_not_change_output(tmp_path: Path, caplog):
+    """Test that --max-read-rate, --max-open-files and --drop-cache throttle reads but keep the output."""
+    source_dir = tmp_path / "src"
+    create_test_files(
+        source_dir,
+        {"app.py": "print('hello')\n" * 20, "lib/util.py": "def f():\n    pass\n", "notes": "plain text\n"},
+    )
+    plain_file = tmp_path / "plain.txt"
+    governed_file = tmp_path / "governed.txt"
+    with patch.object(sys, "argv", ["codeconcat", str(source_dir), str(plain_file)]):
+        main()
+
+    test_args = [
+        "codeconcat",
+        str(source_dir),
+        str(governed_file),
+        "--max-read-rate",
+        "16",
+        "--max-open-files",
+        "1",
+        "--drop-cache",
+        "--output-buffer",
+        "1k",
+        "--io-engine",
+        "async",
+    ]
+    sleep = patch("codeconcat.governor.time.sleep")
+    with patch.object(sys, "argv", test_args), sleep as slept, caplog.at_level(logging.INFO):
+        main()
+
+    assert governed_file.read_bytes() == plain_file.read_bytes()
+    assert slept.called and "read_throttles=" in caplog.text
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# tests/test_path_store.py
+import os
+import random
+
+import pytest
+
+from codeconcat.path_store import PathStore
+
+# Names chosen so that sorting by (directory, name) would differ from sorting by full path
+NAMES = ["a0", "a-b", "é.txt", "undecodable-\udcff", "z", "a.txt"]
+
+
+def make_paths(count: int) -> list:
+    rng = random.Random(0)
+    dirs = [
+        os.path.join(os.sep, "src", *(rng.choice(["a", "a0", "b"]) for _ in range(depth)))
+        for depth in range(4)
+        for _ in range(3)
+    ]
+    return [os.path.join(rng.choice(dirs), f"{rng.choice(NAMES)}{i}") for i in range(count)]
+
+
+@pytest.mark.parametrize("spill_threshold", [10_000, 7])
+def test_sorted_like_a_list(tmp_path, spill_threshold):
+    paths = make_paths(500)
+    store = PathStore(spill_threshold=spill_threshold, spill_dir=str(tmp_path))
+    for size, path in enumerate(paths):
+        store.add(path, size)
+    assert list(store) == paths
+
+    store.sort()
+    assert list(store) == sorted(paths)
+    assert store[0] == min(paths) and store[-1] == max(paths) and len(store) == len(paths)
+    assert list(os.listdir(tmp_path)) == []  # Spilled runs are removed
+
+
+def test_retain_keeps_order_and_sizes():
+    store = PathStore()
+    for size, path in enumerate(["/r/c", "/r/b", "/r/a"]):
+        store.add(path, size)
+    store.sort()
+    store.retain(lambda path, size: size != 1)
+    assert list(store.items()) == [("/r/a", 2), ("/r/c", 0)]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# tests/test_sinks.py
+import io
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from codeconcat.partition import PartSink
+from codeconcat.sinks import Sink
+
+
+def test_sinks_must_implement_their_format():
+    class Incomplete(Sink):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("out.txt")  # type: ignore[abstract]
+
+
+class NoTellStream(io.StringIO):
+    def tell(self) -> int:
+        raise AssertionError("tell() flushes a text file")
+
+
+def test_part_sink_indexes_without_tell(tmp_path: Path):
+    stream = NoTellStream()
+    sink = PartSink(str(tmp_path / "part.txt"), (1, 2))
+    with patch("codeconcat.sinks.open", create=True, return_value=stream):
+        sink.open()
+    for relative_path, content in (("a.py", "x = 1\n"), ("pkg/é.py", "y = 'é'")):
+        sink.begin(relative_path)
+        sink.write(content)
+        sink.end()
+    data = stream.getvalue().encode("utf-8")
+    sink.close()
+
+    assert sum(length for _, _, length in sink.entries) == len(data)
+    for relative_path, offset, length in sink.entries:
+        assert data[offset : offset + length].decode("utf-8").startswith(f"File: {relative_path}\n")
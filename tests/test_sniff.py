@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# tests/test_sniff.py
+from pathlib import Path
+
+import pytest
+
+from codeconcat.file_utils import EXCLUDED_MIME_TYPES
+from codeconcat.sniff import detect_mime, sniff_mime
+
+# Small corpus of text and binary samples; keys are file names, values are raw bytes.
+# JSON/JS without a known extension is left out: libmagic labels it application/*, the sniffer as text.
+CORPUS = {
+    "script.sh": b"#!/bin/sh\necho hello\n",
+    "notes": "café naïve résumé\n".encode("utf-8") * 20,
+    "latin1.txt": "café naïve\n".encode("latin-1") * 20,
+    "utf16.txt": "hello world\n".encode("utf-16"),
+    "image.png": b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + bytes(range(256)),
+    "archive.gz": b"\x1f\x8b\x08\x00" + bytes(range(256)),
+    "program": b"\x7fELF\x02\x01\x01" + bytes(200),
+    "blob.bin": bytes(range(256)) * 4,
+    "empty": b"",
+}
+BINARY = {"image.png", "archive.gz", "program", "blob.bin"}
+
+
+def is_binary(mime_type: str) -> bool:
+    return any(excluded in mime_type for excluded in EXCLUDED_MIME_TYPES)
+
+
+def write_corpus(base: Path) -> None:
+    for name, data in CORPUS.items():
+        (base / name).write_bytes(data)
+
+
+def test_sniff_mime_classifies_corpus(tmp_path: Path):
+    """Test the builtin sniffer separates text from binary samples."""
+    write_corpus(tmp_path)
+    for name in CORPUS:
+        assert is_binary(detect_mime(str(tmp_path / name))) == (name in BINARY), name
+
+
+def test_sniff_mime_accepts_utf8_cut_mid_character():
+    """Test that a prefix ending inside a multi-byte UTF-8 sequence is still text."""
+    data = ("a" * 10 + "é").encode("utf-8")
+    assert sniff_mime(data[:-1]) == "text/plain"
+
+
+def test_sniff_agrees_with_libmagic(tmp_path: Path):
+    """Test the builtin sniffer and libmagic agree on the text/binary verdict for the corpus."""
+    magic = pytest.importorskip("magic")
+    write_corpus(tmp_path)
+    for name in CORPUS:
+        path = str(tmp_path / name)
+        assert is_binary(detect_mime(path)) == is_binary(magic.from_file(path, mime=True)), name
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# tests/test_transforms.py
+import pytest
+
+from codeconcat.transforms import TRANSFORM_NAMES, LineTransform, TransformPipeline, apply_transforms
+
+
+def test_single_line_file_is_not_buffered_whole():
+    transforms = TransformPipeline(TRANSFORM_NAMES).for_file("bundle.js")
+    chunk = "var a=1;/*x*/  " * 4096  # 60 KiB
+    consumed = []
+
+    def chunks():
+        for i in range(40):
+            consumed.append(i)
+            yield chunk
+        yield "\n// comment\nvar b = 2;  \n"
+
+    out = []
+    for piece in apply_transforms(chunks(), transforms):
+        if not out:
+            assert len(consumed) < 10  # Output starts long before the line ends
+        out.append(piece)
+    # Only comments are stripped from the long line; the lines after it are fully transformed
+    assert "".join(out) == "var a=1;  " * 4096 * 40 + "\nvar b = 2;\n"
+
+
+def chunked(text, size=64 * 1024):
+    return (text[i : i + size] for i in range(0, len(text), size))
+
+
+@pytest.mark.parametrize(
+    "file_path, text, expected",
+    [
+        (
+            "bundle.js",
+            "/* start\n" + "x" * 600000 + " */ var a = 1;\nvar important = 3; // note\nfunction f() {}\n",
+            " var a = 1;\nvar important = 3;\nfunction f() {}\n",
+        ),
+        (
+            "gen.py",
+            'x = """\n' + "y" * 600000 + '""" # end\n# comment\nz = 1\n',
+            'x = """\n' + "y" * 600000 + '""" \nz = 1\n',
+        ),
+        (
+            "bundle.js",
+            "var s = '" + "/*" * 200000 + "'; // tail " + "z" * 300000 + "\nvar t = 2; /* c */\n",
+            "var s = '" + "/*" * 200000 + "'; \nvar t = 2;\n",
+        ),
+    ],
+    ids=["block-comment", "docstring", "string"],
+)
+def test_comment_state_follows_overlong_lines(file_path, text, expected):
+    for size in (64 * 1024, 1000, 7):
+        transforms = TransformPipeline(["strip-comments"]).for_file(file_path)
+        assert "".join(apply_transforms(chunked(text, size), transforms)) == expected
+
+
+def test_line_transforms_must_process_lines():
+    class Incomplete(LineTransform):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]